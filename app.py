@@ -1,10 +1,22 @@
 # app.py
-from flask import Flask, redirect, url_for
+from flask import Flask, redirect, url_for, jsonify, session
+from functools import wraps
 from transaction import transactions_bp
 from librarian import librarian_bp
 from reader import reader_bp # Ensure this is imported
+from reader import MAX_ATTEMPTS, LOCKOUT_MINUTES
 from datetime import timedelta
-import pyodbc
+import os
+import db
+import instrumentation
+from catalog_cache import get_metadata_cache
+from hashing import get_hasher
+from login_throttle import get_login_throttle
+from live_updates import get_catalog_feed
+from provisioning import provision_readers_command
+from export import export_data_command
+from migrate import migrate_command
+from db import get_db_connection
 
 app = Flask(__name__)
 # app.secret_key = "test_secret"
@@ -14,6 +26,96 @@ app.secret_key = 'mmu_library_secret'
 app.config['SESSION_PERMANENT'] = False
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(minutes=30)
 
+# Storage backend: 'sqlserver' (default) or 'sqlite' for a local stand-in
+# that needs no SQL Server (MMU_DB_BACKEND=sqlite MMU_SQLITE_PATH=library.db)
+app.config['DB_BACKEND'] = os.environ.get('MMU_DB_BACKEND', 'sqlserver')
+app.config['DB_SQLITE_PATH'] = os.environ.get('MMU_SQLITE_PATH', ':memory:')
+
+# Apply pending migrations/ when the pool is first built. The SQLite
+# stand-in does this itself; on SQL Server run: flask --app app migrate
+app.config['DB_AUTO_MIGRATE'] = app.config['DB_BACKEND'] == 'sqlite'
+
+# Shared connection pool (update DB_CONN_STR to match your local setup,
+# e.g. "Server=localhost\\SQLEXPRESS;")
+app.config['DB_POOL_SIZE'] = 10
+# Hand a logged-in reader's AccountID to SQL Server's row-level security
+# (SESSION_CONTEXT 'UserID') on each pooled connection they use
+app.config['DB_SESSION_CONTEXT'] = True
+db.init_app(app)
+
+# Per-request timings: Server-Timing header (conn/db/bcrypt/render/total),
+# statements slower than SLOW_QUERY_MS logged to "mmu.sql" with redacted
+# parameters, per-route histograms at /metrics
+app.config['SERVER_TIMING'] = True
+app.config['SLOW_QUERY_MS'] = 200
+instrumentation.init_app(app)
+
+# Books per catalog page (readers may ask for up to 100 with ?per_page=)
+app.config['CATALOG_PAGE_SIZE'] = 25
+
+# Rows per page in the librarian dashboard's inventory/member tables
+app.config['DASHBOARD_PAGE_SIZE'] = 50
+
+# Overdue loans listed on the librarian dashboard (oldest first)
+app.config['OVERDUE_REPORT_LIMIT'] = 100
+
+# Most keys one bulk toggle/delete on the dashboard may select
+app.config['BULK_ACTION_LIMIT'] = 500
+
+# Rebuild the in-memory search index this often (seconds) to pick up
+# catalog changes made outside this process
+app.config['CATALOG_INDEX_TTL'] = 300
+
+# Re-check the catalog version behind the cached category list/counts
+# after this many seconds
+app.config['CATALOG_METADATA_TTL'] = 60
+
+# Rows per batch/commit for the bulk catalog import
+app.config['IMPORT_BATCH_SIZE'] = 1000
+
+# Accounts per hashing batch/transaction for bulk reader provisioning
+# (upload on the dashboard, or: flask --app app provision-readers FILE)
+app.config['PROVISION_BATCH_SIZE'] = 500
+
+# Rows fetched per fetchmany() when streaming exports
+# (/librarian/export/<dataset>, or: flask --app app export-data DATASET)
+app.config['EXPORT_CHUNK_SIZE'] = 1000
+
+# bcrypt cost factor; existing hashes are upgraded on the next login
+app.config['BCRYPT_ROUNDS'] = 12
+# Hashing process pool: workers default to one per core (0 = hash inline);
+# at most HASH_QUEUE_SIZE operations queued/running, callers wait up to
+# HASH_QUEUE_TIMEOUT seconds for a slot before getting "server busy"
+app.config['HASH_WORKERS'] = None
+app.config['HASH_QUEUE_SIZE'] = None
+app.config['HASH_QUEUE_TIMEOUT'] = 2.0
+
+# Pre-auth login throttle: per-IP token bucket, and a per-username failure
+# counter that mirrors FailedAttempts/LockoutUntil. Set LOGIN_THROTTLE_STORE
+# to a file path (e.g. MMU_THROTTLE_STORE=throttle.db) to share the counters
+# between worker processes
+app.config['LOGIN_THROTTLE_STORE'] = os.environ.get('MMU_THROTTLE_STORE')
+app.config['LOGIN_THROTTLE_IP_BURST'] = 20
+app.config['LOGIN_THROTTLE_IP_PER_MINUTE'] = 10
+app.config['LOGIN_THROTTLE_MAX_FAILURES'] = MAX_ATTEMPTS
+app.config['LOGIN_THROTTLE_LOCKOUT_SECONDS'] = LOCKOUT_MINUTES * 60
+
+# Live catalog events (/api/catalog/events, SSE): at most
+# LIVE_UPDATES_MAX_SUBSCRIBERS open streams per process, a keepalive every
+# LIVE_UPDATES_HEARTBEAT seconds, the last LIVE_UPDATES_BACKLOG published
+# batches kept for slow streams. Set LIVE_UPDATES_BROKER to a file path
+# (e.g. MMU_LIVE_UPDATES_BROKER=live.db) to pass changes between worker
+# processes; each polls it every LIVE_UPDATES_POLL_SECONDS.
+# Each open stream holds a server thread unless the app is served by
+# gevent (python serve.py), so None picks 2000 under gevent and 32
+# otherwise; with a fixed thread pool (waitress, gunicorn gthread) set it
+# well below the pool size, or 0 to turn the feed off
+app.config['LIVE_UPDATES_MAX_SUBSCRIBERS'] = None
+app.config['LIVE_UPDATES_HEARTBEAT'] = 15.0
+app.config['LIVE_UPDATES_BACKLOG'] = 256
+app.config['LIVE_UPDATES_BROKER'] = os.environ.get('MMU_LIVE_UPDATES_BROKER')
+app.config['LIVE_UPDATES_POLL_SECONDS'] = 0.5
+
 # Register ALL blueprints so url_for can find them
 # app.register_blueprint(transactions_bp, url_prefix='/reader')
 # app.register_blueprint(librarian_bp, url_prefix='/admin')
@@ -22,16 +124,9 @@ app.register_blueprint(reader_bp)
 app.register_blueprint(librarian_bp)
 app.register_blueprint(transactions_bp)
 
-def get_db_connection():
-        # Update these values to match your local setup
-    conn_str = (
-        "Driver={ODBC Driver 18 for SQL Server};"
-        "Server=localhost;" #\\SQLEXPRESS;
-        "Database=MMU_Library;"
-        "Trusted_Connection=yes;"
-        "TrustServerCertificate=yes;"
-    )
-    return pyodbc.connect(conn_str)
+app.cli.add_command(provision_readers_command)
+app.cli.add_command(export_data_command)
+app.cli.add_command(migrate_command)
 
 # This route is good for testing the connection initially
 @app.route('/test_db')
@@ -45,6 +140,51 @@ def test_db():
         return f"Connected! MS SQL Version: {row[0]}"
     except Exception as e:
         return f"Error: {str(e)}"
+
+# Operational stats below are for librarians only
+def librarian_only(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if session.get('role') != 'Librarian':
+            return jsonify({'error': 'Access denied.'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+# Pool hit/miss/wait counters for sizing DB_POOL_SIZE
+@app.route('/db_pool_stats')
+@librarian_only
+def db_pool_stats():
+    return jsonify(db.get_pool().stats())
+
+# Hit/revalidation/miss counters for the catalog metadata cache
+@app.route('/catalog_cache_stats')
+@librarian_only
+def catalog_cache_stats():
+    return jsonify(get_metadata_cache().stats())
+
+# Per-operation bcrypt timings and queue rejections for tuning BCRYPT_ROUNDS
+@app.route('/hashing_stats')
+@librarian_only
+def hashing_stats():
+    return jsonify(get_hasher().stats())
+
+# Per-route latency histograms with average query/round-trip counts
+@app.route('/metrics')
+@librarian_only
+def metrics():
+    return jsonify(instrumentation.get_route_metrics().stats())
+
+# Allowed/rejected counts for the pre-auth login throttle
+@app.route('/login_throttle_stats')
+@librarian_only
+def login_throttle_stats():
+    return jsonify(get_login_throttle().stats())
+
+# Open/peak SSE streams, published batches and lagging/rejected subscribers
+@app.route('/live_updates_stats')
+@librarian_only
+def live_updates_stats():
+    return jsonify(get_catalog_feed().stats())
     
 '''@app.route('/')
 def index():
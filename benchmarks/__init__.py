@@ -0,0 +1,2 @@
+# benchmarks/__init__.py
+# Load, stress and benchmark scripts; run each with python -m benchmarks.<name>
@@ -0,0 +1,377 @@
+# benchmarks/dataset.py
+# Deterministic synthetic LibraryData dataset for scale testing.
+#
+#   python -m benchmarks.dataset --books 1000000 --readers 100000 --loans 20000000 \
+#       --sqlite-path big.db
+#   python -m benchmarks.dataset --backend sqlserver --books 1000000 ...   (DB_CONN_STR)
+#
+# Generates, from one seed:
+#   * books with a Zipf-skewed category distribution (a few huge
+#     categories, a long tail) and skewed author productivity
+#   * readers with valid bcrypt hashes at the configured cost; reader i's
+#     password is "password-<i mod --distinct-passwords>", so only that many
+#     hashes are computed (across a process pool, with salts drawn from the
+#     seed so the hashes are reproducible too)
+#   * BorrowHistory in time order over --days: returned loans with
+#     log-normal loan lengths (some past the 14-day due date), plus a set of
+#     open loans from the last four weeks - one per copy, at most
+#     MAX_BORROW_LIMIT per reader - with Books.Available/DueDate and
+#     LoanDueSummary kept consistent with them
+#
+# Rows are streamed in --batch-size chunks through the fast bulk path of
+# each backend: pyodbc fast_executemany with IDENTITY_INSERT on SQL Server,
+# executemany inside one transaction per chunk on SQLite. IDs are assigned
+# after the current maximum, so the same seed and --anchor reproduce the
+# same rows on an empty database.
+import argparse
+import bisect
+import itertools
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+
+import bcrypt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import LOAN_DAYS  # noqa: E402
+
+MAX_OPEN_LOANS = 3   # transaction.MAX_BORROW_LIMIT
+
+CATEGORIES = [
+    'Fiction', 'Science Fiction', 'Fantasy', 'Technology', 'History', 'Biography',
+    'Mystery', 'Romance', 'Science', 'Business', 'Children', 'Poetry', 'Travel',
+    'Art', 'Philosophy', 'Religion', 'Cooking', 'Health', 'Law', 'Reference',
+]
+
+WORDS = [
+    'river', 'shadow', 'garden', 'empire', 'python', 'winter', 'ocean', 'secret',
+    'machine', 'history', 'mountain', 'silver', 'journey', 'city', 'storm', 'light',
+    'night', 'stone', 'glass', 'kingdom', 'data', 'forest', 'letters', 'fire',
+    'island', 'code', 'memory', 'atlas', 'harvest', 'signal', 'north', 'crown',
+]
+NAMES = ['Tan', 'Lim', 'Wong', 'Lee', 'Ng', 'Ong', 'Chan', 'Kumar', 'Rahman', 'Ismail',
+         'Smith', 'Garcia', 'Ito', 'Khan', 'Novak', 'Silva', 'Okafor', 'Berg']
+
+# bcrypt's base64 alphabet; a 22-character salt carries 128 bits, so its
+# last character can only be one of four values
+SALT_ALPHABET = './ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789'
+SALT_LAST = '.Oeu'
+
+
+class DatasetSpec:
+    def __init__(self, books=10000, readers=1000, loans=100000, seed=1, rounds=12,
+                 distinct_passwords=64, open_loan_ratio=0.02, days=730, anchor=None,
+                 prefix='reader_', category_skew=1.1, batch_size=10000):
+        self.books = books
+        self.readers = readers
+        self.loans = loans
+        self.seed = seed
+        self.rounds = rounds
+        self.distinct_passwords = max(1, distinct_passwords)
+        self.open_loan_ratio = open_loan_ratio
+        self.days = days
+        # Loan dates are laid out backwards from here (midnight, for repeatability)
+        self.anchor = anchor or datetime.combine(date.today(), datetime.min.time())
+        self.prefix = prefix
+        self.category_skew = category_skew
+        self.batch_size = batch_size
+
+    def rng(self, part):
+        # One stream per table, so changing one volume leaves the others alone
+        return random.Random(f'{self.seed}:{part}')
+
+
+def reader_password(index, spec):
+    return f'password-{index % spec.distinct_passwords}'
+
+
+def zipf_cumulative(n, skew):
+    return list(itertools.accumulate(1 / (rank + 1) ** skew for rank in range(n)))
+
+
+def pick(rng, cumulative):
+    """Index drawn with the weights behind `cumulative` (as random.choices)."""
+    return bisect.bisect(cumulative, rng.random() * cumulative[-1])
+
+
+def bcrypt_salt(rng, rounds):
+    body = ''.join(rng.choice(SALT_ALPHABET) for _ in range(21)) + rng.choice(SALT_LAST)
+    return f'$2b${rounds:02d}${body}'.encode()
+
+
+def _hashpw(item):
+    password, salt = item
+    return bcrypt.hashpw(password.encode(), salt).decode()
+
+
+def password_hashes(spec, workers=None):
+    rng = spec.rng('salts')
+    items = [(f'password-{i}', bcrypt_salt(rng, spec.rounds))
+             for i in range(spec.distinct_passwords)]
+    if len(items) == 1 or workers == 0:
+        return [_hashpw(item) for item in items]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_hashpw, items, chunksize=4))
+
+
+# =========================
+# BULK LOADING
+# =========================
+class BulkLoader:
+    """Chunked inserts with explicit IDs through the backend's fast path."""
+
+    def __init__(self, conn, dialect):
+        self.conn = conn
+        self.dialect = dialect
+        self.cursor = conn.cursor()
+        if dialect == 'sqlserver':
+            self.cursor.fast_executemany = True
+        else:
+            self.cursor.execute("PRAGMA LibraryData.synchronous = OFF")
+
+    def next_id(self, table, column):
+        self.cursor.execute(f"SELECT MAX({column}) FROM LibraryData.{table}")
+        return (self.cursor.fetchone()[0] or 0) + 1
+
+    def load(self, table, columns, rows, batch_size, progress=None):
+        sql = (f"INSERT INTO LibraryData.{table} ({', '.join(columns)}) "
+               f"VALUES ({', '.join('?' * len(columns))})")
+        if self.dialect == 'sqlserver':
+            self.cursor.execute(f"SET IDENTITY_INSERT LibraryData.{table} ON")
+        total = 0
+        try:
+            for chunk in _chunks(rows, batch_size):
+                if self.dialect == 'sqlite':
+                    self.cursor.execute("BEGIN")
+                self.cursor.executemany(sql, chunk)
+                self.conn.commit()
+                total += len(chunk)
+                if progress:
+                    progress(table, total)
+        finally:
+            if self.dialect == 'sqlserver':
+                self.cursor.execute(f"SET IDENTITY_INSERT LibraryData.{table} OFF")
+                self.conn.commit()
+        return total
+
+    def finish(self):
+        # Derived state: LoanDueSummary from the open loans, and a new
+        # catalog version so app caches reload
+        due_day = {
+            'sqlserver': "CAST(DATEADD(day, 14, bh.BorrowDate) AS DATE)",
+            'sqlite': "date(bh.BorrowDate, '+14 days')",
+        }[self.dialect]
+        category = "COALESCE(b.Category, '')"
+        self.cursor.execute("DELETE FROM LibraryData.LoanDueSummary")
+        self.cursor.execute(f"""
+            INSERT INTO LibraryData.LoanDueSummary (DueDay, AccountID, Category, OpenLoans)
+            SELECT {due_day}, bh.AccountID, {category}, COUNT(*)
+            FROM LibraryData.BorrowHistory bh
+            JOIN LibraryData.Books b ON b.BookID = bh.BookID
+            WHERE bh.ReturnDate IS NULL
+            GROUP BY {due_day}, bh.AccountID, {category}
+        """)
+        self.cursor.execute("UPDATE LibraryData.CatalogVersion SET Version = Version + 1")
+        self.conn.commit()
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# =========================
+# GENERATION
+# =========================
+def plan_open_loans(spec):
+    """{book_index: (reader_index, borrow_date)} for the loans still out."""
+    rng = spec.rng('open_loans')
+    count = min(int(spec.books * spec.open_loan_ratio), spec.readers * MAX_OPEN_LOANS,
+                spec.loans)
+    books = rng.sample(range(spec.books), count)
+    slots = rng.sample(range(spec.readers * MAX_OPEN_LOANS), count)
+    loans = {}
+    for book, slot in zip(books, slots):
+        # Borrowed within the last four weeks, so about half are overdue
+        borrowed = spec.anchor - timedelta(seconds=rng.randrange(28 * 86400))
+        loans[book] = (slot // MAX_OPEN_LOANS, borrowed)
+    return loans
+
+
+def book_rows(spec, first_id, open_loans):
+    rng = spec.rng('books')
+    categories = zipf_cumulative(len(CATEGORIES), spec.category_skew)
+    authors = zipf_cumulative(max(1, spec.books // 8), 1.0)
+    for i in range(spec.books):
+        title = ' '.join(rng.choice(WORDS).title() for _ in range(rng.randint(2, 4)))
+        author_no = pick(rng, authors)
+        author = f'{NAMES[author_no % len(NAMES)]} {author_no:06d}'
+        loan = open_loans.get(i)
+        yield (
+            first_id + i,
+            f'{title} {i}',
+            author,
+            CATEGORIES[pick(rng, categories)],
+            0 if loan else 1,
+            loan[1] + timedelta(days=LOAN_DAYS) if loan else None,
+        )
+
+
+def account_rows(spec, first_id, hashes):
+    rng = spec.rng('accounts')
+    width = len(str(spec.readers))
+    for i in range(spec.readers):
+        created = spec.anchor - timedelta(seconds=rng.randrange(60 * 86400))
+        yield (first_id + i, f'{spec.prefix}{i:0{width}d}',
+               hashes[i % len(hashes)], 'Reader', created, 0)
+
+
+def history_rows(spec, first_id, first_account, first_book, open_loans):
+    rng = spec.rng('history')
+    readers = zipf_cumulative(spec.readers, 0.8)    # some readers borrow far more
+    books = zipf_cumulative(spec.books, 0.9)        # and some titles are far more popular
+    start = spec.anchor - timedelta(days=spec.days)
+    span = spec.days * 86400 - 86400                # closed loans end before the anchor
+    closed = max(0, spec.loans - len(open_loans))
+
+    # Closed loans in time order: each chunk covers the next slice of the span.
+    # Hot loop - about 20M iterations at full scale - so lookups are local.
+    random_, lognorm, bisect_ = rng.random, rng.lognormvariate, bisect.bisect
+    reader_total, book_total = readers[-1], books[-1]
+    median = math.log(9)                            # median loan ~9 days,
+    latest = spec.anchor - timedelta(seconds=1)     # the tail past the due date
+    borrow_id = first_id
+    chunk = 50000
+    for offset in range(0, closed, chunk):
+        n = min(chunk, closed - offset)
+        lo, hi = span * offset / closed, span * (offset + n) / closed
+        for seconds in sorted(lo + (hi - lo) * random_() for _ in range(n)):
+            borrowed = start + timedelta(seconds=seconds)
+            returned = borrowed + timedelta(days=min(60.0, lognorm(median, 0.5)))
+            yield (borrow_id,
+                   first_account + bisect_(readers, random_() * reader_total),
+                   first_book + bisect_(books, random_() * book_total),
+                   borrowed, returned if returned < latest else latest, 'return')
+            borrow_id += 1
+
+    for book, (reader, borrowed) in sorted(open_loans.items(), key=lambda item: item[1][1]):
+        yield (borrow_id, first_account + reader, first_book + book, borrowed, None, 'borrow')
+        borrow_id += 1
+
+
+def generate(conn, dialect, spec, progress=None, workers=None):
+    """Load one dataset through `conn`; returns {table: rows}."""
+    loader = BulkLoader(conn, dialect)
+    first_book = loader.next_id('Books', 'BookID')
+    first_account = loader.next_id('Accounts', 'AccountID')
+    first_borrow = loader.next_id('BorrowHistory', 'BorrowID')
+
+    open_loans = plan_open_loans(spec)
+    counts = {}
+    counts['Books'] = loader.load(
+        'Books', ['BookID', 'Title', 'Author', 'Category', 'Available', 'DueDate'],
+        book_rows(spec, first_book, open_loans), spec.batch_size, progress)
+
+    hashes = password_hashes(spec, workers) if spec.readers else []
+    counts['Accounts'] = loader.load(
+        'Accounts', ['AccountID', 'Username', 'Password', 'Role', 'CreatedDate', 'FailedAttempts'],
+        account_rows(spec, first_account, hashes), spec.batch_size, progress)
+
+    counts['BorrowHistory'] = loader.load(
+        'BorrowHistory', ['BorrowID', 'AccountID', 'BookID', 'BorrowDate', 'ReturnDate', 'Status'],
+        history_rows(spec, first_borrow, first_account, first_book, open_loans)
+        if spec.readers and spec.books else [],
+        spec.batch_size, progress)
+
+    loader.finish()
+    counts['open_loans'] = len(open_loans) if spec.readers and spec.books else 0
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--backend', default='sqlite', choices=['sqlite', 'sqlserver'])
+    parser.add_argument('--sqlite-path', default='dataset.db',
+                        help='SQLite file to create or extend (default: %(default)s)')
+    parser.add_argument('--books', type=int, default=100000)
+    parser.add_argument('--readers', type=int, default=10000)
+    parser.add_argument('--loans', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--rounds', type=int, default=None,
+                        help='bcrypt cost (default: BCRYPT_ROUNDS)')
+    parser.add_argument('--distinct-passwords', type=int, default=64)
+    parser.add_argument('--open-loan-ratio', type=float, default=0.02,
+                        help='share of books currently on loan')
+    parser.add_argument('--days', type=int, default=730, help='history span')
+    parser.add_argument('--anchor', type=date.fromisoformat, default=None,
+                        help='date loans are laid out back from (default: today)')
+    parser.add_argument('--prefix', default='reader_', help='reader username prefix')
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--workers', type=int, default=None, help='bcrypt processes')
+    args = parser.parse_args(argv)
+
+    from app import app
+    from db import get_backend
+
+    app.config['DB_BACKEND'] = args.backend
+    if args.backend == 'sqlite':
+        app.config['DB_SQLITE_PATH'] = args.sqlite_path
+
+    spec = DatasetSpec(
+        books=args.books, readers=args.readers, loans=args.loans, seed=args.seed,
+        rounds=args.rounds or app.config['BCRYPT_ROUNDS'],
+        distinct_passwords=args.distinct_passwords, open_loan_ratio=args.open_loan_ratio,
+        days=args.days,
+        anchor=datetime.combine(args.anchor, datetime.min.time()) if args.anchor else None,
+        prefix=args.prefix, batch_size=args.batch_size,
+    )
+
+    started = time.perf_counter()
+    last = [0.0]
+
+    def progress(table, rows):
+        now = time.perf_counter()
+        if now - last[0] >= 2:
+            last[0] = now
+            print(f'  {table}: {rows} rows ({now - started:.0f}s)', file=sys.stderr)
+
+    with app.app_context():
+        backend = get_backend()
+        conn = backend.connect()
+        try:
+            existing = conn.cursor().execute(
+                "SELECT COUNT(*) FROM LibraryData.Accounts WHERE Username LIKE ?",
+                (args.prefix + '%',)
+            ).fetchone()[0]
+            if existing:
+                print(f'{existing} accounts already use the prefix {args.prefix!r}; '
+                      f'pick another --prefix', file=sys.stderr)
+                return 1
+            counts = generate(conn, backend.name, spec, progress, args.workers)
+        finally:
+            conn.close()
+
+    elapsed = time.perf_counter() - started
+    total = counts['Books'] + counts['Accounts'] + counts['BorrowHistory']
+    print(f"Loaded {counts['Books']} books, {counts['Accounts']} readers, "
+          f"{counts['BorrowHistory']} loans ({counts['open_loans']} open) "
+          f"in {elapsed:.1f}s ({total / elapsed:.0f} rows/s)")
+    print(f"Reader passwords: password-<n mod {spec.distinct_passwords}> "
+          f"(e.g. {spec.prefix}{0:0{len(str(spec.readers))}d} / {reader_password(0, spec)}), "
+          f"bcrypt cost {spec.rounds}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+# benchmarks/index_timing.py
+# Before/after timings for the index migrations in migrations/.
+#
+# Seeds a database with readers, books and borrow history (benchmarks/dataset.py),
+# times the hot queries through the real Repository with no migrations
+# applied, applies the pending migrations, and times them again:
+#
+#   python -m benchmarks.index_timing --books 50000 --readers 5000 --loans 300000
+#   python -m benchmarks.index_timing --json index_timing.json
+#
+# Runs against a throwaway SQLite file by default. With --backend sqlserver
+# it times DB_CONN_STR's existing data (no seeding); the "before" column is
+# only meaningful while migrations are still pending there.
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app  # noqa: E402
+from benchmarks.dataset import DatasetSpec, generate  # noqa: E402
+from db import get_backend  # noqa: E402
+from migrate import MigrationRunner  # noqa: E402
+
+def workload(conn):
+    """{name: fn(repo, rng)} - the hot predicates the migrations target."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT AccountID, Username FROM LibraryData.Accounts WHERE Role = 'Reader'")
+    accounts = cursor.fetchall()
+    cursor.execute("SELECT DISTINCT Category FROM LibraryData.Books WHERE Category IS NOT NULL")
+    categories = [row[0] for row in cursor.fetchall()]
+
+    def open_loan_count(repo, rng):
+        # The borrow-limit check in LibraryData.BorrowBook
+        return repo._fetch_value("""
+            SELECT COUNT(*) FROM LibraryData.BorrowHistory
+            WHERE AccountID = ? AND Status = 'borrow' AND ReturnDate IS NULL
+        """, (rng.choice(accounts)[0],))
+
+    return {
+        'open_loan_count': open_loan_count,
+        'borrowed_books': lambda repo, rng: repo.borrowed_books(rng.choice(accounts)[0]),
+        'get_login': lambda repo, rng: repo.get_login(rng.choice(accounts)[1]),
+        'get_account_id': lambda repo, rng: repo.get_account_id(rng.choice(accounts)[1]),
+        'inventory_by_category': lambda repo, rng: repo.list_inventory_page(
+            sort='title', category=rng.choice(categories), limit=50),
+        'catalog_first_page': lambda repo, rng: repo.search_books(limit=25),
+        'category_summary': lambda repo, rng: repo.catalog_summary(),
+    }
+
+
+def time_queries(repo, queries, repeat, seed_value):
+    results = {}
+    for name, query in queries.items():
+        rng = random.Random(seed_value)
+        query(repo, rng)   # warm up
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            query(repo, rng)
+            samples.append((time.perf_counter() - started) * 1000)
+        samples.sort()
+        results[name] = {
+            'median_ms': round(statistics.median(samples), 4),
+            'p95_ms': round(samples[int(len(samples) * 0.95) - 1], 4),
+        }
+        repo.rollback()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--backend', default='sqlite', choices=['sqlite', 'sqlserver'])
+    parser.add_argument('--readers', type=int, default=2000)
+    parser.add_argument('--books', type=int, default=20000)
+    parser.add_argument('--loans', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=200, help='timed runs per query')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', metavar='PATH', help='also write the report as JSON')
+    args = parser.parse_args(argv)
+
+    app.config['DB_BACKEND'] = args.backend
+    app.config['DB_AUTO_MIGRATE'] = False
+    if args.backend == 'sqlite':
+        app.config['DB_SQLITE_PATH'] = os.path.join(tempfile.mkdtemp(), 'index_timing.db')
+
+    with app.app_context():
+        backend = get_backend()
+        conn = backend.connect()
+        try:
+            if args.backend == 'sqlite':
+                started = time.perf_counter()
+                generate(conn, backend.name, DatasetSpec(
+                    books=args.books, readers=args.readers, loans=args.loans,
+                    seed=args.seed, rounds=4, distinct_passwords=1, prefix='timing_reader_'))
+                print(f'Seeded {args.readers} readers, {args.books} books, '
+                      f'{args.loans} loans in {time.perf_counter() - started:.1f}s')
+
+            repo = backend.repository(conn)
+            queries = workload(conn)
+            before = time_queries(repo, queries, args.repeat, args.seed)
+
+            runner = MigrationRunner(conn, backend.name)
+            applied = runner.run(progress=lambda m, s: print(
+                f'Applied {m.version:04d} {m.description} in {s * 1000:.0f} ms'))
+            if not applied:
+                print('No pending migrations: "before" and "after" are the same schema')
+
+            after = time_queries(repo, queries, args.repeat, args.seed)
+        finally:
+            conn.close()
+
+    print(f'\n{"query":<24}{"before ms":>12}{"after ms":>12}{"speedup":>10}'
+          f'{"before p95":>12}{"after p95":>12}')
+    report = []
+    for name in queries:
+        b, a = before[name], after[name]
+        speedup = b['median_ms'] / a['median_ms'] if a['median_ms'] else None
+        print(f'{name:<24}{b["median_ms"]:>12.3f}{a["median_ms"]:>12.3f}'
+              f'{(f"{speedup:.1f}x" if speedup else "-"):>10}'
+              f'{b["p95_ms"]:>12.3f}{a["p95_ms"]:>12.3f}')
+        report.append({'query': name, 'before': b, 'after': a,
+                       'speedup': round(speedup, 2) if speedup else None})
+
+    if args.json:
+        with open(args.json, 'w') as out:
+            json.dump({
+                'backend': args.backend,
+                'readers': args.readers, 'books': args.books, 'loans': args.loans,
+                'repeat': args.repeat,
+                'migrations': [f'{m.version:04d}_{m.name}' for m, _ in applied],
+                'queries': report,
+            }, out, indent=2)
+        print(f'\nWrote {args.json}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,130 @@
+# benchmarks/live_updates.py
+# Fan-out cost of the live catalog feed (/api/catalog/events).
+#
+# Opens --subscribers idle SSE streams through the real route, then has the
+# librarian toggle a book --changes times and measures, per change, how long
+# the toggle request took (it publishes the delta) and how long until every
+# stream had the event:
+#
+#   python -m benchmarks.live_updates --subscribers 2000 --changes 20
+#
+# Each stream is drained by its own consumer thread here, standing in for a
+# server worker; the feed itself adds no thread per subscriber (they all
+# wait on one Condition). Runs against a throwaway SQLite file.
+import argparse
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app  # noqa: E402
+from live_updates import get_catalog_feed  # noqa: E402
+
+LIBRARIAN = ('librarian', 'pa$$w0rd')
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--subscribers', type=int, default=1000)
+    parser.add_argument('--changes', type=int, default=20, help='books toggled, one at a time')
+    parser.add_argument('--json', metavar='PATH', help='also write the report as JSON')
+    args = parser.parse_args(argv)
+
+    app.config['DB_BACKEND'] = 'sqlite'
+    app.config['DB_SQLITE_PATH'] = os.path.join(tempfile.mkdtemp(), 'live_updates.db')
+    app.config['LIVE_UPDATES_MAX_SUBSCRIBERS'] = args.subscribers
+    app.config['LIVE_UPDATES_HEARTBEAT'] = 60.0
+
+    librarian = app.test_client()
+    librarian.post('/login', data={
+        'username': LIBRARIAN[0], 'password': LIBRARIAN[1], 'role': 'Librarian'})
+
+    # received[change] = arrival times, one per stream
+    received = [[] for _ in range(args.changes)]
+    lock = threading.Lock()
+    threading.stack_size(256 * 1024)
+
+    def drain(response):
+        seen = 0
+        for chunk in response.response:
+            count = chunk.count(b'event: book')
+            if count:
+                now = time.perf_counter()
+                with lock:
+                    for change in range(seen, seen + count):
+                        received[change].append(now)
+                seen += count
+                if seen >= args.changes:
+                    return
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    responses, threads = [], []
+    for _ in range(args.subscribers):
+        response = librarian.get('/api/catalog/events', buffered=False)
+        responses.append(response)
+        next(iter(response.response))   # the retry: preamble
+        thread = threading.Thread(target=drain, args=(response,), daemon=True)
+        thread.start()
+        threads.append(thread)
+    opened = time.perf_counter() - started
+    rss_open = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with app.app_context():
+        print(f'Opened {args.subscribers} streams in {opened:.1f}s '
+              f'({get_catalog_feed().stats()["subscribers"]} subscribed, '
+              f'max RSS +{(rss_open - rss_before) / 1024:.0f} MB incl. consumer threads)')
+
+    publish_ms, fanout_ms = [], []
+    for change in range(args.changes):
+        book_id = change % 4 + 1
+        sent = time.perf_counter()
+        librarian.get(f'/librarian/toggle_status/{book_id}')
+        publish_ms.append((time.perf_counter() - sent) * 1000)
+        deadline = time.time() + 30
+        while len(received[change]) < args.subscribers and time.time() < deadline:
+            time.sleep(0.001)
+        arrivals = received[change]
+        if len(arrivals) < args.subscribers:
+            raise SystemExit(f'Change {change}: only {len(arrivals)} streams got the event')
+        fanout_ms.append((max(arrivals) - sent) * 1000)
+
+    for response in responses:
+        response.close()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    report = {
+        'subscribers': args.subscribers,
+        'changes': args.changes,
+        'toggle_request_ms': {'median': round(statistics.median(publish_ms), 2),
+                              'p95': round(percentile(publish_ms, 0.95), 2)},
+        'all_delivered_ms': {'median': round(statistics.median(fanout_ms), 2),
+                             'p95': round(percentile(fanout_ms, 0.95), 2)},
+    }
+    print(f'toggle request (incl. publish): median {report["toggle_request_ms"]["median"]:.2f} ms, '
+          f'p95 {report["toggle_request_ms"]["p95"]:.2f} ms')
+    print(f'event on every stream:          median {report["all_delivered_ms"]["median"]:.2f} ms, '
+          f'p95 {report["all_delivered_ms"]["p95"]:.2f} ms')
+    with app.app_context():
+        print(f'feed: {get_catalog_feed().stats()}')
+
+    if args.json:
+        with open(args.json, 'w') as out:
+            json.dump(report, out, indent=2)
+        print(f'\nWrote {args.json}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
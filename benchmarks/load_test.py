@@ -0,0 +1,367 @@
+# benchmarks/load_test.py
+# Route-level load test: replays a weighted mix of login, show_books,
+# search, borrow, return and dashboard traffic against the real Flask app
+# and reports throughput and p50/p95/p99 latency per route.
+#
+#   python -m benchmarks.load_test --concurrency 16 --duration 20
+#   python -m benchmarks.load_test --mix show_books=50,search=30,borrow=10,return=10
+#   python -m benchmarks.load_test --transport http --json results.json
+#   python -m benchmarks.load_test --compare results.json   # diff against a baseline
+#
+# Each worker thread is one virtual reader (plus a librarian session for
+# dashboard traffic), logged in before the clock starts. --transport client
+# drives the app through Flask's test client (no sockets, measures the app
+# itself); --transport http serves it on a local threaded WSGI server and
+# goes through real HTTP. Results are written as JSON with the git commit
+# so runs can be compared between commits.
+#
+# Runs against a throwaway, seeded SQLite file by default. With --backend
+# sqlserver it uses DB_CONN_STR and adds load_reader_* accounts and
+# "Load Book *" rows to that database.
+import argparse
+import http.cookiejar
+import json
+import logging
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime
+
+import bcrypt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app  # noqa: E402
+from db import get_repo  # noqa: E402
+
+READER_PASSWORD = 'load-pw'
+LIBRARIAN = ('librarian', 'pa$$w0rd')
+
+DEFAULT_MIX = 'login=5,show_books=35,search=30,borrow=10,return=10,dashboard=10'
+
+# Status each route answers with when it worked
+EXPECTED = {
+    'login': {302},
+    'show_books': {200},
+    'search': {200},
+    'borrow': {302},
+    'return': {302},
+    'dashboard': {200},
+}
+
+WORDS = ['river', 'shadow', 'garden', 'empire', 'python', 'winter', 'ocean', 'secret',
+         'machine', 'history', 'mountain', 'silver', 'journey', 'city', 'storm', 'light']
+CATEGORIES = ['Fiction', 'Science Fiction', 'Fantasy', 'Technology', 'History', 'Poetry']
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in EXPECTED:
+            raise SystemExit(f'Unknown route in --mix: {name!r} (one of {", ".join(EXPECTED)})')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def seed(readers, books, rng):
+    hashed = bcrypt.hashpw(
+        READER_PASSWORD.encode(), bcrypt.gensalt(app.config['BCRYPT_ROUNDS'])
+    ).decode()
+    usernames = [f'load_reader_{i}' for i in range(readers)]
+    titles = [
+        (' '.join(rng.choice(WORDS).title() for _ in range(3)) + f' {i}',
+         f'Load Author {i % 50}', rng.choice(CATEGORIES))
+        for i in range(books)
+    ]
+
+    with app.app_context():
+        repo = get_repo()
+        existing = {u.casefold() for u in repo.existing_usernames(usernames)}
+        repo.create_reader_accounts([(u, hashed) for u in usernames if u.casefold() not in existing])
+        repo.commit()
+        repo.add_books([(f'Load Book {title}', author, category)
+                        for title, author, category in titles])
+        repo.commit()
+        book_ids = [row['BookID'] for row in repo.list_inventory()
+                    if row['Title'].startswith('Load Book ')]
+
+    return usernames, book_ids
+
+
+# =========================
+# TRANSPORTS
+# =========================
+class TestClientSession:
+    def __init__(self):
+        self._client = app.test_client()
+
+    def request(self, method, path, data=None):
+        response = self._client.open(path, method=method, data=data)
+        response.close()
+        return response.status_code
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpSession:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self._opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect()
+        )
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data else None
+        req = urllib.request.Request(self.base_url + path, data=body, method=method)
+        try:
+            with self._opener.open(req, timeout=60) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code
+
+
+def start_server():
+    from werkzeug.serving import make_server
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)   # no per-request access log
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+# =========================
+# VIRTUAL USERS
+# =========================
+class VirtualUser:
+    def __init__(self, username, book_ids, new_session, rng):
+        self.username = username
+        self.book_ids = book_ids
+        self.rng = rng
+        self.reader = new_session()
+        self.librarian = new_session()
+        self.borrowed = []
+
+    def setup(self):
+        self.login()
+        self.librarian.request('POST', '/login', {
+            'username': LIBRARIAN[0], 'password': LIBRARIAN[1], 'role': 'Librarian'
+        })
+
+    def login(self):
+        return self.reader.request('POST', '/login', {
+            'username': self.username, 'password': READER_PASSWORD, 'role': 'Reader'
+        })
+
+    def show_books(self):
+        return self.reader.request('GET', f'/books/{self.username}')
+
+    def search(self):
+        query = urllib.parse.urlencode({
+            'query': self.rng.choice(WORDS),
+            'category': self.rng.choice(['All', 'All'] + CATEGORIES),
+        })
+        return self.reader.request('GET', f'/search/{self.username}?{query}')
+
+    def borrow(self):
+        book_id = self.rng.choice(self.book_ids)
+        status = self.reader.request('GET', f'/borrow/{self.username}/{book_id}')
+        if len(self.borrowed) < 3:
+            self.borrowed.append(book_id)
+        return status
+
+    def return_(self):
+        book_id = self.borrowed.pop(0) if self.borrowed else self.rng.choice(self.book_ids)
+        return self.reader.request('GET', f'/return/{self.username}/{book_id}')
+
+    def dashboard(self):
+        return self.librarian.request('GET', '/librarian/dashboard')
+
+    def run(self, route):
+        return getattr(self, 'return_' if route == 'return' else route)()
+
+
+def percentile(samples, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not samples:
+        return None
+    return samples[max(0, math.ceil(p / 100 * len(samples)) - 1)]
+
+
+def summarise(samples, errors, elapsed):
+    samples = sorted(samples)
+    ms = lambda value: round(value * 1000, 3) if value is not None else None  # noqa: E731
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        'mean_ms': ms(sum(samples) / len(samples)) if samples else None,
+        'p50_ms': ms(percentile(samples, 50)),
+        'p95_ms': ms(percentile(samples, 95)),
+        'p99_ms': ms(percentile(samples, 99)),
+        'max_ms': ms(samples[-1]) if samples else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline_path, results):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f'\nvs {baseline_path} (commit {baseline["meta"].get("commit")}):')
+    print(f'{"route":<12}{"rps":>10}{"Δrps":>9}{"p95 ms":>10}{"Δp95":>9}')
+    for route, now in list(results['routes'].items()) + [('overall', results['overall'])]:
+        then = baseline['routes'].get(route) if route != 'overall' else baseline['overall']
+        if not then:
+            continue
+
+        def delta(a, b):
+            return f'{(a - b) / b * 100:+.0f}%' if a is not None and b else '-'
+
+        print(f'{route:<12}{now["throughput_rps"]:>10.1f}'
+              f'{delta(now["throughput_rps"], then["throughput_rps"]):>9}'
+              f'{(now["p95_ms"] or 0):>10.2f}{delta(now["p95_ms"], then["p95_ms"]):>9}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--backend', default='sqlite', choices=['sqlite', 'sqlserver'])
+    parser.add_argument('--transport', default='client', choices=['client', 'http'])
+    parser.add_argument('--concurrency', type=int, default=8, help='worker threads')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds of load')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='route=weight,... (default: %(default)s)')
+    parser.add_argument('--books', type=int, default=2000)
+    parser.add_argument('--bcrypt-rounds', type=int, default=4,
+                        help='cost for the seeded readers and logins (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', metavar='PATH', help='write results as JSON')
+    parser.add_argument('--compare', metavar='PATH', help='baseline JSON to diff against')
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    routes, weights = list(mix), list(mix.values())
+
+    app.config['DB_BACKEND'] = args.backend
+    if args.backend == 'sqlite':
+        app.config['DB_SQLITE_PATH'] = os.path.join(tempfile.mkdtemp(), 'load_test.db')
+    app.config['DB_POOL_SIZE'] = max(app.config['DB_POOL_SIZE'], args.concurrency * 2)
+    app.config['DB_POOL_TIMEOUT'] = 30.0
+    app.config['BCRYPT_ROUNDS'] = args.bcrypt_rounds
+    # Every virtual user logs in from the same address
+    app.config['LOGIN_THROTTLE_IP_BURST'] = 10 ** 9
+    app.config['LOGIN_THROTTLE_IP_PER_MINUTE'] = 10 ** 9
+
+    rng = random.Random(args.seed)
+    usernames, book_ids = seed(args.concurrency, args.books, rng)
+
+    server = None
+    if args.transport == 'http':
+        server, base_url = start_server()
+        new_session = lambda: HttpSession(base_url)  # noqa: E731
+    else:
+        new_session = TestClientSession
+
+    users = [VirtualUser(u, book_ids, new_session, random.Random(args.seed + i))
+             for i, u in enumerate(usernames)]
+    setup_threads = [threading.Thread(target=u.setup) for u in users]
+    for thread in setup_threads:
+        thread.start()
+    for thread in setup_threads:
+        thread.join()
+
+    samples = {route: [] for route in routes}
+    errors = {route: 0 for route in routes}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+
+    def work(user):
+        local = {route: [] for route in routes}
+        failed = {route: 0 for route in routes}
+        while time.perf_counter() < deadline:
+            route = user.rng.choices(routes, weights)[0]
+            started = time.perf_counter()
+            try:
+                status = user.run(route)
+            except Exception:
+                status = None
+            local[route].append(time.perf_counter() - started)
+            if status not in EXPECTED[route]:
+                failed[route] += 1
+        with lock:
+            for route in routes:
+                samples[route].extend(local[route])
+                errors[route] += failed[route]
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=work, args=(u,)) for u in users]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    if server is not None:
+        server.shutdown()
+
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'backend': args.backend,
+            'transport': args.transport,
+            'concurrency': args.concurrency,
+            'duration_s': round(elapsed, 3),
+            'mix': mix,
+            'books': args.books,
+            'bcrypt_rounds': args.bcrypt_rounds,
+            'seed': args.seed,
+        },
+        'routes': {route: summarise(samples[route], errors[route], elapsed) for route in routes},
+        'overall': summarise([s for route in routes for s in samples[route]],
+                             sum(errors.values()), elapsed),
+    }
+
+    print(f'{args.concurrency} users, {args.transport} transport, {elapsed:.1f}s, '
+          f'commit {results["meta"]["commit"]}')
+    print(f'{"route":<12}{"requests":>10}{"errors":>8}{"rps":>10}'
+          f'{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}')
+    for route, r in list(results['routes'].items()) + [('overall', results['overall'])]:
+        if not r['requests']:
+            continue
+        print(f'{route:<12}{r["requests"]:>10}{r["errors"]:>8}{r["throughput_rps"]:>10.1f}'
+              f'{r["p50_ms"]:>10.2f}{r["p95_ms"]:>10.2f}{r["p99_ms"]:>10.2f}')
+
+    if args.json:
+        with open(args.json, 'w') as out:
+            json.dump(results, out, indent=2)
+        print(f'\nWrote {args.json}')
+    if args.compare:
+        compare(args.compare, results)
+
+    return 1 if results['overall']['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
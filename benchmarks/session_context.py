@@ -0,0 +1,117 @@
+# benchmarks/session_context.py
+# What setting SESSION_CONTEXT costs a reader request.
+#
+# Logs one reader in and replays show_books and search, alternating
+# DB_SESSION_CONTEXT on and off request by request (so both halves see the
+# same cache and server state), and reports median/p95 latency, round trips
+# per request and the pool's context resets:
+#
+#   python -m benchmarks.session_context --backend sqlserver --requests 2000
+#
+# The context call rides in the same batch as the request's first statement,
+# so "on" should show the same round trips as "off"; the clear on release is
+# one extra statement at teardown, after the response has been built, and
+# is included in the measured latency. SQLite has no session context, so the
+# default backend only checks that the switch costs nothing there.
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app  # noqa: E402
+from benchmarks.load_test import READER_PASSWORD, WORDS, seed  # noqa: E402
+from db import get_pool  # noqa: E402
+
+ROUND_TRIPS = re.compile(r'(\d+) round trips')
+
+
+def replay(client, username, requests, rng):
+    """{'on'/'off': {'ms': [...], 'round_trips': [...]}} for alternating requests."""
+    samples = {mode: {'ms': [], 'round_trips': []} for mode in ('on', 'off')}
+    for i in range(requests):
+        mode = 'on' if i % 2 == 0 else 'off'
+        app.config['DB_SESSION_CONTEXT'] = mode == 'on'
+        if rng.random() < 0.5:
+            path = f'/books/{username}'
+        else:
+            path = f'/search/{username}?query={rng.choice(WORDS)}'
+        started = time.perf_counter()
+        response = client.get(path)   # includes teardown, where the context is cleared
+        elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code != 200:
+            raise SystemExit(f'{path} answered {response.status_code}')
+        match = ROUND_TRIPS.search(response.headers.get('Server-Timing', ''))
+        samples[mode]['ms'].append(elapsed)
+        samples[mode]['round_trips'].append(int(match.group(1)) if match else 0)
+    return samples
+
+
+def summarise(sample):
+    ms = sorted(sample['ms'])
+    return {
+        'requests': len(ms),
+        'median_ms': round(statistics.median(ms), 3),
+        'p95_ms': round(ms[max(int(len(ms) * 0.95) - 1, 0)], 3),
+        'avg_round_trips': round(statistics.mean(sample['round_trips']), 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--backend', default='sqlite', choices=['sqlite', 'sqlserver'])
+    parser.add_argument('--requests', type=int, default=1000, help='timed requests (half each way)')
+    parser.add_argument('--books', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', metavar='PATH', help='also write the report as JSON')
+    args = parser.parse_args(argv)
+
+    app.config['DB_BACKEND'] = args.backend
+    if args.backend == 'sqlite':
+        app.config['DB_SQLITE_PATH'] = os.path.join(tempfile.mkdtemp(), 'session_context.db')
+    app.config['BCRYPT_ROUNDS'] = 4
+
+    rng = random.Random(args.seed)
+    (username,), _ = seed(1, args.books, rng)
+
+    client = app.test_client()
+    response = client.post('/login', data={
+        'username': username, 'password': READER_PASSWORD, 'role': 'Reader'})
+    if response.status_code != 302:
+        raise SystemExit(f'Login failed for {username}')
+
+    replay(client, username, 50, rng)   # warm up the pool and caches
+    with app.app_context():
+        resets_before = get_pool().stats()['resets']
+    samples = replay(client, username, args.requests, rng)
+    with app.app_context():
+        resets = get_pool().stats()['resets'] - resets_before
+
+    on, off = summarise(samples['on']), summarise(samples['off'])
+    print(f'{"":<6}{"requests":>10}{"median ms":>12}{"p95 ms":>10}{"round trips":>13}')
+    for mode, row in (('off', off), ('on', on)):
+        print(f'{mode:<6}{row["requests"]:>10}{row["median_ms"]:>12.3f}'
+              f'{row["p95_ms"]:>10.3f}{row["avg_round_trips"]:>13.2f}')
+    overhead = on['median_ms'] - off['median_ms']
+    print(f'\nMedian cost of the session context: {overhead * 1000:+.0f} us per request, '
+          f'{resets} context resets on release')
+    if args.backend == 'sqlite':
+        print('(SQLite has no session context: both halves should match)')
+
+    if args.json:
+        with open(args.json, 'w') as out:
+            json.dump({'backend': args.backend, 'off': off, 'on': on,
+                       'overhead_median_ms': round(overhead, 3), 'resets': resets},
+                      out, indent=2)
+        print(f'\nWrote {args.json}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,184 @@
+# benchmarks/stress_borrow.py
+# Concurrency stress test for borrow/return.
+#
+# Many logged-in readers hammer /borrow and /return on a handful of books
+# through the real Flask routes, then the script checks the invariants the
+# old five-round-trip borrow could break:
+#   * no book has more than one open loan (no double borrow)
+#   * no reader holds more than MAX_BORROW_LIMIT open loans
+#   * Books.Available agrees with the open loans
+# Exits non-zero if any invariant is violated.
+#
+#   python -m benchmarks.stress_borrow --readers 40 --books 5 --threads 16
+#
+# Runs against a throwaway SQLite file by default. With --backend sqlserver
+# it uses DB_CONN_STR and creates stress_reader_* accounts and
+# "Stress Book *" rows in that database.
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import bcrypt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app  # noqa: E402
+from db import get_backend, get_repo  # noqa: E402
+from transaction import MAX_BORROW_LIMIT  # noqa: E402
+
+READER_PASSWORD = 'stress-pw'
+
+
+def seed(readers, books):
+    hashed = bcrypt.hashpw(
+        READER_PASSWORD.encode(), bcrypt.gensalt(app.config['BCRYPT_ROUNDS'])
+    ).decode()
+    usernames = [f'stress_reader_{i}' for i in range(readers)]
+
+    with app.app_context():
+        repo = get_repo()
+        existing = {m['Username'] for m in repo.list_members()}
+        for username in usernames:
+            if username not in existing:
+                repo.create_reader_account(username, hashed)
+        book_ids = [
+            repo.add_book(f'Stress Book {i}', 'Stress Author', 'Stress')
+            for i in range(books)
+        ]
+        repo.commit()
+
+    return usernames, book_ids
+
+
+def worker(username, book_ids, rounds, seed_value, errors):
+    rng = random.Random(seed_value)
+    client = app.test_client()
+    client.post('/login', data={
+        'username': username, 'password': READER_PASSWORD, 'role': 'Reader'
+    })
+
+    for _ in range(rounds):
+        book_id = rng.choice(book_ids)
+        action = 'borrow' if rng.random() < 0.6 else 'return'
+        response = client.get(f'/{action}/{username}/{book_id}')
+        if response.status_code != 302:
+            errors.append(f'{action} {username}/{book_id}: HTTP {response.status_code}')
+
+
+def check_invariants(book_ids):
+    placeholders = ', '.join('?' * len(book_ids))
+    problems = []
+
+    with app.app_context():
+        conn = get_backend().connect()
+        cursor = conn.cursor()
+
+        cursor.execute(f"""
+            SELECT BookID, COUNT(*)
+            FROM LibraryData.BorrowHistory
+            WHERE Status = 'borrow' AND ReturnDate IS NULL
+              AND BookID IN ({placeholders})
+            GROUP BY BookID
+            HAVING COUNT(*) > 1
+        """, book_ids)
+        for book_id, loans in cursor.fetchall():
+            problems.append(f'book {book_id} has {loans} open loans')
+
+        cursor.execute("""
+            SELECT a.Username, COUNT(*)
+            FROM LibraryData.BorrowHistory bh
+            JOIN LibraryData.Accounts a ON a.AccountID = bh.AccountID
+            WHERE bh.Status = 'borrow' AND bh.ReturnDate IS NULL
+            GROUP BY a.Username
+            HAVING COUNT(*) > ?
+        """, (MAX_BORROW_LIMIT,))
+        for username, loans in cursor.fetchall():
+            problems.append(f'{username} holds {loans} open loans')
+
+        cursor.execute(f"""
+            SELECT b.BookID, b.Available,
+                   (SELECT COUNT(*) FROM LibraryData.BorrowHistory bh
+                    WHERE bh.BookID = b.BookID
+                      AND bh.Status = 'borrow' AND bh.ReturnDate IS NULL)
+            FROM LibraryData.Books b
+            WHERE b.BookID IN ({placeholders})
+        """, book_ids)
+        for book_id, available, loans in cursor.fetchall():
+            if bool(available) == bool(loans):
+                problems.append(f'book {book_id}: Available={available} with {loans} open loans')
+
+        cursor.execute(f"""
+            SELECT COUNT(*) FROM LibraryData.BorrowHistory
+            WHERE BookID IN ({placeholders})
+        """, book_ids)
+        loans_logged = cursor.fetchone()[0]
+        conn.close()
+
+    return problems, loans_logged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--backend', default='sqlite', choices=['sqlite', 'sqlserver'])
+    parser.add_argument('--readers', type=int, default=40)
+    parser.add_argument('--books', type=int, default=5)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--rounds', type=int, default=50, help='requests per reader')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    app.config['DB_BACKEND'] = args.backend
+    if args.backend == 'sqlite':
+        app.config['DB_SQLITE_PATH'] = os.path.join(tempfile.mkdtemp(), 'stress.db')
+    app.config['DB_POOL_SIZE'] = max(app.config['DB_POOL_SIZE'], args.threads)
+    app.config['DB_POOL_TIMEOUT'] = 30.0
+    # Cheap hashes: this measures borrow/return, not bcrypt
+    app.config['BCRYPT_ROUNDS'] = 4
+    # Every simulated reader logs in from the same address
+    app.config['LOGIN_THROTTLE_IP_BURST'] = args.readers + 1
+
+    usernames, book_ids = seed(args.readers, args.books)
+
+    errors = []
+    pending = list(enumerate(usernames))
+    lock = threading.Lock()
+
+    def run():
+        while True:
+            with lock:
+                if not pending:
+                    return
+                index, username = pending.pop()
+            worker(username, book_ids, args.rounds, args.seed + index, errors)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=run) for _ in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    problems, loans_logged = check_invariants(book_ids)
+    requests_sent = args.readers * args.rounds
+
+    print(f'{requests_sent} borrow/return requests from {args.readers} readers '
+          f'on {args.threads} threads in {elapsed:.2f}s '
+          f'({requests_sent / elapsed:.0f} req/s); {loans_logged} loans recorded')
+    for error in errors[:20]:
+        print('ERROR', error)
+    for problem in problems:
+        print('VIOLATION', problem)
+
+    if errors or problems:
+        return 1
+    print('OK: no double borrows, limits respected, availability consistent')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,150 @@
+# bulk_import.py
+# Bulk catalog import from CSV or JSON Lines.
+#
+# The upload is parsed as a stream (Werkzeug spools large uploads to disk),
+# each row is validated, and valid rows go to the database in batches of
+# IMPORT_BATCH_SIZE through Repository.add_books - one table-valued-parameter
+# call to LibraryData.AddBooks on SQL Server - with a commit per batch. If a
+# batch is rejected by the database it is retried row by row so the bad rows
+# can be reported without losing the rest. The search index and the category
+# cache are refreshed once by the caller when the import finishes.
+#
+# Expected fields (CSV header or JSON keys, case-insensitive):
+#   title, author, category
+import codecs
+import csv
+import json
+import time
+
+# Column widths in LibraryData.Books
+FIELD_LIMITS = {'title': 255, 'author': 255, 'category': 100}
+
+# Keep the report bounded however broken the upload is
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.batches = 0
+        self.failed = 0
+        self.errors = []   # [(line, message)]
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'inserted': self.inserted,
+            'failed': self.failed,
+            'batches': self.batches,
+            'seconds': round(self.elapsed, 3),
+            'errors': [{'line': line, 'error': msg} for line, msg in self.errors],
+            'errors_truncated': self.failed > len(self.errors),
+        }
+
+
+# =========================
+# PARSING
+# =========================
+def detect_format(filename, requested=None):
+    if requested in ('csv', 'jsonl'):
+        return requested
+    name = (filename or '').lower()
+    if name.endswith(('.jsonl', '.ndjson', '.json')):
+        return 'jsonl'
+    return 'csv'
+
+
+def iter_records(stream, fmt):
+    """Yield (line_number, record_dict_or_None, error_or_None) lazily."""
+    text = codecs.getreader('utf-8-sig')(stream, errors='replace')
+
+    if fmt == 'jsonl':
+        for line_no, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_no, None, f"invalid JSON: {e.msg}"
+                continue
+            if not isinstance(record, dict):
+                yield line_no, None, "expected a JSON object"
+                continue
+            yield line_no, record, None
+        return
+
+    reader = csv.DictReader(text)
+    for record in reader:
+        # Header is line 1; line_num also accounts for quoted newlines
+        yield reader.line_num, record, None
+
+
+def validate(record):
+    """(title, author, category) from a raw record, or raise ValueError."""
+    fields = {str(k).strip().lower(): v for k, v in record.items() if k is not None}
+    row = []
+    for name, limit in FIELD_LIMITS.items():
+        value = fields.get(name)
+        value = '' if value is None else str(value).strip()
+        if not value:
+            raise ValueError(f"missing {name}")
+        if len(value) > limit:
+            raise ValueError(f"{name} longer than {limit} characters")
+        row.append(value)
+    return tuple(row)
+
+
+# =========================
+# IMPORT
+# =========================
+def import_books(repo, stream, fmt='csv', batch_size=1000):
+    report = ImportReport()
+    batch, lines = [], []
+
+    for line_no, record, error in iter_records(stream, fmt):
+        report.rows += 1
+        if error is None:
+            try:
+                batch.append(validate(record))
+                lines.append(line_no)
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            report.error(line_no, error)
+
+        if len(batch) >= batch_size:
+            _flush(repo, batch, lines, report)
+            batch, lines = [], []
+
+    if batch:
+        _flush(repo, batch, lines, report)
+
+    report.elapsed = time.perf_counter() - report.started
+    return report
+
+
+def _flush(repo, batch, lines, report):
+    report.batches += 1
+    try:
+        report.inserted += repo.add_books(batch)
+        repo.commit()
+        return
+    except Exception:
+        repo.rollback()
+
+    # Isolate the offending rows
+    for line_no, row in zip(lines, batch):
+        try:
+            report.inserted += repo.add_books([row])
+            repo.commit()
+        except Exception as e:
+            repo.rollback()
+            report.error(line_no, str(e))
@@ -0,0 +1,120 @@
+# catalog_cache.py
+# Versioned cache for catalog metadata: the category list, per-category
+# counts and the total/available book counts.
+#
+# The whole snapshot comes from one GROUP BY over LibraryData.Books and is
+# tagged with LibraryData.CatalogVersion, which every catalog-changing
+# procedure bumps. Changes made through this app invalidate the entry
+# straight away; once an entry is older than CATALOG_METADATA_TTL the next
+# reader compares the stored version with the database's (a one-row read)
+# and only reloads when it moved, which catches other workers and edits
+# made outside the app.
+#
+# Borrows and returns don't invalidate: they can't change the category
+# list, and dropping the snapshot on every loan would rerun the GROUP BY on
+# nearly every page view. The available counts from loans therefore lag by
+# at most CATALOG_METADATA_TTL (loans bump the version, so the revalidation
+# picks them up).
+import threading
+import time
+
+from flask import current_app
+
+
+class MetadataCache:
+    def __init__(self, ttl=60.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entry = None   # (version, snapshot, checked_at)
+        self._stats = {
+            "hits": 0,           # served without touching the database
+            "revalidations": 0,  # TTL expired but the version was unchanged
+            "misses": 0,         # snapshot (re)loaded from the database
+            "invalidations": 0,  # dropped after a change made by this app
+        }
+
+    def get(self, repo, version=None):
+        """The snapshot; `version` is the CatalogVersion if the caller has
+        already read it (saves the revalidation query)."""
+        with self._lock:
+            entry = self._entry
+
+        if entry is not None:
+            cached, snapshot, checked_at = entry
+            if time.monotonic() - checked_at < self.ttl:
+                self._count("hits")
+                return snapshot
+            current = repo.catalog_version() if version is None else version
+            if current == cached:
+                with self._lock:
+                    if self._entry is entry:
+                        self._entry = (cached, snapshot, time.monotonic())
+                    self._stats["revalidations"] += 1
+                return snapshot
+
+        if version is None:
+            version = repo.catalog_version()
+        snapshot = build_snapshot(repo.catalog_summary())
+        with self._lock:
+            # Keep the entry unless something invalidated it mid-load
+            if self._entry is entry:
+                self._entry = (version, snapshot, time.monotonic())
+            self._stats["misses"] += 1
+        return snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._entry = None
+            self._stats["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            data["version"] = self._entry[0] if self._entry else None
+        lookups = data["hits"] + data["revalidations"] + data["misses"]
+        served = data["hits"] + data["revalidations"]
+        data["hit_rate"] = round(served / lookups, 4) if lookups else None
+        return data
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+
+def build_snapshot(summary):
+    per_category = {
+        row['Category']: {'total': row['Total'], 'available': row['Available'] or 0}
+        for row in summary
+    }
+    return {
+        'categories': sorted(cat for cat in per_category if cat is not None),
+        'category_counts': per_category,
+        'total_books': sum(c['total'] for c in per_category.values()),
+        'available_books': sum(c['available'] for c in per_category.values()),
+    }
+
+
+# =========================
+# FLASK INTEGRATION
+# =========================
+_cache_lock = threading.Lock()
+
+
+def get_metadata_cache():
+    app = current_app._get_current_object()
+    cache = app.extensions.get('catalog_metadata')
+    if cache is None:
+        with _cache_lock:
+            cache = app.extensions.get('catalog_metadata')
+            if cache is None:
+                cache = MetadataCache(app.config.get('CATALOG_METADATA_TTL', 60.0))
+                app.extensions['catalog_metadata'] = cache
+    return cache
+
+
+def get_catalog_metadata(repo, version=None):
+    return get_metadata_cache().get(repo, version)
+
+
+def invalidate_catalog_metadata():
+    get_metadata_cache().invalidate()
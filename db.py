@@ -0,0 +1,351 @@
+# db.py
+# Shared, bounded connection pool used by every blueprint.
+#
+# A connection is checked out at most once per request (cached on flask.g)
+# and handed back to the pool by the teardown handler registered in
+# init_app(). Routes talk to the database through get_repo(), which binds the
+# configured storage backend's Repository to that connection. Checkout time,
+# statements and commits are charged to the request's timings
+# (instrumentation.py).
+#
+# Row-level security (Security.fn_reader_rls) filters on
+# SESSION_CONTEXT(N'UserID'). For a logged-in reader the backend's
+# session_context_sql is sent in the same batch as the request's first
+# statement - no extra round trip - and the value is cleared again when the
+# connection goes back to the pool, so pooled connections are shared between
+# readers without one ever seeing another's rows.
+import threading
+import time
+from collections import deque
+
+from flask import current_app, g, has_request_context, session
+
+import instrumentation
+import migrate
+import storage
+
+DEFAULT_CONN_STR = (
+    "Driver={ODBC Driver 18 for SQL Server};"
+    "Server=localhost;"
+    "Database=MMU_Library;"
+    "Trusted_Connection=yes;"
+    "TrustServerCertificate=yes;"
+)
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes free within the checkout timeout."""
+
+
+# =========================
+# CONNECTION POOL
+# =========================
+class ConnectionPool:
+    def __init__(self, connect, max_size=10, timeout=5.0,
+                 max_idle=300.0, ping_after=30.0):
+        self._connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.ping_after = ping_after
+
+        self._idle = deque()        # (conn, last_used), newest on the right
+        self._open = 0              # idle + checked out
+        self._cond = threading.Condition()
+        self._stats = {
+            "hits": 0,       # served from an idle connection
+            "misses": 0,     # had to open a new connection
+            "waits": 0,      # checkout blocked because the pool was full
+            "timeouts": 0,   # checkout gave up waiting
+            "stale": 0,      # idle connection failed the liveness check
+            "evicted": 0,    # closed after sitting idle too long
+            "discarded": 0,  # returned broken and thrown away
+            "resets": 0,     # session state cleared on the way back in
+        }
+        self._wait_time = 0.0
+
+    # ---- checkout ----
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        waited_since = None
+
+        with self._cond:
+            self._evict_idle()
+            while True:
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._open < self.max_size:
+                    self._open += 1
+                    conn, last_used = None, None
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    if waited_since is not None:
+                        self._wait_time += time.monotonic() - waited_since
+                    raise PoolTimeout(
+                        f"No database connection free after {self.timeout}s"
+                    )
+                if waited_since is None:
+                    waited_since = time.monotonic()
+                    self._stats["waits"] += 1
+                self._cond.wait(remaining)
+
+            if waited_since is not None:
+                self._wait_time += time.monotonic() - waited_since
+
+        if conn is not None:
+            if time.monotonic() - last_used < self.ping_after or self._alive(conn):
+                self._count("hits")
+                return conn
+            self._count("stale")
+            self._close_quietly(conn)
+
+        try:
+            conn = instrumentation.blocking(self._connect)
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+        self._count("misses")
+        return conn
+
+    # ---- checkin ----
+    def release(self, conn, reset=None):
+        """Return `conn` to the pool; `reset` is an optional (sql, params)
+        run first to clear per-user session state."""
+        try:
+            if reset is not None:
+                cursor = conn.cursor()
+                instrumentation.blocking(cursor.execute, *reset)
+                cursor.close()
+                self._count("resets")
+            # Never hand uncommitted work to the next request
+            instrumentation.blocking(conn.rollback)
+        except Exception:
+            self._discard(conn)
+            return
+
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._evict_idle()
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            data = dict(self._stats)
+            data.update({
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": self._open - len(self._idle),
+                "max_size": self.max_size,
+                "total_wait_seconds": round(self._wait_time, 4),
+            })
+        checkouts = data["hits"] + data["misses"]
+        data["hit_rate"] = round(data["hits"] / checkouts, 4) if checkouts else None
+        return data
+
+    def close_all(self):
+        with self._cond:
+            while self._idle:
+                conn, _ = self._idle.popleft()
+                self._open -= 1
+                self._close_quietly(conn)
+            self._cond.notify_all()
+
+    # ---- internals ----
+    def _evict_idle(self):
+        # Caller holds the lock. Oldest connections sit on the left.
+        cutoff = time.monotonic() - self.max_idle
+        while self._idle and self._idle[0][1] < cutoff:
+            conn, _ = self._idle.popleft()
+            self._open -= 1
+            self._stats["evicted"] += 1
+            self._close_quietly(conn)
+
+    def _discard(self, conn):
+        self._close_quietly(conn)
+        with self._cond:
+            self._open -= 1
+            self._stats["discarded"] += 1
+            self._cond.notify()
+
+    def _alive(self, conn):
+        try:
+            cursor = conn.cursor()
+            instrumentation.blocking(cursor.execute, "SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _count(self, key):
+        with self._cond:
+            self._stats[key] += 1
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+class PooledConnection:
+    """Per-request handle. close() is a no-op; teardown returns it to the pool.
+
+    With `context_sql` and a `user_id`, the first statement run through the
+    handle carries the session-context call in front of it.
+    """
+
+    def __init__(self, conn, context_sql=None, user_id=None):
+        self._conn = conn
+        self._context_sql = context_sql if user_id is not None else None
+        self._user_id = user_id
+        self._context_pending = self._context_sql is not None
+
+    def cursor(self):
+        cursor = self._conn.cursor()
+        if self._context_pending:
+            cursor = _ContextCursor(cursor, self)
+        return instrumentation.InstrumentedCursor(cursor)
+
+    def context_reset(self):
+        """(sql, params) that clears the session context, if it was set."""
+        if self._context_sql is None or self._context_pending:
+            return None
+        return self._context_sql, (None,)
+
+    def _take_context(self):
+        if not self._context_pending:
+            return None
+        self._context_pending = False
+        return self._context_sql, self._user_id
+
+    def commit(self):
+        instrumentation.commit(self._conn)
+
+    def rollback(self):
+        instrumentation.rollback(self._conn)
+
+    def close(self):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class _ContextCursor:
+    """Prefixes the first statement of a PooledConnection with its pending
+    session-context call."""
+
+    def __init__(self, cursor, owner):
+        object.__setattr__(self, "_cursor", cursor)
+        object.__setattr__(self, "_owner", owner)
+
+    def execute(self, sql, params=()):
+        context = self._owner._take_context()
+        if context is not None:
+            context_sql, user_id = context
+            sql = f"{context_sql}\n{sql}"
+            params = [user_id, *params]
+        return self._cursor.execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        # A parameter array can't carry the prefix; send it on its own
+        context = self._owner._take_context()
+        if context is not None:
+            self._cursor.execute(context[0], (context[1],))
+        return self._cursor.executemany(sql, seq_of_params)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cursor, name, value)
+
+
+# =========================
+# FLASK INTEGRATION
+# =========================
+_pool_lock = threading.Lock()
+
+
+def init_app(app):
+    app.config.setdefault("DB_BACKEND", "sqlserver")
+    app.config.setdefault("DB_CONN_STR", DEFAULT_CONN_STR)
+    app.config.setdefault("DB_SQLITE_PATH", ":memory:")
+    app.config.setdefault("DB_POOL_SIZE", 10)
+    app.config.setdefault("DB_POOL_TIMEOUT", 5.0)
+    app.config.setdefault("DB_POOL_MAX_IDLE", 300.0)
+    app.config.setdefault("DB_POOL_PING_AFTER", 30.0)
+    app.config.setdefault("DB_AUTO_MIGRATE", False)
+    app.config.setdefault("DB_SESSION_CONTEXT", True)
+    app.teardown_appcontext(release_db_connection)
+
+
+def get_backend():
+    get_pool()
+    return current_app.extensions["storage"]
+
+
+def get_pool():
+    # Built lazily so config changes made after import still take effect
+    app = current_app._get_current_object()
+    pool = app.extensions.get("db_pool")
+    if pool is None:
+        with _pool_lock:
+            pool = app.extensions.get("db_pool")
+            if pool is None:
+                backend = storage.create_backend(app.config)
+                backend.setup()
+                if app.config["DB_AUTO_MIGRATE"]:
+                    migrate.apply_pending(backend)
+                pool = ConnectionPool(
+                    backend.connect,
+                    max_size=app.config["DB_POOL_SIZE"],
+                    timeout=app.config["DB_POOL_TIMEOUT"],
+                    max_idle=app.config["DB_POOL_MAX_IDLE"],
+                    ping_after=app.config["DB_POOL_PING_AFTER"],
+                )
+                app.extensions["storage"] = backend
+                app.extensions["db_pool"] = pool
+    return pool
+
+
+def get_db_connection():
+    if "db_conn" not in g:
+        started = time.perf_counter()
+        conn = get_pool().acquire()
+        g.db_conn = PooledConnection(conn, *_session_context())
+        instrumentation.record("conn", time.perf_counter() - started)
+    return g.db_conn
+
+
+def get_repo():
+    if "db_repo" not in g:
+        g.db_repo = get_backend().repository(get_db_connection())
+    return g.db_repo
+
+
+def _session_context():
+    """(context_sql, AccountID) for a logged-in reader, else (None, None)."""
+    context_sql = get_backend().session_context_sql
+    if (context_sql is None or not current_app.config["DB_SESSION_CONTEXT"]
+            or not has_request_context()):
+        return None, None
+    identity = session.get("identity")
+    if not identity or identity.get("role") != "Reader":
+        return None, None
+    return context_sql, identity["account_id"]
+
+
+def release_db_connection(exc=None):
+    g.pop("db_repo", None)
+    conn = g.pop("db_conn", None)
+    if conn is not None:
+        get_pool().release(conn._conn, reset=conn.context_reset())
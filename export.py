@@ -0,0 +1,100 @@
+# export.py
+# Streaming CSV / JSON Lines export of inventory, members and borrow
+# history, for /librarian/export/<dataset> and `flask export-data`.
+#
+# Rows are pulled from the cursor EXPORT_CHUNK_SIZE at a time with fetchmany
+# and encoded chunk by chunk, optionally through an incremental gzip stream,
+# so memory stays flat however large BorrowHistory grows.
+import csv
+import io
+import json
+import sys
+import zlib
+from datetime import date, datetime
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from storage.base import Repository
+
+DATASETS = tuple(Repository.EXPORT_QUERIES)
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat(sep=' ') if isinstance(value, datetime) else value.isoformat()
+    return str(value)
+
+
+def encode_csv(columns, chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    for rows in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+
+def encode_jsonl(columns, chunks):
+    for rows in chunks:
+        yield ''.join(
+            json.dumps(dict(zip(columns, row)), default=_json_default) + '\n'
+            for row in rows
+        )
+
+
+def gzip_stream(pieces):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # 31 = gzip container
+    for piece in pieces:
+        data = compressor.compress(piece.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(repo, dataset, fmt='csv', compress=False, chunk_size=1000):
+    """Generator of str (or gzip bytes) pieces for one dataset."""
+    columns, chunks = repo.export_rows(dataset, chunk_size)
+    encoder = encode_jsonl if fmt == 'jsonl' else encode_csv
+    pieces = encoder(columns, chunks)
+    return gzip_stream(pieces) if compress else pieces
+
+
+def export_filename(dataset, fmt, compress):
+    return f"{dataset}.{fmt}" + (".gz" if compress else "")
+
+
+# =========================
+# CLI
+# =========================
+@click.command('export-data')
+@click.argument('dataset', type=click.Choice(DATASETS))
+@click.option('--format', 'fmt', type=click.Choice(list(FORMATS)), default='csv')
+@click.option('--gzip', 'compress', is_flag=True, help='Compress on the fly.')
+@click.option('-o', '--output', type=click.Path(dir_okay=False), default=None,
+              help='Write to a file instead of stdout.')
+@with_appcontext
+def export_data_command(dataset, fmt, compress, output):
+    """Stream a dataset (inventory, members, borrow_history) as CSV/JSONL."""
+    from db import get_repo, release_db_connection
+
+    chunk_size = current_app.config.get('EXPORT_CHUNK_SIZE', 1000)
+    if output:
+        out = open(output, 'wb') if compress else open(output, 'w', newline='')
+    else:
+        out = sys.stdout.buffer if compress else sys.stdout
+    try:
+        for piece in export_stream(get_repo(), dataset, fmt, compress, chunk_size):
+            out.write(piece)
+    finally:
+        release_db_connection()
+        if output:
+            out.close()
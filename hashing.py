@@ -0,0 +1,222 @@
+# hashing.py
+# bcrypt off the request workers.
+#
+# A bcrypt check at cost 12 is ~250 ms of CPU under the GIL, so a burst of
+# logins used to stall every other request in the process. Hashing and
+# verification now run in a dedicated process pool (HASH_WORKERS, default:
+# one per core); the request thread just waits on the result, leaving the
+# GIL free for catalog browsing. At most HASH_QUEUE_SIZE operations may be
+# queued or running - beyond that callers wait up to HASH_QUEUE_TIMEOUT
+# seconds and then get HashingBusy, so overload sheds instead of piling up.
+#
+# Per-operation timings (queue wait + run time, by cost factor) are kept so
+# BCRYPT_ROUNDS can be tuned against the latency budget, and each request's
+# share shows up as "bcrypt" in its Server-Timing header.
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+from flask import current_app
+
+import instrumentation
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing queue stays full past HASH_QUEUE_TIMEOUT."""
+
+
+# =========================
+# WORKER FUNCTIONS (run in the pool)
+# =========================
+def _hash(password, rounds):
+    started = time.perf_counter()
+    hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds)).decode()
+    return hashed, time.perf_counter() - started
+
+
+def _verify(password, hashed):
+    started = time.perf_counter()
+    try:
+        ok = bcrypt.checkpw(password.encode(), hashed.encode())
+    except ValueError:
+        ok = False
+    return ok, time.perf_counter() - started
+
+
+def hash_cost(hashed):
+    """The cost factor encoded in a bcrypt hash ("$2b$12$..." -> 12)."""
+    try:
+        return int(hashed.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+# =========================
+# HASHER
+# =========================
+class PasswordHasher:
+    def __init__(self, rounds=12, workers=None, queue_size=None, queue_timeout=2.0):
+        self.rounds = rounds
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.queue_size = queue_size or max(1, self.workers) * 4
+        self.queue_timeout = queue_timeout
+
+        self._slots = threading.BoundedSemaphore(self.queue_size)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+        self._rejected = 0
+
+    def hash(self, password, rounds=None):
+        rounds = rounds or self.rounds
+        hashed, _ = self._run('hash', rounds, _hash, password, rounds)
+        return hashed
+
+    def hash_many(self, passwords, rounds=None):
+        """Hash a batch across the pool, results in input order.
+
+        Bulk jobs wait for queue slots instead of failing, and never hold
+        more than half of them, so interactive logins keep getting through.
+        """
+        rounds = rounds or self.rounds
+        executor = self._get_executor()
+        if executor is None:
+            return [self.hash(password, rounds) for password in passwords]
+
+        window = max(1, self.queue_size // 2)
+        pending, results = deque(), []
+        try:
+            for password in passwords:
+                if len(pending) >= window:
+                    results.append(self._collect(pending.popleft(), rounds))
+                self._slots.acquire()
+                pending.append((time.perf_counter(), executor.submit(_hash, password, rounds)))
+            while pending:
+                results.append(self._collect(pending.popleft(), rounds))
+        finally:
+            for _, future in pending:
+                future.cancel()
+                self._slots.release()
+        return results
+
+    def verify(self, password, hashed):
+        if not password or not hashed:
+            return False
+        ok, _ = self._run('verify', hash_cost(hashed), _verify, password, hashed)
+        return ok
+
+    def needs_rehash(self, hashed):
+        return hash_cost(hashed) != self.rounds
+
+    def stats(self):
+        with self._stats_lock:
+            operations = {}
+            for (op, rounds), s in sorted(self._stats.items(), key=lambda item: str(item[0])):
+                operations[f'{op}@{rounds}'] = {
+                    'count': s['count'],
+                    'avg_ms': round(1000 * s['run'] / s['count'], 2),
+                    'max_ms': round(1000 * s['max_run'], 2),
+                    'avg_wait_ms': round(1000 * s['wait'] / s['count'], 2),
+                    'max_wait_ms': round(1000 * s['max_wait'], 2),
+                }
+            rejected = self._rejected
+        return {
+            'rounds': self.rounds,
+            'workers': self.workers,
+            'queue_size': self.queue_size,
+            'rejected': rejected,
+            'operations': operations,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    # ---- internals ----
+    def _run(self, op, rounds, func, *args):
+        queued = time.perf_counter()
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._stats_lock:
+                self._rejected += 1
+            raise HashingBusy("Password hashing queue is full")
+
+        try:
+            executor = self._get_executor()
+            if executor is None:
+                result, run_time = func(*args)
+            else:
+                result, run_time = executor.submit(func, *args).result()
+        finally:
+            self._slots.release()
+
+        total = time.perf_counter() - queued
+        self._record(op, rounds, run_time, max(0.0, total - run_time))
+        return result, run_time
+
+    def _collect(self, item, rounds):
+        queued, future = item
+        try:
+            hashed, run_time = future.result()
+        finally:
+            self._slots.release()
+        total = time.perf_counter() - queued
+        self._record('hash', rounds, run_time, max(0.0, total - run_time))
+        return hashed
+
+    def _get_executor(self):
+        # workers=0 keeps hashing inline (e.g. where processes are unavailable)
+        if self.workers <= 0:
+            return None
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def _record(self, op, rounds, run_time, wait):
+        instrumentation.record('bcrypt', run_time + wait)
+        with self._stats_lock:
+            s = self._stats.setdefault((op, rounds), {
+                'count': 0, 'run': 0.0, 'max_run': 0.0, 'wait': 0.0, 'max_wait': 0.0,
+            })
+            s['count'] += 1
+            s['run'] += run_time
+            s['max_run'] = max(s['max_run'], run_time)
+            s['wait'] += wait
+            s['max_wait'] = max(s['max_wait'], wait)
+
+
+# =========================
+# FLASK INTEGRATION
+# =========================
+_hasher_lock = threading.Lock()
+
+
+def get_hasher():
+    app = current_app._get_current_object()
+    hasher = app.extensions.get('password_hasher')
+    if hasher is None:
+        with _hasher_lock:
+            hasher = app.extensions.get('password_hasher')
+            if hasher is None:
+                hasher = PasswordHasher(
+                    rounds=app.config.get('BCRYPT_ROUNDS', 12),
+                    workers=app.config.get('HASH_WORKERS'),
+                    queue_size=app.config.get('HASH_QUEUE_SIZE'),
+                    queue_timeout=app.config.get('HASH_QUEUE_TIMEOUT', 2.0),
+                )
+                app.extensions['password_hasher'] = hasher
+    return hasher
+
+
+def hash_password(password):
+    return get_hasher().hash(password)
+
+
+def verify_password(password, hashed):
+    return get_hasher().verify(password, hashed)
@@ -0,0 +1,316 @@
+# instrumentation.py
+# Per-request timing: where did a slow page spend its time?
+#
+# Every request keeps a small ledger on flask.g:
+#   conn   - waiting for / opening a pooled connection (db.get_db_connection)
+#   db     - cursor execute/executemany/fetch*/nextset plus commit/rollback,
+#            with the number of statements and network round trips
+#   bcrypt - hashing and verification, including hashing-queue wait
+#   render - Jinja rendering (before_render_template .. template_rendered)
+# and reports it in a Server-Timing header, so the browser's network panel
+# shows the breakdown for each response.
+#
+# Statements slower than SLOW_QUERY_MS are logged to the "mmu.sql" logger
+# with their parameters redacted (types and sizes only - they carry
+# usernames and password hashes). Per-route latency histograms and totals
+# are kept in-process and served as JSON at /metrics.
+#
+# Driver calls go through blocking(): under serve.py (gevent) it hands them
+# to gevent's native thread pool, since pyodbc and sqlite3 cannot yield to
+# other greenlets while they wait on the database.
+import itertools
+import logging
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request
+from flask.signals import before_render_template, template_rendered
+
+logger = logging.getLogger('mmu.sql')
+
+METRICS = ('conn', 'db', 'bcrypt', 'render')
+
+# Histogram bucket upper bounds (ms); the last bucket is everything above
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+# =========================
+# PER-REQUEST LEDGER
+# =========================
+class RequestTimings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.seconds = dict.fromkeys(METRICS, 0.0)
+        self.queries = 0
+        self.round_trips = 0
+        self.render_started = None
+
+    def header(self, total):
+        parts = []
+        for name in METRICS:
+            if self.seconds[name] or (name == 'db' and self.round_trips):
+                part = f'{name};dur={self.seconds[name] * 1000:.1f}'
+                if name == 'db':
+                    part += f';desc="{self.queries} queries, {self.round_trips} round trips"'
+                parts.append(part)
+        parts.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(parts)
+
+
+def _timings():
+    if not has_request_context():
+        return None
+    if 'perf' not in g:
+        g.perf = RequestTimings()
+    return g.perf
+
+
+def record(metric, seconds, queries=0, round_trips=0):
+    """Charge `seconds` of `metric` to the current request (no-op outside one)."""
+    timings = _timings()
+    if timings is None:
+        return
+    timings.seconds[metric] += seconds
+    timings.queries += queries
+    timings.round_trips += round_trips
+
+
+# =========================
+# CURSOR / CONNECTION WRAPPERS
+# =========================
+def redact(params):
+    """Parameter shapes without values: (<str>, <int>, NULL, <table:3 rows>)."""
+    if params is None:
+        return '()'
+    if not isinstance(params, (list, tuple)):
+        params = (params,)
+    shapes = []
+    for value in params:
+        if value is None:
+            shapes.append('NULL')
+        elif isinstance(value, (list, tuple)):
+            shapes.append(f'<table:{len(value)} rows>')   # TVP
+        else:
+            shapes.append(f'<{type(value).__name__}>')
+    return '(' + ', '.join(shapes) + ')'
+
+
+def _slow_query(sql, params, seconds, many=False):
+    threshold = current_app.config.get('SLOW_QUERY_MS') if has_request_context() else None
+    if threshold is None or seconds * 1000 < threshold:
+        return
+    statement = ' '.join(sql.split())
+    if len(statement) > 500:
+        statement = statement[:500] + '...'
+    shape = f'<{len(params)} parameter sets>' if many else redact(params)
+    logger.warning('Slow query %.1f ms on %s: %s params=%s', seconds * 1000,
+                   request.endpoint or request.path, statement, shape)
+
+
+# =========================
+# BLOCKING DRIVER CALLS
+# =========================
+_runner = None   # (fn, args) -> result, e.g. gevent's threadpool.apply
+
+
+def run_blocking_calls_with(runner):
+    global _runner
+    _runner = runner
+
+
+def blocking(fn, *args):
+    """fn(*args), on the configured runner if there is one."""
+    if _runner is None:
+        return fn(*args)
+    return _runner(fn, args)
+
+
+class InstrumentedCursor:
+    """Times a DB-API cursor's calls into the request ledger."""
+
+    def __init__(self, cursor):
+        object.__setattr__(self, '_cursor', cursor)
+
+    def execute(self, sql, params=()):
+        started = time.perf_counter()
+        try:
+            blocking(self._cursor.execute, sql, params)
+        finally:
+            elapsed = time.perf_counter() - started
+            record('db', elapsed, queries=1, round_trips=1)
+            _slow_query(sql, params, elapsed)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        seq_of_params = list(seq_of_params)
+        started = time.perf_counter()
+        try:
+            blocking(self._cursor.executemany, sql, seq_of_params)
+        finally:
+            elapsed = time.perf_counter() - started
+            # pyodbc with fast_executemany sends the whole batch at once;
+            # otherwise (and on SQLite) every parameter set is its own trip
+            batched = getattr(self._cursor, 'fast_executemany', False)
+            record('db', elapsed, queries=len(seq_of_params),
+                   round_trips=1 if batched else len(seq_of_params))
+            _slow_query(sql, seq_of_params, elapsed, many=True)
+        return self
+
+    def _timed(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return blocking(getattr(self._cursor, method), *args)
+        finally:
+            record('db', time.perf_counter() - started)
+
+    def fetchone(self):
+        return self._timed('fetchone')
+
+    def fetchmany(self, *args):
+        return self._timed('fetchmany', *args)
+
+    def fetchall(self):
+        return self._timed('fetchall')
+
+    def nextset(self):
+        return self._timed('nextset')
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cursor, name, value)   # e.g. fast_executemany
+
+
+def cursor(conn):
+    return InstrumentedCursor(conn.cursor())
+
+
+def commit(conn):
+    started = time.perf_counter()
+    try:
+        blocking(conn.commit)
+    finally:
+        record('db', time.perf_counter() - started, round_trips=1)
+
+
+def rollback(conn):
+    started = time.perf_counter()
+    try:
+        blocking(conn.rollback)
+    finally:
+        record('db', time.perf_counter() - started, round_trips=1)
+
+
+# =========================
+# ROUTE HISTOGRAMS
+# =========================
+class RouteMetrics:
+    def __init__(self, buckets=BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def observe(self, route, status, total, timings):
+        ms = total * 1000
+        index = next((i for i, bound in enumerate(self.buckets) if ms <= bound),
+                     len(self.buckets))
+        with self._lock:
+            r = self._routes.get(route)
+            if r is None:
+                r = self._routes[route] = {
+                    'count': 0, 'counts': [0] * (len(self.buckets) + 1),
+                    'sum_ms': 0.0, 'max_ms': 0.0, 'queries': 0, 'round_trips': 0,
+                    'statuses': {}, **{f'{m}_ms': 0.0 for m in METRICS},
+                }
+            r['count'] += 1
+            r['counts'][index] += 1
+            r['sum_ms'] += ms
+            r['max_ms'] = max(r['max_ms'], ms)
+            r['queries'] += timings.queries
+            r['round_trips'] += timings.round_trips
+            for m in METRICS:
+                r[f'{m}_ms'] += timings.seconds[m] * 1000
+            klass = f'{status // 100}xx'
+            r['statuses'][klass] = r['statuses'].get(klass, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            routes = {route: dict(r, counts=list(r['counts']), statuses=dict(r['statuses']))
+                      for route, r in self._routes.items()}
+        report = {}
+        for route, r in sorted(routes.items()):
+            n = r['count']
+            bounds = list(self.buckets) + ['+Inf']
+            cumulative = list(zip(bounds, itertools.accumulate(r['counts'])))
+            report[route] = {
+                'count': n,
+                'statuses': r['statuses'],
+                'avg_ms': round(r['sum_ms'] / n, 2),
+                'max_ms': round(r['max_ms'], 2),
+                # Upper bound of the bucket holding the percentile
+                'p50_ms': self._percentile(cumulative, n, 0.50),
+                'p95_ms': self._percentile(cumulative, n, 0.95),
+                'p99_ms': self._percentile(cumulative, n, 0.99),
+                'buckets_ms': cumulative,    # [upper bound, requests at or below]
+                'avg_queries': round(r['queries'] / n, 2),
+                'avg_round_trips': round(r['round_trips'] / n, 2),
+                **{f'avg_{m}_ms': round(r[f'{m}_ms'] / n, 2) for m in METRICS},
+            }
+        return {'buckets_ms': list(self.buckets), 'routes': report}
+
+    @staticmethod
+    def _percentile(cumulative, n, q):
+        for bound, running in cumulative:
+            if running >= q * n:
+                return bound
+        return '+Inf'
+
+
+# =========================
+# FLASK INTEGRATION
+# =========================
+def init_app(app):
+    app.config.setdefault('SERVER_TIMING', True)
+    app.config.setdefault('SLOW_QUERY_MS', 200)
+    app.extensions['route_metrics'] = RouteMetrics()
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    before_render_template.connect(_render_started, app)
+    template_rendered.connect(_render_finished, app)
+
+
+def get_route_metrics():
+    return current_app.extensions['route_metrics']
+
+
+def _start_request():
+    g.perf = RequestTimings()
+
+
+def _finish_request(response):
+    timings = _timings()
+    total = time.perf_counter() - timings.started
+    rule = request.url_rule
+    route = f'{request.method} {rule.rule}' if rule else f'{request.method} <unmatched>'
+    get_route_metrics().observe(route, response.status_code, total, timings)
+    if current_app.config['SERVER_TIMING']:
+        response.headers['Server-Timing'] = timings.header(total)
+    return response
+
+
+def _render_started(sender, template, context, **extra):
+    timings = _timings()
+    if timings is not None:
+        timings.render_started = time.perf_counter()
+
+
+def _render_finished(sender, template, context, **extra):
+    timings = _timings()
+    if timings is not None and timings.render_started is not None:
+        record('render', time.perf_counter() - timings.render_started)
+        timings.render_started = None
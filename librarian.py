@@ -1,31 +1,66 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, session
+from flask import (
+    Blueprint, render_template, redirect, url_for, flash, request, session, jsonify,
+    current_app, Response, abort, stream_with_context,
+)
 from datetime import datetime
-import pyodbc
-import bcrypt
+from db import get_repo
+from search_index import index_book, unindex_book, rebuild_catalog_index
+from bulk_import import detect_format, import_books
+from provisioning import ProvisionReport, provision_readers
+from export import DATASETS, FORMATS, export_filename, export_stream
+from pagination import listing_page, page_size
+from catalog_cache import get_catalog_metadata, invalidate_catalog_metadata
+from live_updates import publish_catalog_changes
+from hashing import HashingBusy, get_hasher, hash_password
+from login_throttle import get_login_throttle
+from storage import BULK_IN_USE, BULK_NOT_FOUND, BULK_OK, BULK_PROTECTED
 
 librarian_bp = Blueprint('librarian', __name__)
 
 # =========================
-# DATABASE CONNECTION
+# RESPONSES (form post -> flash + redirect, XHR -> JSON)
 # =========================
-def get_db_connection():
-    conn_str = (
-        "Driver={ODBC Driver 18 for SQL Server};"
-        "Server=localhost;"
-        "Database=MMU_Library;"
-        "Trusted_Connection=yes;"
-        "TrustServerCertificate=yes;"
-    )
-    return pyodbc.connect(conn_str)
+def wants_json():
+    return (request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+            or request.accept_mimetypes.best == 'application/json')
+
+
+def respond(ok, message, status=None, **payload):
+    """Flash and go back to the dashboard, or return just the change as JSON."""
+    if wants_json():
+        return jsonify(ok=ok, message=message, **payload), status or (200 if ok else 400)
+    flash(message, "success" if ok else "danger")
+    return redirect(url_for('librarian.dashboard'))
+
+
+def deny():
+    if wants_json():
+        return jsonify(ok=False, message="Access denied."), 403
+    flash("Access denied.", "danger")
+    return redirect(url_for('reader.home'))
+
+
+def _isoformat(value):
+    return value.isoformat(sep=' ', timespec='seconds') if value else None
+
+
+def book_payload(book):
+    if book is None:
+        return None
+    book['Available'] = bool(book['Available'])
+    book['DueDate'] = _isoformat(book['DueDate'])
+    return book
+
+
+def member_payload(member, now=None):
+    if member is None:
+        return None
+    now = now or datetime.now()
+    member['Locked'] = bool(member['LockoutUntil'] and member['LockoutUntil'] > now)
+    member['CreatedDate'] = _isoformat(member['CreatedDate'])
+    member['LockoutUntil'] = _isoformat(member['LockoutUntil'])
+    return member
 
-# =========================
-# PASSWORD HASHING
-# =========================
-def hash_pwd(password: str, rounds=12) -> str:
-    return bcrypt.hashpw(
-        password.encode(),
-        bcrypt.gensalt(rounds)
-    ).decode()
 
 # =========================
 # CREATE READER ACCOUNT (SP)
@@ -33,66 +68,135 @@ def hash_pwd(password: str, rounds=12) -> str:
 @librarian_bp.route('/librarian/create_member', methods=['POST'])
 def create_member():
     if session.get('role') != 'Librarian':
-        flash("Access denied.", "danger")
-        return redirect(url_for('reader.home'))
+        return deny()
 
     username = request.form.get('username')
     password = request.form.get('password')
 
     if not username or not password:
-        flash("All fields are required.", "danger")
+        return respond(False, "All fields are required.")
+
+    try:
+        hashed = hash_password(password)
+        repo = get_repo()
+        repo.create_reader_account(username, hashed)
+        repo.commit()
+    except HashingBusy:
+        return respond(False, "Server is busy, please try again shortly.", 503)
+    except Exception:
+        current_app.logger.exception("CreateReaderAccount failed")
+        return respond(False, "Failed to create account.")
+
+    member = member_payload(repo.get_member(username)) if wants_json() else None
+    return respond(True, "Reader account created successfully.", member=member)
+
+# =========================
+# BULK PROVISION READERS (CSV / JSONL)
+# =========================
+@librarian_bp.route('/librarian/provision_readers', methods=['POST'])
+def provision_readers_route():
+    if session.get('role') != 'Librarian':
+        flash("Access denied.", "danger")
+        return redirect(url_for('reader.home'))
+
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        flash("Choose a CSV or JSON Lines file of username,password.", "danger")
         return redirect(url_for('librarian.dashboard'))
 
-    hashed = hash_pwd(password)
+    # 📈 Latest run, readable from /librarian/provision_readers/status
+    report = ProvisionReport(upload.filename)
+    current_app.extensions['reader_provisioning'] = report
 
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "EXEC LibraryData.CreateReaderAccount ?, ?",
-            (username, hashed)
-        )
-        conn.commit()
-        flash("Reader account created successfully.", "success")
-    except Exception as e:
-        flash("Failed to create account.", "danger")
-        print("CreateReaderAccount error:", e)
-    finally:
-        conn.close()
+    provision_readers(
+        get_repo(), get_hasher(), upload.stream,
+        detect_format(upload.filename, request.form.get('format')),
+        batch_size=current_app.config.get('PROVISION_BATCH_SIZE', 500),
+        report=report,
+    )
+
+    if wants_json():
+        return jsonify(report.as_dict())
+
+    flash(report.summary(), "success" if not report.failed else "danger")
+    for line, error in report.errors[:5]:
+        flash(f"Line {line}: {error}", "danger")
 
     return redirect(url_for('librarian.dashboard'))
 
+
+@librarian_bp.route('/librarian/provision_readers/status')
+def provision_readers_status():
+    if session.get('role') != 'Librarian':
+        return jsonify({'error': 'Access denied.'}), 403
+
+    report = current_app.extensions.get('reader_provisioning')
+    return jsonify(report.as_dict() if report else {})
+
 # =========================
 # ADD BOOK (SP) + CATEGORY
 # =========================
 @librarian_bp.route('/librarian/add_book', methods=['POST'])
 def add_book():
     if session.get('role') != 'Librarian':
-        flash("Access denied.", "danger")
-        return redirect(url_for('reader.home'))
+        return deny()
 
     title = request.form.get('title')
     author = request.form.get('author')
     category = request.form.get('category')
 
     if not title or not author or not category:
-        flash("All book fields are required.", "danger")
-        return redirect(url_for('librarian.dashboard'))
+        return respond(False, "All book fields are required.")
 
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "EXEC LibraryData.AddBook ?, ?, ?",
-            (title, author, category)
-        )
-        conn.commit()
-        flash("Book added successfully.", "success")
-    except Exception as e:
-        flash("Failed to add book.", "danger")
-        print("AddBook error:", e)
-    finally:
-        conn.close()
+        repo = get_repo()
+        book_id = repo.add_book(title, author, category)
+        repo.commit()
+        index_book(book_id, title, author, category)
+        invalidate_catalog_metadata()
+        publish_catalog_changes()
+    except Exception:
+        current_app.logger.exception("AddBook failed")
+        return respond(False, "Failed to add book.")
+
+    book = book_payload(repo.get_inventory_book(book_id)) if wants_json() else None
+    return respond(True, "Book added successfully.", book=book)
+
+# =========================
+# BULK IMPORT BOOKS (CSV / JSONL)
+# =========================
+@librarian_bp.route('/librarian/import_books', methods=['POST'])
+def import_books_route():
+    if session.get('role') != 'Librarian':
+        flash("Access denied.", "danger")
+        return redirect(url_for('reader.home'))
+
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        flash("Choose a CSV or JSON Lines file to import.", "danger")
+        return redirect(url_for('librarian.dashboard'))
+
+    fmt = detect_format(upload.filename, request.form.get('format'))
+    repo = get_repo()
+    report = import_books(
+        repo, upload.stream, fmt,
+        batch_size=current_app.config.get('IMPORT_BATCH_SIZE', 1000)
+    )
+
+    # 🔄 Refresh the search index and category cache once for the whole file
+    if report.inserted:
+        rebuild_catalog_index(repo)
+        invalidate_catalog_metadata()
+        publish_catalog_changes()
+
+    if wants_json():
+        return jsonify(report.as_dict())
+
+    flash(f"Imported {report.inserted} of {report.rows} rows "
+          f"in {report.elapsed:.1f}s ({report.failed} failed).",
+          "success" if not report.failed else "danger")
+    for line, error in report.errors[:5]:
+        flash(f"Line {line}: {error}", "danger")
 
     return redirect(url_for('librarian.dashboard'))
 
@@ -102,29 +206,29 @@ def add_book():
 @librarian_bp.route('/librarian/edit_book/<int:book_id>', methods=['POST'])
 def edit_book(book_id):
     if session.get('role') != 'Librarian':
-        flash("Access denied.", "danger")
-        return redirect(url_for('reader.home'))
+        return deny()
 
     title = request.form.get('title')
     author = request.form.get('author')
     category = request.form.get('category')
 
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "EXEC LibraryData.EditBook ?, ?, ?, ?",
-            (book_id, title, author, category)
-        )
-        conn.commit()
-        flash("Book updated successfully.", "success")
-    except Exception as e:
-        flash("Failed to update book.", "danger")
-        print("EditBook error:", e)
-    finally:
-        conn.close()
-
-    return redirect(url_for('librarian.dashboard'))
+        repo = get_repo()
+        found = repo.edit_book(book_id, title, author, category)
+        repo.commit()
+        if found:
+            index_book(book_id, title, author, category)
+        invalidate_catalog_metadata()
+        publish_catalog_changes()
+    except Exception:
+        current_app.logger.exception("EditBook failed")
+        return respond(False, "Failed to update book.")
+
+    if not found:
+        return respond(False, "Book not found.", status=404)
+
+    book = book_payload(repo.get_inventory_book(book_id)) if wants_json() else None
+    return respond(True, "Book updated successfully.", book=book)
 
 # =========================
 # DELETE BOOK (SP)
@@ -132,22 +236,20 @@ def edit_book(book_id):
 @librarian_bp.route('/librarian/delete_book/<int:book_id>')
 def delete_book(book_id):
     if session.get('role') != 'Librarian':
-        flash("Access denied.", "danger")
-        return redirect(url_for('reader.home'))
+        return deny()
 
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("EXEC LibraryData.DeleteBook ?", (book_id,))
-        conn.commit()
-        flash("Book deleted.", "success")
-    except Exception as e:
-        flash("Cannot delete book.", "danger")
-        print("DeleteBook error:", e)
-    finally:
-        conn.close()
-
-    return redirect(url_for('librarian.dashboard'))
+        repo = get_repo()
+        repo.delete_book(book_id)
+        repo.commit()
+        unindex_book(book_id)
+        invalidate_catalog_metadata()
+        publish_catalog_changes()
+    except Exception:
+        current_app.logger.exception("DeleteBook failed")
+        return respond(False, "Cannot delete book.")
+
+    return respond(True, "Book deleted.", deleted={'BookID': book_id})
 
 # =========================
 # TOGGLE BOOK STATUS (SP)
@@ -155,22 +257,20 @@ def delete_book(book_id):
 @librarian_bp.route('/librarian/toggle_status/<int:book_id>')
 def toggle_status(book_id):
     if session.get('role') != 'Librarian':
-        flash("Access denied.", "danger")
-        return redirect(url_for('reader.home'))
+        return deny()
 
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("EXEC LibraryData.ToggleBookStatus ?", (book_id,))
-        conn.commit()
-        flash("Book status updated.", "success")
-    except Exception as e:
-        flash("Failed to toggle status.", "danger")
-        print("ToggleBookStatus error:", e)
-    finally:
-        conn.close()
-
-    return redirect(url_for('librarian.dashboard'))
+        repo = get_repo()
+        repo.toggle_book_status(book_id)
+        repo.commit()
+        invalidate_catalog_metadata()
+        publish_catalog_changes()
+    except Exception:
+        current_app.logger.exception("ToggleBookStatus failed")
+        return respond(False, "Failed to toggle status.")
+
+    book = book_payload(repo.get_inventory_book(book_id)) if wants_json() else None
+    return respond(True, "Book status updated.", book=book)
 
 # =========================
 # RESET USER PASSWORD (SP)
@@ -178,34 +278,28 @@ def toggle_status(book_id):
 @librarian_bp.route('/librarian/reset_password', methods=['POST'])
 def reset_password():
     if session.get('role') != 'Librarian':
-        flash("Access denied.", "danger")
-        return redirect(url_for('reader.home'))
+        return deny()
 
     username = request.form.get('username')
     new_password = request.form.get('new_password')
 
     if username == session.get('username'):
-        flash("Use Change Password flow.", "danger")
-        return redirect(url_for('librarian.dashboard'))
-
-    hashed = hash_pwd(new_password)
+        return respond(False, "Use Change Password flow.")
 
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "EXEC LibraryData.ResetUserPassword ?, ?",
-            (username, hashed)
-        )
-        conn.commit()
-        flash("Password reset successfully.", "success")
-    except Exception as e:
-        flash("Password reset failed.", "danger")
-        print("ResetUserPassword error:", e)
-    finally:
-        conn.close()
-
-    return redirect(url_for('librarian.dashboard'))
+        hashed = hash_password(new_password)
+        repo = get_repo()
+        repo.reset_user_password(username, hashed)
+        repo.commit()
+        get_login_throttle().clear(username)
+    except HashingBusy:
+        return respond(False, "Server is busy, please try again shortly.", 503)
+    except Exception:
+        current_app.logger.exception("ResetUserPassword failed")
+        return respond(False, "Password reset failed.")
+
+    member = member_payload(repo.get_member(username)) if wants_json() else None
+    return respond(True, "Password reset successfully.", member=member)
 
 # =========================
 # DELETE USER (SP)
@@ -213,29 +307,180 @@ def reset_password():
 @librarian_bp.route('/librarian/delete_user/<username>')
 def delete_user(username):
     if session.get('role') != 'Librarian':
-        flash("Access denied.", "danger")
-        return redirect(url_for('reader.home'))
+        return deny()
 
     if username == session.get('username'):
-        flash("You cannot delete your own account.", "danger")
-        return redirect(url_for('librarian.dashboard'))
+        return respond(False, "You cannot delete your own account.")
 
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("EXEC LibraryData.DeleteUser ?", (username,))
-        conn.commit()
-        flash(f"User {username} deleted.", "success")
-    except Exception as e:
-        flash("Failed to delete user.", "danger")
-        print("DeleteUser error:", e)
-    finally:
-        conn.close()
+        repo = get_repo()
+        repo.delete_user(username)
+        repo.commit()
+    except Exception:
+        current_app.logger.exception("DeleteUser failed")
+        return respond(False, "Failed to delete user.")
 
-    return redirect(url_for('librarian.dashboard'))
+    return respond(True, f"User {username} deleted.", deleted={'Username': username})
 
 # =========================
-# DASHBOARD
+# BULK ACTIONS ON A SELECTION (TVP SPs)
+# =========================
+BULK_OUTCOMES = {
+    BULK_OK: 'ok',
+    BULK_NOT_FOUND: 'not_found',
+    BULK_IN_USE: 'in_use',
+    BULK_PROTECTED: 'protected',
+}
+
+
+def _selection(field, convert=str):
+    """Selected keys from repeated form fields or a JSON {"<field>s": [...]}."""
+    body = request.get_json(silent=True)
+    values = body.get(field + 's', []) if isinstance(body, dict) else request.form.getlist(field)
+    selected = []
+    for value in values:
+        try:
+            value = convert(str(value).strip())
+        except ValueError:
+            continue
+        if value != '' and value not in selected:
+            selected.append(value)
+    return selected
+
+
+def _bulk_respond(results, applied_verb, noun):
+    outcomes = [dict(r, outcome=BULK_OUTCOMES.get(r['Status'], 'failed')) for r in results]
+    counts = {}
+    for r in outcomes:
+        counts[r['outcome']] = counts.get(r['outcome'], 0) + 1
+
+    message = f"{applied_verb} {counts.get('ok', 0)} of {len(outcomes)} {noun}."
+    skipped = {
+        'not_found': "not found",
+        'in_use': "have borrow history",
+        'protected': "protected",
+    }
+    notes = [f"{counts[k]} {text}" for k, text in skipped.items() if counts.get(k)]
+    if notes:
+        message += " Skipped: " + ", ".join(notes) + "."
+
+    for r in outcomes:
+        r.pop('Status')
+    return respond(bool(counts.get('ok')), message, results=outcomes, counts=counts)
+
+
+def _bulk_selection(field, convert=str):
+    selected = _selection(field, convert)
+    limit = current_app.config.get('BULK_ACTION_LIMIT', 500)
+    if not selected:
+        return None, respond(False, "Nothing selected.")
+    if len(selected) > limit:
+        return None, respond(False, f"Select at most {limit} items at a time.")
+    return selected, None
+
+
+@librarian_bp.route('/librarian/bulk/toggle_status', methods=['POST'])
+def bulk_toggle_status():
+    if session.get('role') != 'Librarian':
+        return deny()
+
+    book_ids, error = _bulk_selection('book_id', int)
+    if error:
+        return error
+
+    try:
+        repo = get_repo()
+        results = repo.toggle_books_status(book_ids)
+        repo.commit()
+        invalidate_catalog_metadata()
+        publish_catalog_changes()
+    except Exception:
+        current_app.logger.exception("ToggleBooksStatus failed")
+        return respond(False, "Failed to toggle status.")
+
+    for r in results:
+        if r.get('Available') is not None:
+            r['Available'] = bool(r['Available'])
+    return _bulk_respond(results, "Toggled", "books")
+
+
+@librarian_bp.route('/librarian/bulk/delete_books', methods=['POST'])
+def bulk_delete_books():
+    if session.get('role') != 'Librarian':
+        return deny()
+
+    book_ids, error = _bulk_selection('book_id', int)
+    if error:
+        return error
+
+    try:
+        repo = get_repo()
+        results = repo.delete_books(book_ids)
+        repo.commit()
+        for r in results:
+            if r['Status'] == BULK_OK:
+                unindex_book(r['BookID'])
+        invalidate_catalog_metadata()
+        publish_catalog_changes()
+    except Exception:
+        current_app.logger.exception("DeleteBooks failed")
+        return respond(False, "Cannot delete books.")
+
+    return _bulk_respond(results, "Deleted", "books")
+
+
+@librarian_bp.route('/librarian/bulk/delete_users', methods=['POST'])
+def bulk_delete_users():
+    if session.get('role') != 'Librarian':
+        return deny()
+
+    usernames, error = _bulk_selection('username')
+    if error:
+        return error
+
+    # The signed-in librarian never deletes themselves, even in bulk
+    me = (session.get('username') or '').casefold()
+    own = [u for u in usernames if u.casefold() == me]
+    others = [u for u in usernames if u.casefold() != me]
+
+    try:
+        repo = get_repo()
+        results = repo.delete_users(others) if others else []
+        repo.commit()
+    except Exception:
+        current_app.logger.exception("DeleteUsers failed")
+        return respond(False, "Failed to delete users.")
+
+    results += [{'Username': u, 'Status': BULK_PROTECTED} for u in own]
+    return _bulk_respond(results, "Deleted", "users")
+
+# =========================
+# STREAMING EXPORT (CSV / JSONL, optional gzip)
+# =========================
+@librarian_bp.route('/librarian/export/<dataset>')
+def export_data(dataset):
+    if session.get('role') != 'Librarian':
+        flash("Access denied.", "danger")
+        return redirect(url_for('reader.home'))
+
+    fmt = request.args.get('format', 'csv')
+    if dataset not in DATASETS or fmt not in FORMATS:
+        abort(404)
+    compress = request.args.get('gzip') in ('1', 'true', 'yes')
+
+    body = export_stream(
+        get_repo(), dataset, fmt, compress,
+        chunk_size=current_app.config.get('EXPORT_CHUNK_SIZE', 1000)
+    )
+    filename = export_filename(dataset, fmt, compress)
+    return Response(
+        stream_with_context(body),
+        mimetype='application/gzip' if compress else FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename={filename}'},
+    )
+
+# =========================
+# DASHBOARD (SHELL; TABLES LOAD FROM THE JSON ENDPOINTS BELOW)
 # =========================
 @librarian_bp.route('/librarian/dashboard')
 def dashboard():
@@ -243,44 +488,94 @@ def dashboard():
         flash("Access denied.", "danger")
         return redirect(url_for('reader.home'))
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # 📚 Inventory
-    cursor.execute("""
-        SELECT BookID, Title, Author, Category, Available
-        FROM LibraryData.Books
-        ORDER BY BookID
-    """)
-    inventory = cursor.fetchall()
-
-    # 👤 Members
-    cursor.execute("""
-        SELECT Username, Role
-        FROM LibraryData.Accounts
-        ORDER BY Username
-    """)
-    members = cursor.fetchall()
-
-    # 🏷️ Categories (SOURCE OF TRUTH)
-    cursor.execute("""
-        SELECT DISTINCT Category
-        FROM LibraryData.Books
-        WHERE Category IS NOT NULL
-        ORDER BY Category
-    """)
-    categories = [row[0] for row in cursor.fetchall()]
-
-    conn.close()
+    # 🏷️ Categories + counts (cached per catalog version)
+    repo = get_repo()
+    catalog = get_catalog_metadata(repo)
+    categories = catalog['categories']
+
+    # ⚠️ Overdue loans (open-loan index) + totals (LoanDueSummary)
+    overdue_list = repo.overdue_loans(limit=current_app.config.get('OVERDUE_REPORT_LIMIT', 100))
+    overdue_summary = repo.overdue_summary()
 
     return render_template(
         "librarian_dashboard.html",
-        inventory=inventory,
-        members=members,
         categories=categories,   # ✅ THIS FIXES EVERYTHING
+        catalog=catalog,
+        overdue_list=overdue_list,
+        overdue_summary=overdue_summary,
+        page_size=current_app.config['DASHBOARD_PAGE_SIZE'],
         now=datetime.now()
     )
 
+# =========================
+# DASHBOARD DATA (JSON, keyset-paginated, sortable, filterable)
+# =========================
+# Python type of each sort column's values, for validating page tokens
+INVENTORY_SORT_TYPES = {'id': int, 'title': str, 'author': str, 'category': str, 'available': int}
+MEMBER_SORT_TYPES = {'id': int, 'username': str, 'role': str}
+
+
+def _listing_args(sort_types, default_sort):
+    sort = request.args.get('sort', default_sort)
+    if sort not in sort_types:
+        sort = default_sort
+    descending = request.args.get('dir') == 'desc'
+    return {
+        'sort': sort,
+        'descending': descending,
+        'value_type': sort_types[sort],
+        'tag': f"{sort}:{'desc' if descending else 'asc'}",
+        'token': request.args.get('page'),
+        'per_page': page_size(request.args.get('per_page'), current_app.config['DASHBOARD_PAGE_SIZE']),
+        'query': request.args.get('q', '').strip(),
+    }
+
+
+@librarian_bp.route('/librarian/api/inventory')
+def inventory_data():
+    if session.get('role') != 'Librarian':
+        return jsonify({'error': 'Access denied.'}), 403
+
+    args = _listing_args(INVENTORY_SORT_TYPES, 'id')
+    category = request.args.get('category', 'All')
+    available = {'1': True, '0': False}.get(request.args.get('available'))
+    repo = get_repo()
+
+    def fetch(after, before, limit):
+        return repo.list_inventory_page(
+            args['sort'], args['descending'], args['query'], category, available,
+            after=after, before=before, limit=limit
+        )
+
+    page = listing_page(fetch, 'BookID', args['value_type'], args['tag'],
+                        args['token'], args['per_page'])
+    for book in page['items']:
+        book_payload(book)
+    return jsonify(page)
+
+
+@librarian_bp.route('/librarian/api/members')
+def members_data():
+    if session.get('role') != 'Librarian':
+        return jsonify({'error': 'Access denied.'}), 403
+
+    args = _listing_args(MEMBER_SORT_TYPES, 'username')
+    role = request.args.get('role') or None
+    repo = get_repo()
+
+    def fetch(after, before, limit):
+        return repo.list_members_page(
+            args['sort'], args['descending'], args['query'], role,
+            after=after, before=before, limit=limit
+        )
+
+    page = listing_page(fetch, 'AccountID', args['value_type'], args['tag'],
+                        args['token'], args['per_page'])
+    now = datetime.now()
+    for member in page['items']:
+        member_payload(member, now)
+    return jsonify(page)
+
 # =========================
 # LOGOUT
 # =========================
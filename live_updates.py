@@ -0,0 +1,365 @@
+# live_updates.py
+# Live catalog changes for open reader pages, as Server-Sent Events.
+#
+# Readers used to reload /books/<username> to see whether a book had come
+# back, repeating the whole catalog query and render each time. Now the
+# page keeps one EventSource on /api/catalog/events and patches its rows as
+# books are borrowed, returned, toggled, edited or deleted.
+#
+# The feed is an in-process publish/subscribe bus. Routes that change the
+# catalog call publish_catalog_changes() after committing; it reads the
+# delta since the last published CatalogVersion (Repository.catalog_changes,
+# one round trip) and appends it, already encoded, to a short backlog. Each
+# event's SSE id is the CatalogVersion, so a browser that reconnects sends
+# Last-Event-ID and is backfilled from the database. A subscriber that falls
+# behind the backlog is disconnected and does just that.
+#
+# Subscribers are not threads: an idle stream is a generator parked on the
+# feed's one Condition, woken by a publish or by the heartbeat timeout.
+# Served by serve.py (gevent, which patches threading), thousands of idle
+# streams cost a few KB each. On a threaded server (`python app.py`) every
+# open stream holds a server thread for the life of the page, so unless
+# LIVE_UPDATES_MAX_SUBSCRIBERS is set the cap follows the worker type:
+# GREENLET_MAX_SUBSCRIBERS under gevent, THREADED_MAX_SUBSCRIBERS otherwise
+# (503 + Retry-After beyond it; 0 turns the feed off).
+#
+# With several worker processes, set LIVE_UPDATES_BROKER to a file path: a
+# small SQLite database where publishers record the latest CatalogVersion.
+# One watcher thread per process polls it and publishes what other workers
+# committed.
+import itertools
+import json
+import logging
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+
+from flask import current_app
+
+import instrumentation
+from db import get_repo
+
+logger = logging.getLogger('mmu.live')
+
+# More changes than this in one delta are sent as a single "catalog" event
+# (and a reconnecting client that missed them reloads instead)
+MAX_BACKFILL = 500
+
+# Default stream caps per process: a greenlet per stream under gevent; a
+# server thread per stream otherwise, leaving most threads for page views
+GREENLET_MAX_SUBSCRIBERS = 2000
+THREADED_MAX_SUBSCRIBERS = 32
+
+
+class FeedFull(Exception):
+    """Raised when LIVE_UPDATES_MAX_SUBSCRIBERS streams are already open."""
+
+
+# =========================
+# EVENT ENCODING
+# =========================
+def encode_changes(changes):
+    """One SSE chunk for a Repository.catalog_changes() delta.
+
+    Every book and deletion is its own small event; only the last one
+    carries the id (the CatalogVersion), so a stream cut mid-batch resumes
+    from the previous version and gets the whole batch again.
+    """
+    events = [('book', book) for book in changes['books']]
+    events += [('deleted', row) for row in changes['deleted']]
+    if not events:
+        return b''
+    if len(events) > MAX_BACKFILL:
+        # A bulk import: one summary event rather than thousands per stream
+        events = [('catalog', {'version': changes['version'], 'changes': len(events)})]
+    lines = []
+    for i, (name, data) in enumerate(events, 1):
+        if i == len(events):
+            lines.append(f"id: {changes['version']}")
+        lines.append(f"event: {name}")
+        lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+        lines.append('')
+    return ('\n'.join(lines) + '\n').encode()
+
+
+RESYNC = b'event: resync\ndata: {}\n\n'
+KEEPALIVE = b': keepalive\n\n'
+
+
+# =========================
+# BROKER (multi-worker)
+# =========================
+class SqliteBroker:
+    """Latest published CatalogVersion, shared between processes through one
+    SQLite file."""
+
+    def __init__(self, path, busy_timeout=5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS LiveUpdates (
+                ID INTEGER PRIMARY KEY CHECK (ID = 1),
+                Version INTEGER NOT NULL
+            )
+        """)
+
+    def announce(self, version):
+        instrumentation.blocking(self._conn().execute, """
+            INSERT INTO LiveUpdates (ID, Version) VALUES (1, ?)
+            ON CONFLICT (ID) DO UPDATE SET Version = MAX(Version, excluded.Version)
+        """, (version,))
+
+    def latest(self):
+        row = instrumentation.blocking(
+            self._conn().execute, "SELECT Version FROM LiveUpdates WHERE ID = 1"
+        ).fetchone()
+        return row[0] if row else None
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path, timeout=self.busy_timeout,
+                isolation_level=None, check_same_thread=False,
+            )
+            self._local.conn = conn
+        return conn
+
+
+# =========================
+# FEED
+# =========================
+class CatalogFeed:
+    def __init__(self, backlog=256, max_subscribers=THREADED_MAX_SUBSCRIBERS, heartbeat=15.0,
+                 retry_ms=3000, broker=None, poll_seconds=0.5, app=None):
+        self.max_subscribers = max_subscribers
+        self.heartbeat = heartbeat
+        self.retry_ms = retry_ms
+        self.broker = broker
+        self.poll_seconds = poll_seconds
+        self.app = app
+        self.version = None           # last CatalogVersion published
+        self._cond = threading.Condition()
+        self._backlog = deque(maxlen=backlog)   # (seq, encoded chunk)
+        self._seq = 0
+        self._subscribers = 0
+        self._refresh_lock = threading.Lock()
+        self._watcher = None
+        self._stats = {
+            "published": 0,    # batches put on the bus
+            "events": 0,       # book/deleted events in them
+            "subscribed": 0,   # streams opened
+            "lagged": 0,       # streams dropped for falling behind the backlog
+            "rejected": 0,     # refused at max_subscribers
+            "peak": 0,         # most streams open at once
+        }
+
+    # ---- publishing ----
+    def refresh(self, repo, announce=True):
+        """Publish what was committed since the last refresh. With nobody
+        listening here this reads nothing (the position is re-read on the
+        next subscribe), except the version for the broker's other workers."""
+        count = 0
+        version = None
+        with self._refresh_lock:
+            if not self._subscribers:
+                self.version = None
+            elif self.version is None:
+                self.version = version = repo.catalog_version()
+            else:
+                changes = repo.catalog_changes(self.version)
+                version = changes['version']
+                if version > self.version:
+                    count = self.publish(changes)
+                    self.version = version
+        if announce and self.broker is not None:
+            self.broker.announce(version if version is not None else repo.catalog_version())
+        return count
+
+    def publish(self, changes):
+        chunk = encode_changes(changes)
+        if not chunk:
+            return 0
+        count = len(changes['books']) + len(changes['deleted'])
+        with self._cond:
+            self._seq += 1
+            self._backlog.append((self._seq, chunk))
+            self._stats["published"] += 1
+            self._stats["events"] += count
+            self._cond.notify_all()
+        return count
+
+    # ---- subscribing ----
+    def subscribe(self, repo, since=None):
+        """A Subscription (the response body) starting at the current bus
+        position; with `since`, backfilled from the database first."""
+        with self._cond:
+            if self._subscribers >= self.max_subscribers:
+                self._stats["rejected"] += 1
+                raise FeedFull(f"{self.max_subscribers} live streams already open")
+            self._subscribers += 1
+            self._stats["subscribed"] += 1
+            self._stats["peak"] = max(self._stats["peak"], self._subscribers)
+            cursor = self._seq
+        subscription = Subscription(self, cursor)
+        try:
+            with self._refresh_lock:
+                if self.version is None:
+                    self.version = repo.catalog_version()
+            if since is not None:
+                subscription.preamble = self._backfill(repo, since)
+        except Exception:
+            subscription.close()
+            raise
+        self._start_watcher()
+        return subscription
+
+    def _backfill(self, repo, since):
+        changes = repo.catalog_changes(since)
+        if since > changes['version']:
+            return RESYNC   # version from another database (restore/rebuild)
+        if len(changes['books']) + len(changes['deleted']) > MAX_BACKFILL:
+            return RESYNC
+        return encode_changes(changes)
+
+    def _unsubscribe(self):
+        with self._cond:
+            self._subscribers -= 1
+
+    def wait(self, cursor, timeout):
+        """Chunks published after `cursor`: [] on timeout, None if some have
+        already left the backlog."""
+        with self._cond:
+            if self._seq == cursor:
+                self._cond.wait(timeout)
+            missed = self._seq - cursor
+            if not missed:
+                return []
+            if missed > len(self._backlog):
+                self._stats["lagged"] += 1
+                return None
+            # The newest `missed` entries, oldest first
+            return list(itertools.islice(reversed(self._backlog), missed))[::-1]
+
+    # ---- broker watcher ----
+    def _start_watcher(self):
+        if self.broker is None or self._watcher is not None:
+            return
+        with self._refresh_lock:
+            if self._watcher is None:
+                self._watcher = threading.Thread(
+                    target=self._watch, name='live-updates-watcher', daemon=True
+                )
+                self._watcher.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_seconds)
+            try:
+                latest = self.broker.latest()
+                if not self._subscribers or latest is None or self.version is None \
+                        or latest <= self.version:
+                    continue
+                with self.app.app_context():
+                    self.refresh(get_repo(), announce=False)
+            except Exception:
+                logger.exception("Live updates watcher failed")
+
+    def stats(self):
+        with self._cond:
+            data = dict(self._stats)
+            data.update({
+                "subscribers": self._subscribers,
+                "backlog": len(self._backlog),
+                "max_subscribers": self.max_subscribers,
+            })
+        data.update({
+            "version": self.version,
+            "broker": type(self.broker).__name__ if self.broker else None,
+        })
+        return data
+
+
+class Subscription:
+    """Iterable SSE body for one client. The WSGI server calls close() when
+    the client goes away (noticed on the next write: an event or heartbeat),
+    even if the body was never started."""
+
+    def __init__(self, feed, cursor):
+        self.feed = feed
+        self.cursor = cursor
+        self.preamble = b''
+        self._closed = False
+
+    def __iter__(self):
+        feed = self.feed
+        yield f'retry: {feed.retry_ms}\n\n'.encode() + self.preamble
+        if self.preamble == RESYNC:
+            return
+        while not self._closed:
+            chunks = feed.wait(self.cursor, feed.heartbeat)
+            if chunks is None:
+                # Fell behind: end the stream; the browser reconnects with
+                # Last-Event-ID and is backfilled from the database
+                return
+            if not chunks:
+                yield KEEPALIVE
+                continue
+            self.cursor = chunks[-1][0]
+            yield b''.join(chunk for _, chunk in chunks)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self.feed._unsubscribe()
+
+
+# =========================
+# FLASK INTEGRATION
+# =========================
+_feed_lock = threading.Lock()
+
+
+def greenlet_worker():
+    """True when gevent has patched threading (gunicorn -k gevent), so an
+    idle stream costs a greenlet rather than a server thread."""
+    monkey = sys.modules.get('gevent.monkey')
+    return bool(monkey and monkey.is_module_patched('threading'))
+
+
+def get_catalog_feed():
+    app = current_app._get_current_object()
+    feed = app.extensions.get('catalog_feed')
+    if feed is None:
+        with _feed_lock:
+            feed = app.extensions.get('catalog_feed')
+            if feed is None:
+                path = app.config.get('LIVE_UPDATES_BROKER')
+                max_subscribers = app.config.get('LIVE_UPDATES_MAX_SUBSCRIBERS')
+                if max_subscribers is None:
+                    max_subscribers = (GREENLET_MAX_SUBSCRIBERS if greenlet_worker()
+                                       else THREADED_MAX_SUBSCRIBERS)
+                feed = CatalogFeed(
+                    backlog=app.config.get('LIVE_UPDATES_BACKLOG', 256),
+                    max_subscribers=max_subscribers,
+                    heartbeat=app.config.get('LIVE_UPDATES_HEARTBEAT', 15.0),
+                    broker=SqliteBroker(path) if path else None,
+                    poll_seconds=app.config.get('LIVE_UPDATES_POLL_SECONDS', 0.5),
+                    app=app,
+                )
+                app.extensions['catalog_feed'] = feed
+    return feed
+
+
+def publish_catalog_changes():
+    """Push this request's committed catalog changes to open streams. A
+    failure here never fails the change itself."""
+    try:
+        get_catalog_feed().refresh(get_repo())
+    except Exception:
+        current_app.logger.exception("Publishing live catalog changes failed")
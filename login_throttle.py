@@ -0,0 +1,256 @@
+# login_throttle.py
+# Pre-authentication throttling for /login.
+#
+# Every login used to cost an Accounts SELECT, a bcrypt check and up to two
+# UPDATEs, even for usernames that are being hammered or don't exist. The
+# throttle runs first and rejects excess attempts before any of that:
+#   * per client IP - a token bucket (LOGIN_THROTTLE_IP_BURST attempts,
+#     refilled at LOGIN_THROTTLE_IP_PER_MINUTE), counting every attempt
+#   * per username  - the same rule as Accounts.FailedAttempts/LockoutUntil:
+#     after LOGIN_THROTTLE_MAX_FAILURES failures within the lockout window
+#     the name is blocked for LOGIN_THROTTLE_LOCKOUT_SECONDS. Known lockouts
+#     read from the database are mirrored in, and a successful login clears
+#     the counter just like clear_lockout does.
+#
+# State lives in memory by default. Set LOGIN_THROTTLE_STORE to a file path
+# to share it between worker processes through a small SQLite database.
+import sqlite3
+import threading
+import time
+
+from flask import current_app
+
+
+# =========================
+# STORES
+# =========================
+class MemoryStore:
+    """Per-process state: {key: (state, expires_at)}."""
+
+    def __init__(self, max_keys=100_000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def get(self, key, now):
+        with self._lock:
+            entry = self._data.get(key)
+        return entry[0] if entry and entry[1] > now else None
+
+    def update(self, key, fn, now):
+        # fn(state or None) -> (new_state or None, result, ttl_seconds)
+        with self._lock:
+            entry = self._data.get(key)
+            state = entry[0] if entry and entry[1] > now else None
+            new_state, result, ttl = fn(state)
+            if new_state is None:
+                self._data.pop(key, None)
+            else:
+                self._data[key] = (new_state, now + ttl)
+            if len(self._data) > self.max_keys:
+                self._purge(now)
+            return result
+
+    def _purge(self, now):
+        expired = [k for k, (_, expires) in self._data.items() if expires <= now]
+        for k in expired:
+            del self._data[k]
+
+
+class SqliteStore:
+    """State shared between processes through one SQLite file."""
+
+    PURGE_EVERY = 1000
+
+    def __init__(self, path, busy_timeout=5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._updates = 0
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS LoginThrottle (
+                Key TEXT PRIMARY KEY,
+                A REAL NOT NULL,
+                B REAL NOT NULL,
+                ExpiresAt REAL NOT NULL
+            )
+        """)
+
+    def get(self, key, now):
+        return self._conn().execute(
+            "SELECT A, B FROM LoginThrottle WHERE Key = ? AND ExpiresAt > ?",
+            (key, now),
+        ).fetchone()
+
+    def update(self, key, fn, now):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT A, B FROM LoginThrottle WHERE Key = ? AND ExpiresAt > ?",
+                (key, now),
+            ).fetchone()
+            new_state, result, ttl = fn(row)
+            if new_state is None:
+                conn.execute("DELETE FROM LoginThrottle WHERE Key = ?", (key,))
+            else:
+                conn.execute(
+                    "INSERT OR REPLACE INTO LoginThrottle (Key, A, B, ExpiresAt) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, new_state[0], new_state[1], now + ttl),
+                )
+            self._updates += 1
+            if self._updates % self.PURGE_EVERY == 0:
+                conn.execute("DELETE FROM LoginThrottle WHERE ExpiresAt <= ?", (now,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path, timeout=self.busy_timeout,
+                isolation_level=None, check_same_thread=False,
+            )
+            self._local.conn = conn
+        return conn
+
+
+# =========================
+# THROTTLE
+# =========================
+class LoginThrottle:
+    # State is a pair in both stores:
+    #   ip:<addr>    -> (tokens, updated_at)
+    #   user:<name>  -> (failures, blocked_until)
+
+    def __init__(self, store, ip_burst=20, ip_per_minute=10,
+                 max_failures=3, lockout_seconds=180):
+        self.store = store
+        self.ip_burst = ip_burst
+        self.ip_rate = ip_per_minute / 60.0
+        self.max_failures = max_failures
+        self.lockout_seconds = lockout_seconds
+        self._stats_lock = threading.Lock()
+        self._stats = {"allowed": 0, "rejected_ip": 0, "rejected_user": 0}
+
+    def check(self, ip, username):
+        """Seconds the caller must wait, or 0 if the attempt may proceed."""
+        now = time.time()
+
+        wait = self._blocked_for(username, now)
+        if wait:
+            self._count("rejected_user")
+            return wait
+
+        wait = self._take_token(ip, now)
+        if wait:
+            self._count("rejected_ip")
+            return wait
+
+        self._count("allowed")
+        return 0
+
+    def failed(self, username):
+        """Record a failed attempt; returns the failure count in the window."""
+        now = time.time()
+
+        def apply(state):
+            failures = int(state[0]) if state else 0
+            failures += 1
+            if failures >= self.max_failures:
+                return (0, now + self.lockout_seconds), failures, self.lockout_seconds
+            return (failures, 0), failures, self.lockout_seconds
+
+        return self.store.update(self._user_key(username), apply, now)
+
+    def lock(self, username, until):
+        """Mirror a lockout already recorded in Accounts.LockoutUntil."""
+        now = time.time()
+        seconds = min(until - now, self.lockout_seconds)
+        if seconds <= 0:
+            return
+        self.store.update(
+            self._user_key(username),
+            lambda state: ((0, now + seconds), None, seconds),
+            now,
+        )
+
+    def clear(self, username):
+        """Forget a username's failures, as clear_lockout/a password reset do."""
+        self.store.update(self._user_key(username), lambda state: (None, None, 0), time.time())
+
+    succeeded = clear
+
+    def stats(self):
+        with self._stats_lock:
+            data = dict(self._stats)
+        data.update({
+            "ip_burst": self.ip_burst,
+            "ip_per_minute": round(self.ip_rate * 60, 2),
+            "max_failures": self.max_failures,
+            "lockout_seconds": self.lockout_seconds,
+            "store": type(self.store).__name__,
+        })
+        return data
+
+    # ---- internals ----
+    def _blocked_for(self, username, now):
+        state = self.store.get(self._user_key(username), now)
+        return max(0, state[1] - now) if state else 0
+
+    def _take_token(self, ip, now):
+        # An idle bucket is full again after burst / rate seconds
+        ttl = self.ip_burst / self.ip_rate if self.ip_rate else 3600
+
+        def apply(state):
+            if state:
+                tokens, updated = state
+                tokens = min(self.ip_burst, tokens + (now - updated) * self.ip_rate)
+            else:
+                tokens = self.ip_burst
+            if tokens < 1:
+                wait = (1 - tokens) / self.ip_rate if self.ip_rate else ttl
+                return (tokens, now), wait, ttl
+            return (tokens - 1, now), 0, ttl
+
+        return self.store.update(f"ip:{ip}", apply, now)
+
+    @staticmethod
+    def _user_key(username):
+        return f"user:{(username or '').strip().lower()}"
+
+    def _count(self, key):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+
+# =========================
+# FLASK INTEGRATION
+# =========================
+_throttle_lock = threading.Lock()
+
+
+def get_login_throttle():
+    app = current_app._get_current_object()
+    throttle = app.extensions.get('login_throttle')
+    if throttle is None:
+        with _throttle_lock:
+            throttle = app.extensions.get('login_throttle')
+            if throttle is None:
+                path = app.config.get('LOGIN_THROTTLE_STORE')
+                store = SqliteStore(path) if path else MemoryStore()
+                throttle = LoginThrottle(
+                    store,
+                    ip_burst=app.config.get('LOGIN_THROTTLE_IP_BURST', 20),
+                    ip_per_minute=app.config.get('LOGIN_THROTTLE_IP_PER_MINUTE', 10),
+                    max_failures=app.config.get('LOGIN_THROTTLE_MAX_FAILURES', 3),
+                    lockout_seconds=app.config.get('LOGIN_THROTTLE_LOCKOUT_SECONDS', 180),
+                )
+                app.extensions['login_throttle'] = throttle
+    return throttle
@@ -0,0 +1,213 @@
+# migrate.py
+# Versioned schema/index migrations for the LibraryData tables.
+#
+# Scripts live in migrations/ as NNNN_name.py (see migrations/__init__.py).
+# `flask --app app migrate` applies the pending ones in version order. Each
+# script runs in its own transaction together with its row in
+# LibraryData.SchemaMigrations, so a failure leaves nothing half-recorded
+# and a re-run only picks up what is still missing. Concurrent runners are
+# serialised on a lock over the history table and re-check it once they
+# hold the lock.
+#
+# The SQLite stand-in applies pending migrations when its pool is first
+# built (DB_AUTO_MIGRATE); on SQL Server they are run explicitly.
+import importlib.util
+import re
+import time
+from pathlib import Path
+
+import click
+from flask.cli import with_appcontext
+
+MIGRATIONS_DIR = Path(__file__).with_name('migrations')
+_FILENAME = re.compile(r'^(\d{4})_(\w+)\.py$')
+
+HISTORY_DDL = {
+    'sqlserver': """
+        IF OBJECT_ID(N'LibraryData.SchemaMigrations', N'U') IS NULL
+            CREATE TABLE LibraryData.SchemaMigrations (
+                Version    INT           NOT NULL CONSTRAINT PK_SchemaMigrations PRIMARY KEY,
+                Name       NVARCHAR(255) NOT NULL,
+                AppliedAt  DATETIME      NOT NULL DEFAULT (GETDATE()),
+                DurationMs INT           NOT NULL
+            );
+    """,
+    'sqlite': """
+        CREATE TABLE IF NOT EXISTS LibraryData.SchemaMigrations (
+            Version    INTEGER       NOT NULL PRIMARY KEY,
+            Name       NVARCHAR(255) NOT NULL,
+            AppliedAt  TIMESTAMP     NOT NULL DEFAULT (datetime('now', 'localtime')),
+            DurationMs INT           NOT NULL
+        )
+    """,
+}
+
+# Opens the migration's transaction holding an exclusive lock on the history
+# (pyodbc runs with autocommit off, so the SELECT starts the transaction)
+BEGIN = {
+    'sqlserver': "SELECT COUNT(*) FROM LibraryData.SchemaMigrations WITH (TABLOCKX, HOLDLOCK)",
+    'sqlite': "BEGIN IMMEDIATE",
+}
+
+
+class MigrationError(Exception):
+    """Raised when the migration scripts or a migration run are invalid."""
+
+
+class Migration:
+    def __init__(self, version, name, description, statements):
+        self.version = version
+        self.name = name
+        self.description = description
+        self.statements = statements   # {'sqlserver': [...], 'sqlite': [...]}
+
+    def __repr__(self):
+        return f"<Migration {self.version:04d} {self.name}>"
+
+
+def discover(directory=MIGRATIONS_DIR):
+    """All migration scripts in `directory`, in version order."""
+    migrations = {}
+    for path in sorted(Path(directory).glob('*.py')):
+        match = _FILENAME.match(path.name)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise MigrationError(f"Duplicate migration version {version:04d}: {path.name}")
+
+        spec = importlib.util.spec_from_file_location(f"migrations.m{path.stem}", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        migrations[version] = Migration(
+            version,
+            match.group(2),
+            getattr(module, 'DESCRIPTION', match.group(2)),
+            {'sqlserver': list(getattr(module, 'SQLSERVER', [])),
+             'sqlite': list(getattr(module, 'SQLITE', []))},
+        )
+    return [migrations[v] for v in sorted(migrations)]
+
+
+# =========================
+# RUNNER
+# =========================
+class MigrationRunner:
+    def __init__(self, conn, dialect, migrations=None):
+        if dialect not in HISTORY_DDL:
+            raise MigrationError(f"No migrations for backend {dialect!r}")
+        self.conn = conn
+        self.dialect = dialect
+        self.migrations = discover() if migrations is None else migrations
+
+    def applied(self):
+        """{version: (name, applied_at, duration_ms)} from SchemaMigrations."""
+        self._ensure_history()
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT Version, Name, AppliedAt, DurationMs
+            FROM LibraryData.SchemaMigrations
+        """)
+        rows = {row[0]: tuple(row[1:]) for row in cursor.fetchall()}
+        self.conn.rollback()
+        return rows
+
+    def pending(self, target=None):
+        done = self.applied()
+        return [m for m in self.migrations
+                if m.version not in done and (target is None or m.version <= target)]
+
+    def run(self, target=None, progress=None):
+        """Apply pending migrations up to `target`; returns [(migration, seconds)]."""
+        results = []
+        for migration in self.pending(target):
+            seconds = self.apply(migration)
+            if seconds is None:
+                continue   # another runner got there first
+            results.append((migration, seconds))
+            if progress:
+                progress(migration, seconds)
+        return results
+
+    def apply(self, migration):
+        """Run one migration and record it in the same transaction.
+
+        Returns its duration in seconds, or None if it was already applied.
+        """
+        cursor = self.conn.cursor()
+        started = time.perf_counter()
+        try:
+            cursor.execute(BEGIN[self.dialect])
+            cursor.execute(
+                "SELECT 1 FROM LibraryData.SchemaMigrations WHERE Version = ?",
+                (migration.version,)
+            )
+            if cursor.fetchone():
+                self.conn.rollback()
+                return None
+
+            for statement in migration.statements[self.dialect]:
+                cursor.execute(statement)
+
+            seconds = time.perf_counter() - started
+            cursor.execute("""
+                INSERT INTO LibraryData.SchemaMigrations (Version, Name, DurationMs)
+                VALUES (?, ?, ?)
+            """, (migration.version, migration.name, int(seconds * 1000)))
+            self.conn.commit()
+        except Exception as e:
+            self.conn.rollback()
+            raise MigrationError(
+                f"Migration {migration.version:04d}_{migration.name} failed: {e}"
+            ) from e
+        return seconds
+
+    def _ensure_history(self):
+        cursor = self.conn.cursor()
+        cursor.execute(HISTORY_DDL[self.dialect])
+        self.conn.commit()
+
+
+def apply_pending(backend, progress=None):
+    """Bring the backend's database up to date on a fresh connection."""
+    conn = backend.connect()
+    try:
+        return MigrationRunner(conn, backend.name).run(progress=progress)
+    finally:
+        conn.close()
+
+
+# =========================
+# CLI
+# =========================
+@click.command('migrate')
+@click.option('--status', is_flag=True, help='List applied and pending migrations only.')
+@click.option('--target', type=int, default=None, help='Stop after this version.')
+@with_appcontext
+def migrate_command(status, target):
+    """Apply pending schema/index migrations from migrations/."""
+    from db import get_backend
+
+    backend = get_backend()
+    conn = backend.connect()
+    try:
+        runner = MigrationRunner(conn, backend.name)
+        if status:
+            applied = runner.applied()
+            for m in runner.migrations:
+                if m.version in applied:
+                    _, applied_at, duration_ms = applied[m.version]
+                    state = f"applied {applied_at} ({duration_ms} ms)"
+                else:
+                    state = "pending"
+                click.echo(f"{m.version:04d} {m.description:<50} {state}")
+            return
+
+        def progress(migration, seconds):
+            click.echo(f"Applied {migration.version:04d} {migration.description} "
+                       f"in {seconds * 1000:.0f} ms")
+
+        results = runner.run(target, progress)
+        click.echo(f"{len(results)} migration(s) applied." if results else "Already up to date.")
+    finally:
+        conn.close()
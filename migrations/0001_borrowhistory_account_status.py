@@ -0,0 +1,22 @@
+# migrations/0001_borrowhistory_account_status.py
+# Open loans per reader: the borrow-limit check in LibraryData.BorrowBook,
+# the reader's borrowed-books list and the RLS-filtered history all filter
+# on AccountID + Status + ReturnDate.
+DESCRIPTION = "Index BorrowHistory(AccountID, Status, ReturnDate)"
+
+SQLSERVER = [
+    """
+    IF NOT EXISTS (SELECT 1 FROM sys.indexes
+                   WHERE name = 'IX_LibraryData_BorrowHistory_Account_Status')
+        CREATE INDEX IX_LibraryData_BorrowHistory_Account_Status
+        ON LibraryData.BorrowHistory(AccountID, Status, ReturnDate)
+        INCLUDE (BookID, BorrowDate);
+    """,
+]
+
+SQLITE = [
+    """
+    CREATE INDEX IF NOT EXISTS LibraryData.IX_LibraryData_BorrowHistory_Account_Status
+        ON BorrowHistory (AccountID, Status, ReturnDate, BorrowDate, BookID)
+    """,
+]
@@ -0,0 +1,30 @@
+# migrations/0002_books_title_category.py
+# Catalog browsing: title order/prefix lookups and the category filter
+# (reader catalog, dashboard inventory, per-category counts).
+DESCRIPTION = "Index Books(Title) and Books(Category)"
+
+SQLSERVER = [
+    """
+    IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_LibraryData_Books_Title')
+        CREATE INDEX IX_LibraryData_Books_Title
+        ON LibraryData.Books(Title, BookID)
+        INCLUDE (Author, Category, Available);
+    """,
+    """
+    IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_LibraryData_Books_Category')
+        CREATE INDEX IX_LibraryData_Books_Category
+        ON LibraryData.Books(Category, Title, BookID)
+        INCLUDE (Author, Available);
+    """,
+]
+
+SQLITE = [
+    """
+    CREATE INDEX IF NOT EXISTS LibraryData.IX_LibraryData_Books_Title
+        ON Books (Title, BookID)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS LibraryData.IX_LibraryData_Books_Category
+        ON Books (Category, Title, BookID, Available)
+    """,
+]
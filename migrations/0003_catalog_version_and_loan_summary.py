@@ -0,0 +1,173 @@
+# migrations/0003_catalog_version_and_loan_summary.py
+# Objects the later migrations' procedures depend on that a database built
+# from the original complete_sql.sql does not have: the CatalogVersion
+# counter, the LoanDueSummary table (filled from the loans open now) with
+# AdjustLoanDueSummary and its open-loans index, and the table types behind
+# the bulk import/provisioning/toggle/delete procedures. CreateReaderAccounts
+# and DeleteUsers come here too, as no later migration changes them.
+DESCRIPTION = "Add CatalogVersion, LoanDueSummary and bulk table types"
+
+SQLSERVER = [
+    """
+    IF OBJECT_ID(N'LibraryData.CatalogVersion', N'U') IS NULL
+    BEGIN
+        CREATE TABLE LibraryData.CatalogVersion (
+            ID INT NOT NULL CONSTRAINT PK_CatalogVersion PRIMARY KEY
+                CONSTRAINT CK_CatalogVersion_Single CHECK (ID = 1),
+            Version BIGINT NOT NULL DEFAULT (0)
+        );
+        INSERT INTO LibraryData.CatalogVersion (ID, Version) VALUES (1, 0);
+    END
+    """,
+    """
+    IF OBJECT_ID(N'LibraryData.LoanDueSummary', N'U') IS NULL
+    BEGIN
+        CREATE TABLE LibraryData.LoanDueSummary (
+            DueDay    DATE          NOT NULL,
+            AccountID INT           NOT NULL,
+            Category  NVARCHAR(100) NOT NULL,
+            OpenLoans INT           NOT NULL,
+            CONSTRAINT PK_LoanDueSummary PRIMARY KEY (DueDay, AccountID, Category)
+        );
+
+        -- Start from the loans that are open right now
+        INSERT INTO LibraryData.LoanDueSummary (DueDay, AccountID, Category, OpenLoans)
+        SELECT CAST(DATEADD(day, 14, bh.BorrowDate) AS DATE), bh.AccountID,
+               ISNULL(b.Category, ''), COUNT(*)
+        FROM LibraryData.BorrowHistory bh
+        JOIN LibraryData.Books b ON b.BookID = bh.BookID
+        WHERE bh.ReturnDate IS NULL
+        GROUP BY CAST(DATEADD(day, 14, bh.BorrowDate) AS DATE), bh.AccountID, ISNULL(b.Category, '');
+    END
+    """,
+    """
+    CREATE OR ALTER PROCEDURE LibraryData.AdjustLoanDueSummary
+        @DueDay DATE,
+        @AccountID INT,
+        @Category NVARCHAR(100),
+        @Delta INT
+    AS
+    BEGIN
+        SET NOCOUNT ON;
+
+        SET @Category = ISNULL(@Category, '');
+
+        UPDATE LibraryData.LoanDueSummary
+        SET OpenLoans = OpenLoans + @Delta
+        WHERE DueDay = @DueDay AND AccountID = @AccountID AND Category = @Category;
+
+        IF @@ROWCOUNT = 0 AND @Delta > 0
+            INSERT INTO LibraryData.LoanDueSummary (DueDay, AccountID, Category, OpenLoans)
+            VALUES (@DueDay, @AccountID, @Category, @Delta);
+
+        DELETE FROM LibraryData.LoanDueSummary
+        WHERE DueDay = @DueDay AND AccountID = @AccountID AND Category = @Category
+          AND OpenLoans <= 0;
+    END;
+    """,
+    """
+    IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_LibraryData_BorrowHistory_OpenLoans')
+        CREATE INDEX IX_LibraryData_BorrowHistory_OpenLoans
+        ON LibraryData.BorrowHistory(BorrowDate)
+        INCLUDE (AccountID, BookID)
+        WHERE ReturnDate IS NULL;
+    """,
+    """
+    IF TYPE_ID(N'LibraryData.BookImportRows') IS NULL
+        CREATE TYPE LibraryData.BookImportRows AS TABLE (
+            Title NVARCHAR(255) NOT NULL,
+            Author NVARCHAR(255) NOT NULL,
+            Category NVARCHAR(100) NOT NULL
+        );
+    """,
+    """
+    IF TYPE_ID(N'LibraryData.AccountImportRows') IS NULL
+        CREATE TYPE LibraryData.AccountImportRows AS TABLE (
+            Username NVARCHAR(50) NOT NULL PRIMARY KEY,
+            Password NVARCHAR(255) NOT NULL
+        );
+    """,
+    """
+    IF TYPE_ID(N'LibraryData.BookIDList') IS NULL
+        CREATE TYPE LibraryData.BookIDList AS TABLE (
+            BookID INT NOT NULL PRIMARY KEY
+        );
+    """,
+    """
+    IF TYPE_ID(N'LibraryData.UsernameList') IS NULL
+        CREATE TYPE LibraryData.UsernameList AS TABLE (
+            Username NVARCHAR(50) NOT NULL PRIMARY KEY
+        );
+    """,
+    """
+    CREATE OR ALTER PROCEDURE LibraryData.CreateReaderAccounts
+        @Accounts LibraryData.AccountImportRows READONLY
+    AS
+    BEGIN
+        SET NOCOUNT ON;
+        SET XACT_ABORT ON;
+
+        BEGIN TRANSACTION;
+
+        INSERT INTO LibraryData.Accounts (Username, Password, Role)
+        OUTPUT inserted.Username
+        SELECT a.Username, a.Password, 'Reader'
+        FROM @Accounts a
+        WHERE NOT EXISTS (
+            SELECT 1 FROM LibraryData.Accounts x WITH (UPDLOCK, HOLDLOCK)
+            WHERE x.Username = a.Username
+        );
+
+        COMMIT TRANSACTION;
+    END;
+    """,
+    """
+    CREATE OR ALTER PROCEDURE LibraryData.DeleteUsers
+        @Usernames LibraryData.UsernameList READONLY
+    AS
+    BEGIN
+        SET NOCOUNT ON;
+        SET XACT_ABORT ON;
+
+        DECLARE @Outcome TABLE (
+            Username NVARCHAR(50) PRIMARY KEY,
+            AccountID INT NULL,
+            Status INT NOT NULL
+        );
+
+        BEGIN TRANSACTION;
+
+        INSERT INTO @Outcome (Username, AccountID, Status)
+        SELECT u.Username, a.AccountID,
+               CASE
+                   WHEN a.AccountID IS NULL THEN 1
+                   WHEN LOWER(a.Username) = 'librarian' THEN 3
+                   WHEN EXISTS (
+                       SELECT 1 FROM LibraryData.BorrowHistory h WITH (UPDLOCK, HOLDLOCK)
+                       WHERE h.AccountID = a.AccountID
+                   ) THEN 2
+                   ELSE 0
+               END
+        FROM @Usernames u
+        LEFT JOIN LibraryData.Accounts a WITH (UPDLOCK, HOLDLOCK) ON a.Username = u.Username;
+
+        DELETE a
+        FROM LibraryData.Accounts a
+        JOIN @Outcome o ON o.AccountID = a.AccountID
+        WHERE o.Status = 0;
+
+        COMMIT TRANSACTION;
+
+        SELECT Username, Status FROM @Outcome ORDER BY Username;
+    END;
+    """,
+    "GRANT EXECUTE ON LibraryData.CreateReaderAccounts TO librarian_role;",
+    "GRANT EXECUTE ON LibraryData.DeleteUsers TO librarian_role;",
+    "GRANT EXECUTE ON TYPE::LibraryData.BookImportRows TO librarian_role;",
+    "GRANT EXECUTE ON TYPE::LibraryData.AccountImportRows TO librarian_role;",
+    "GRANT EXECUTE ON TYPE::LibraryData.BookIDList TO librarian_role;",
+    "GRANT EXECUTE ON TYPE::LibraryData.UsernameList TO librarian_role;",
+]
+
+# Part of storage/sqlite_schema.sql, which builds each stand-in database
+SQLITE = []
@@ -0,0 +1,213 @@
+# migrations/0004_accounts_credential_version.py
+# Sessions carry the CredentialVersion they logged in with; resets and
+# lockouts bump it. Databases built from an older complete_sql.sql get the
+# column here, followed by the procedures that bump or check it
+# (ResetUserPassword, BorrowBook, ReturnBook, RecordLoginAttempt) as they
+# stood at this version; later migrations replace them in turn.
+DESCRIPTION = "Add Accounts.CredentialVersion"
+
+SQLSERVER = [
+    """
+    IF COL_LENGTH('LibraryData.Accounts', 'CredentialVersion') IS NULL
+        ALTER TABLE LibraryData.Accounts
+        ADD CredentialVersion INT NOT NULL
+            CONSTRAINT DF_Accounts_CredentialVersion DEFAULT (0);
+    """,
+    """
+    CREATE OR ALTER PROCEDURE LibraryData.ResetUserPassword
+        @Username NVARCHAR(50),
+        @HashedPassword NVARCHAR(255)
+    AS
+    BEGIN
+        UPDATE LibraryData.Accounts
+        SET Password = @HashedPassword,
+            FailedAttempts = 0,
+            LockoutUntil = NULL,
+            CreatedDate = GETDATE(),
+            CredentialVersion = CredentialVersion + 1
+        WHERE Username = @Username;
+    END;
+    """,
+    """
+    CREATE OR ALTER PROCEDURE LibraryData.BorrowBook
+        @AccountID INT,
+        @BookID INT,
+        @MaxLoans INT = 3,
+        @CredentialVersion INT = NULL
+    AS
+    BEGIN
+        SET NOCOUNT ON;
+        SET XACT_ABORT ON;
+
+        DECLARE @Status INT = 0;
+        DECLARE @Now DATETIME = GETDATE();
+        DECLARE @DueDate DATETIME = DATEADD(day, 14, @Now);
+        DECLARE @DueDay DATE = CAST(DATEADD(day, 14, @Now) AS DATE);
+        DECLARE @OpenLoans INT;
+        DECLARE @Category NVARCHAR(100);
+
+        BEGIN TRANSACTION;
+
+        -- 1. Lock the borrower's account row for the rest of the transaction
+        --    (and refuse a session from before a reset/lockout)
+        IF NOT EXISTS (
+            SELECT 1 FROM LibraryData.Accounts WITH (UPDLOCK, ROWLOCK)
+            WHERE AccountID = @AccountID
+              AND (@CredentialVersion IS NULL OR CredentialVersion = @CredentialVersion)
+        )
+            SET @Status = 1;
+
+        -- 2. Borrow limit check
+        IF @Status = 0
+        BEGIN
+            SELECT @OpenLoans = COUNT(*)
+            FROM LibraryData.BorrowHistory WITH (UPDLOCK, HOLDLOCK)
+            WHERE AccountID = @AccountID
+              AND Status = 'borrow'
+              AND ReturnDate IS NULL;
+
+            IF @OpenLoans >= @MaxLoans
+                SET @Status = 2;
+        END
+
+        -- 3. Claim the book only if it is still available
+        IF @Status = 0
+        BEGIN
+            UPDATE LibraryData.Books WITH (UPDLOCK, ROWLOCK)
+            SET @Category = ISNULL(Category, ''),
+                Available = 0,
+                DueDate = @DueDate
+            WHERE BookID = @BookID AND Available = 1;
+
+            IF @@ROWCOUNT = 0
+                SET @Status = CASE
+                    WHEN EXISTS (SELECT 1 FROM LibraryData.Books WHERE BookID = @BookID) THEN 3
+                    ELSE 4
+                END;
+        END
+
+        -- 4. Log the loan and count it in the overdue summary
+        IF @Status = 0
+        BEGIN
+            INSERT INTO LibraryData.BorrowHistory (AccountID, BookID, BorrowDate, Status)
+            VALUES (@AccountID, @BookID, @Now, 'borrow');
+
+            EXEC LibraryData.AdjustLoanDueSummary @DueDay, @AccountID, @Category, 1;
+
+            UPDATE LibraryData.CatalogVersion SET Version = Version + 1;
+        END
+
+        COMMIT TRANSACTION;
+
+        SELECT @Status AS Status, CASE WHEN @Status = 0 THEN @DueDate END AS DueDate;
+    END;
+    """,
+    """
+    CREATE OR ALTER PROCEDURE LibraryData.ReturnBook
+        @AccountID INT,
+        @BookID INT,
+        @CredentialVersion INT = NULL
+    AS
+    BEGIN
+        SET NOCOUNT ON;
+        SET XACT_ABORT ON;
+
+        DECLARE @Status INT = 0;
+        DECLARE @BorrowDate DATETIME;
+        DECLARE @Category NVARCHAR(100);
+
+        BEGIN TRANSACTION;
+
+        IF NOT EXISTS (
+            SELECT 1 FROM LibraryData.Accounts
+            WHERE AccountID = @AccountID
+              AND (@CredentialVersion IS NULL OR CredentialVersion = @CredentialVersion)
+        )
+            SET @Status = 1;
+
+        IF @Status = 0
+        BEGIN
+            UPDATE LibraryData.BorrowHistory WITH (UPDLOCK, ROWLOCK)
+            SET @BorrowDate = BorrowDate,
+                ReturnDate = GETDATE(),
+                Status = 'return'
+            WHERE AccountID = @AccountID
+              AND BookID = @BookID
+              AND ReturnDate IS NULL;
+
+            IF @@ROWCOUNT = 0
+                SET @Status = 5;
+        END
+
+        IF @Status = 0
+        BEGIN
+            UPDATE LibraryData.Books WITH (UPDLOCK, ROWLOCK)
+            SET @Category = ISNULL(Category, ''),
+                Available = 1,
+                DueDate = NULL
+            WHERE BookID = @BookID;
+
+            DECLARE @DueDay DATE = CAST(DATEADD(day, 14, @BorrowDate) AS DATE);
+            EXEC LibraryData.AdjustLoanDueSummary @DueDay, @AccountID, @Category, -1;
+
+            UPDATE LibraryData.CatalogVersion SET Version = Version + 1;
+        END
+
+        COMMIT TRANSACTION;
+
+        SELECT @Status AS Status;
+    END;
+    """,
+    """
+    CREATE OR ALTER PROCEDURE LibraryData.RecordLoginAttempt
+        @Username NVARCHAR(50),
+        @Success BIT,
+        @MaxAttempts INT,
+        @LockoutMinutes INT,
+        @OldHash NVARCHAR(255) = NULL,
+        @NewHash NVARCHAR(255) = NULL
+    AS
+    BEGIN
+        SET NOCOUNT ON;
+
+        DECLARE @Now DATETIME = GETDATE();
+
+        WITH Attempt AS (
+            SELECT AccountID, FailedAttempts, LockoutUntil, Password, Role, CredentialVersion,
+                   CASE WHEN LockoutUntil > @Now THEN 1 ELSE 0 END AS Locked,
+                   CASE WHEN LockoutUntil <= @Now THEN 0 ELSE FailedAttempts END AS Failed
+            FROM LibraryData.Accounts WITH (UPDLOCK, ROWLOCK)
+            WHERE Username = @Username
+        )
+        UPDATE Attempt
+        SET FailedAttempts = CASE
+                WHEN Locked = 1 THEN FailedAttempts
+                WHEN @Success = 1 THEN 0
+                ELSE Failed + 1
+            END,
+            LockoutUntil = CASE
+                WHEN Locked = 1 THEN LockoutUntil
+                WHEN @Success = 1 THEN NULL
+                WHEN Failed + 1 < @MaxAttempts THEN NULL
+                WHEN Role = 'Librarian' THEN CAST('9999-12-31' AS DATETIME)
+                ELSE DATEADD(MINUTE, @LockoutMinutes, @Now)
+            END,
+            Password = CASE
+                WHEN Locked = 0 AND @Success = 1 AND @NewHash IS NOT NULL
+                     AND Password = @OldHash THEN @NewHash
+                ELSE Password
+            END,
+            CredentialVersion = CASE
+                WHEN Locked = 0 AND @Success = 0 AND Failed + 1 >= @MaxAttempts
+                    THEN CredentialVersion + 1
+                ELSE CredentialVersion
+            END
+        OUTPUT inserted.FailedAttempts, inserted.LockoutUntil,
+               inserted.AccountID, inserted.CredentialVersion;
+    END;
+    """,
+    "GRANT EXECUTE ON LibraryData.RecordLoginAttempt TO transaction_role;",
+]
+
+# Part of storage/sqlite_schema.sql, which builds each stand-in database
+SQLITE = []
@@ -0,0 +1,435 @@
+# migrations/0005_books_change_version.py
+# Catalog delta sync: each book carries the CatalogVersion of its last
+# change and deleted books leave a tombstone, so /api/catalog?since=N can
+# return just what changed. Databases built from an older complete_sql.sql
+# get the column and table here, followed by every procedure that changes a
+# book, now bumping CatalogVersion and stamping ChangeVersion (AddBook,
+# AddBooks, EditBook, DeleteBook, DeleteBooks, ToggleBookStatus,
+# ToggleBooksStatus, BorrowBook, ReturnBook).
+DESCRIPTION = "Add Books.ChangeVersion and BookTombstones"
+
+SQLSERVER = [
+    """
+    IF COL_LENGTH('LibraryData.Books', 'ChangeVersion') IS NULL
+        ALTER TABLE LibraryData.Books
+        ADD ChangeVersion BIGINT NOT NULL
+            CONSTRAINT DF_Books_ChangeVersion DEFAULT (0);
+    """,
+    """
+    IF OBJECT_ID(N'LibraryData.BookTombstones', N'U') IS NULL
+        CREATE TABLE LibraryData.BookTombstones (
+            BookID         INT    NOT NULL,
+            DeletedVersion BIGINT NOT NULL,
+            CONSTRAINT PK_BookTombstones PRIMARY KEY (DeletedVersion, BookID)
+        );
+    """,
+    """
+    IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_LibraryData_Books_ChangeVersion')
+        CREATE INDEX IX_LibraryData_Books_ChangeVersion
+        ON LibraryData.Books(ChangeVersion)
+        INCLUDE (Title, Author, Category, Available);
+    """,
+    "GRANT SELECT ON LibraryData.BookTombstones TO reader_role;",
+    """
+    CREATE OR ALTER PROCEDURE LibraryData.AddBook
+        @Title NVARCHAR(255),
+        @Author NVARCHAR(255),
+        @Category NVARCHAR(100)
+    AS
+    BEGIN
+        SET NOCOUNT ON;
+        SET XACT_ABORT ON;
+
+        DECLARE @Version BIGINT;
+        DECLARE @BookID INT;
+
+        BEGIN TRANSACTION;
+
+        UPDATE LibraryData.CatalogVersion SET @Version = Version = Version + 1;
+
+        INSERT INTO LibraryData.Books (Title, Author, Category, Available, ChangeVersion)
+        VALUES (@Title, @Author, @Category, 1, @Version);
+
+        SET @BookID = CAST(SCOPE_IDENTITY() AS INT);
+
+        COMMIT TRANSACTION;
+
+        -- New BookID for the app's in-process search index
+        SELECT @BookID AS BookID;
+    END;
+    """,
+    """
+    CREATE OR ALTER PROCEDURE LibraryData.AddBooks
+        @Books LibraryData.BookImportRows READONLY
+    AS
+    BEGIN
+        SET NOCOUNT ON;
+        SET XACT_ABORT ON;
+
+        DECLARE @Version BIGINT;
+        DECLARE @Inserted INT = 0;
+
+        IF EXISTS (SELECT 1 FROM @Books)
+        BEGIN
+            BEGIN TRANSACTION;
+
+            UPDATE LibraryData.CatalogVersion SET @Version = Version = Version + 1;
+
+            INSERT INTO LibraryData.Books (Title, Author, Category, Available, ChangeVersion)
+            SELECT Title, Author, Category, 1, @Version
+            FROM @Books;
+
+            SET @Inserted = @@ROWCOUNT;
+
+            COMMIT TRANSACTION;
+        END
+
+        SELECT @Inserted AS Inserted;
+    END;
+    """,
+    """
+    CREATE OR ALTER PROCEDURE LibraryData.EditBook
+        @BookID INT,
+        @Title NVARCHAR(255),
+        @Author NVARCHAR(255),
+        @Category NVARCHAR(100)
+    AS
+    BEGIN
+        SET NOCOUNT ON;
+        SET XACT_ABORT ON;
+
+        DECLARE @OldCategory NVARCHAR(100);
+        DECLARE @AccountID INT;
+        DECLARE @DueDay DATE;
+        DECLARE @Version BIGINT;
+        DECLARE @Updated INT;
+
+        BEGIN TRANSACTION;
+
+        UPDATE LibraryData.CatalogVersion SET @Version = Version = Version + 1;
+
+        SELECT @OldCategory = ISNULL(Category, '')
+        FROM LibraryData.Books WITH (UPDLOCK, ROWLOCK)
+        WHERE BookID = @BookID;
+
+        UPDATE LibraryData.Books
+        SET Title = @Title,
+            Author = @Author,
+            Category = @Category,
+            ChangeVersion = @Version
+        WHERE BookID = @BookID;
+
+        SET @Updated = @@ROWCOUNT;
+
+        IF @OldCategory <> ISNULL(@Category, '')
+        BEGIN
+            SELECT @AccountID = AccountID,
+                   @DueDay = CAST(DATEADD(day, 14, BorrowDate) AS DATE)
+            FROM LibraryData.BorrowHistory
+            WHERE BookID = @BookID AND ReturnDate IS NULL;
+
+            IF @AccountID IS NOT NULL
+            BEGIN
+                EXEC LibraryData.AdjustLoanDueSummary @DueDay, @AccountID, @OldCategory, -1;
+                EXEC LibraryData.AdjustLoanDueSummary @DueDay, @AccountID, @Category, 1;
+            END
+        END
+
+        COMMIT TRANSACTION;
+
+        -- 0 when the book does not exist (the app's search index is left alone)
+        SELECT @Updated AS Updated;
+    END;
+    """,
+    """
+    CREATE OR ALTER PROCEDURE LibraryData.DeleteBook
+        @BookID INT
+    AS
+    BEGIN
+        SET NOCOUNT ON;
+        SET XACT_ABORT ON;
+
+        DECLARE @Version BIGINT;
+
+        BEGIN TRANSACTION;
+
+        UPDATE LibraryData.CatalogVersion SET @Version = Version = Version + 1;
+
+        DELETE FROM LibraryData.Books
+        OUTPUT deleted.BookID, @Version
+        INTO LibraryData.BookTombstones (BookID, DeletedVersion)
+        WHERE BookID = @BookID;
+
+        COMMIT TRANSACTION;
+    END;
+    """,
+    """
+    CREATE OR ALTER PROCEDURE LibraryData.DeleteBooks
+        @BookIDs LibraryData.BookIDList READONLY
+    AS
+    BEGIN
+        SET NOCOUNT ON;
+        SET XACT_ABORT ON;
+
+        DECLARE @Outcome TABLE (BookID INT PRIMARY KEY, Status INT NOT NULL);
+        DECLARE @Version BIGINT;
+
+        BEGIN TRANSACTION;
+
+        -- CatalogVersion before any Books lock, as in every catalog procedure
+        IF EXISTS (SELECT 1 FROM LibraryData.Books b JOIN @BookIDs i ON i.BookID = b.BookID)
+            UPDATE LibraryData.CatalogVersion SET @Version = Version = Version + 1;
+
+        -- Lock the selected books and their history so the checks hold until
+        -- the delete
+        INSERT INTO @Outcome (BookID, Status)
+        SELECT i.BookID,
+               CASE
+                   WHEN b.BookID IS NULL THEN 1
+                   WHEN EXISTS (
+                       SELECT 1 FROM LibraryData.BorrowHistory h WITH (UPDLOCK, HOLDLOCK)
+                       WHERE h.BookID = i.BookID
+                   ) THEN 2
+                   ELSE 0
+               END
+        FROM @BookIDs i
+        LEFT JOIN LibraryData.Books b WITH (UPDLOCK, HOLDLOCK) ON b.BookID = i.BookID;
+
+        DELETE b
+        OUTPUT deleted.BookID, @Version
+        INTO LibraryData.BookTombstones (BookID, DeletedVersion)
+        FROM LibraryData.Books b
+        JOIN @Outcome o ON o.BookID = b.BookID
+        WHERE o.Status = 0;
+
+        COMMIT TRANSACTION;
+
+        SELECT BookID, Status FROM @Outcome ORDER BY BookID;
+    END;
+    """,
+    """
+    CREATE OR ALTER PROCEDURE LibraryData.ToggleBookStatus
+        @BookID INT
+    AS
+    BEGIN
+        SET NOCOUNT ON;
+        SET XACT_ABORT ON;
+
+        DECLARE @Version BIGINT;
+
+        BEGIN TRANSACTION;
+
+        UPDATE LibraryData.CatalogVersion SET @Version = Version = Version + 1;
+
+        -- Updated to use the LibraryData schema
+        UPDATE LibraryData.Books
+        SET Available = CASE 
+            WHEN Available = 1 THEN 0 
+            ELSE 1 
+        END,
+            ChangeVersion = @Version
+        WHERE BookID = @BookID;
+
+        COMMIT TRANSACTION;
+    END;
+    """,
+    """
+    CREATE OR ALTER PROCEDURE LibraryData.ToggleBooksStatus
+        @BookIDs LibraryData.BookIDList READONLY
+    AS
+    BEGIN
+        SET NOCOUNT ON;
+        SET XACT_ABORT ON;
+
+        DECLARE @Toggled TABLE (BookID INT PRIMARY KEY, Available INT);
+        DECLARE @Version BIGINT;
+
+        BEGIN TRANSACTION;
+
+        IF EXISTS (SELECT 1 FROM LibraryData.Books b JOIN @BookIDs i ON i.BookID = b.BookID)
+        BEGIN
+            UPDATE LibraryData.CatalogVersion SET @Version = Version = Version + 1;
+
+            UPDATE b
+            SET Available = CASE WHEN b.Available = 1 THEN 0 ELSE 1 END,
+                ChangeVersion = @Version
+            OUTPUT inserted.BookID, inserted.Available INTO @Toggled
+            FROM LibraryData.Books b
+            JOIN @BookIDs i ON i.BookID = b.BookID;
+        END
+
+        COMMIT TRANSACTION;
+
+        SELECT i.BookID,
+               CASE WHEN t.BookID IS NULL THEN 1 ELSE 0 END AS Status,
+               t.Available
+        FROM @BookIDs i
+        LEFT JOIN @Toggled t ON t.BookID = i.BookID
+        ORDER BY i.BookID;
+    END;
+    """,
+    """
+    CREATE OR ALTER PROCEDURE LibraryData.BorrowBook
+        @AccountID INT,
+        @BookID INT,
+        @MaxLoans INT = 3,
+        @CredentialVersion INT = NULL
+    AS
+    BEGIN
+        SET NOCOUNT ON;
+        SET XACT_ABORT ON;
+
+        DECLARE @Status INT = 0;
+        DECLARE @Now DATETIME = GETDATE();
+        DECLARE @DueDate DATETIME = DATEADD(day, 14, @Now);
+        DECLARE @DueDay DATE = CAST(DATEADD(day, 14, @Now) AS DATE);
+        DECLARE @OpenLoans INT;
+        DECLARE @Category NVARCHAR(100);
+        DECLARE @Version BIGINT;
+
+        BEGIN TRANSACTION;
+
+        -- 1. Lock the borrower's account row for the rest of the transaction
+        --    (and refuse a session from before a reset/lockout)
+        IF NOT EXISTS (
+            SELECT 1 FROM LibraryData.Accounts WITH (UPDLOCK, ROWLOCK)
+            WHERE AccountID = @AccountID
+              AND (@CredentialVersion IS NULL OR CredentialVersion = @CredentialVersion)
+        )
+            SET @Status = 1;
+
+        -- 2. Borrow limit check (the account lock already serialises this
+        --    reader's borrows, so no range lock is held into the bump)
+        IF @Status = 0
+        BEGIN
+            SELECT @OpenLoans = COUNT(*)
+            FROM LibraryData.BorrowHistory
+            WHERE AccountID = @AccountID
+              AND Status = 'borrow'
+              AND ReturnDate IS NULL;
+
+            IF @OpenLoans >= @MaxLoans
+                SET @Status = 2;
+        END
+
+        -- 3. Refuse a book that is out or gone without bumping the version
+        IF @Status = 0
+           AND NOT EXISTS (SELECT 1 FROM LibraryData.Books WHERE BookID = @BookID AND Available = 1)
+            SET @Status = CASE
+                WHEN EXISTS (SELECT 1 FROM LibraryData.Books WHERE BookID = @BookID) THEN 3
+                ELSE 4
+            END;
+
+        -- 4. CatalogVersion, then claim the book only if it is still available
+        IF @Status = 0
+        BEGIN
+            UPDATE LibraryData.CatalogVersion SET @Version = Version = Version + 1;
+
+            UPDATE LibraryData.Books WITH (UPDLOCK, ROWLOCK)
+            SET @Category = ISNULL(Category, ''),
+                Available = 0,
+                DueDate = @DueDate,
+                ChangeVersion = @Version
+            WHERE BookID = @BookID AND Available = 1;
+
+            IF @@ROWCOUNT = 0
+                SET @Status = CASE
+                    WHEN EXISTS (SELECT 1 FROM LibraryData.Books WHERE BookID = @BookID) THEN 3
+                    ELSE 4
+                END;
+        END
+
+        -- 5. Log the loan and count it in the overdue summary
+        IF @Status = 0
+        BEGIN
+            INSERT INTO LibraryData.BorrowHistory (AccountID, BookID, BorrowDate, Status)
+            VALUES (@AccountID, @BookID, @Now, 'borrow');
+
+            EXEC LibraryData.AdjustLoanDueSummary @DueDay, @AccountID, @Category, 1;
+        END
+
+        COMMIT TRANSACTION;
+
+        SELECT @Status AS Status, CASE WHEN @Status = 0 THEN @DueDate END AS DueDate;
+    END;
+    """,
+    """
+    CREATE OR ALTER PROCEDURE LibraryData.ReturnBook
+        @AccountID INT,
+        @BookID INT,
+        @CredentialVersion INT = NULL
+    AS
+    BEGIN
+        SET NOCOUNT ON;
+        SET XACT_ABORT ON;
+
+        DECLARE @Status INT = 0;
+        DECLARE @BorrowDate DATETIME;
+        DECLARE @Category NVARCHAR(100);
+        DECLARE @Version BIGINT;
+
+        BEGIN TRANSACTION;
+
+        IF NOT EXISTS (
+            SELECT 1 FROM LibraryData.Accounts
+            WHERE AccountID = @AccountID
+              AND (@CredentialVersion IS NULL OR CredentialVersion = @CredentialVersion)
+        )
+            SET @Status = 1;
+
+        -- Nothing to return: refused without bumping the version
+        IF @Status = 0 AND NOT EXISTS (
+            SELECT 1 FROM LibraryData.BorrowHistory
+            WHERE AccountID = @AccountID
+              AND BookID = @BookID
+              AND ReturnDate IS NULL
+        )
+            SET @Status = 5;
+
+        -- CatalogVersion before the loan and book rows (lock order: see the
+        -- BookTombstones comment)
+        IF @Status = 0
+        BEGIN
+            UPDATE LibraryData.CatalogVersion SET @Version = Version = Version + 1;
+
+            UPDATE LibraryData.BorrowHistory WITH (UPDLOCK, ROWLOCK)
+            SET @BorrowDate = BorrowDate,
+                ReturnDate = GETDATE(),
+                Status = 'return'
+            WHERE AccountID = @AccountID
+              AND BookID = @BookID
+              AND ReturnDate IS NULL;
+
+            IF @@ROWCOUNT = 0
+                SET @Status = 5;
+        END
+
+        IF @Status = 0
+        BEGIN
+            UPDATE LibraryData.Books WITH (UPDLOCK, ROWLOCK)
+            SET @Category = ISNULL(Category, ''),
+                Available = 1,
+                DueDate = NULL,
+                ChangeVersion = @Version
+            WHERE BookID = @BookID;
+
+            DECLARE @DueDay DATE = CAST(DATEADD(day, 14, @BorrowDate) AS DATE);
+            EXEC LibraryData.AdjustLoanDueSummary @DueDay, @AccountID, @Category, -1;
+        END
+
+        COMMIT TRANSACTION;
+
+        SELECT @Status AS Status;
+    END;
+    """,
+    "GRANT EXECUTE ON LibraryData.AddBooks TO librarian_role;",
+    "GRANT EXECUTE ON LibraryData.ToggleBooksStatus TO librarian_role;",
+    "GRANT EXECUTE ON LibraryData.DeleteBooks TO librarian_role;",
+]
+
+SQLITE = [
+    """
+    CREATE INDEX IF NOT EXISTS LibraryData.IX_LibraryData_Books_ChangeVersion
+        ON Books (ChangeVersion)
+    """,
+]
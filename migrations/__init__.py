@@ -0,0 +1,11 @@
+# migrations/__init__.py
+# Numbered schema/index migrations for the LibraryData tables, applied in
+# order by migrate.py (`flask --app app migrate`). Each NNNN_name.py defines
+#   DESCRIPTION - one line for `flask migrate --status`
+#   SQLSERVER   - statements for the SQL Server database
+#   SQLITE      - statements for the SQLite stand-in
+# Statements must be safe to re-run (IF NOT EXISTS guards), since a
+# database built from sql/complete_sql.sql may already have the object.
+# A migration that adds a column stored procedures read or write also
+# carries those procedures (CREATE OR ALTER, as they stood at that version,
+# one per statement), so the runner alone leaves a working database.
@@ -0,0 +1,139 @@
+# pagination.py
+# Keyset (cursor) pagination for the reader catalog and the librarian
+# dashboard listings.
+#
+# Pages are positioned by the sort key of the first/last row rather than by
+# OFFSET, so fetching page 500 costs the same index seek as page 1. Plain
+# listings sort on (Title, BookID) in the database; text searches sort on
+# the trigram index's (rank, title, BookID). Tokens are opaque base64
+# strings: "a" (after) or "b" (before) + the key.
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+
+def encode_token(direction, key):
+    raw = json.dumps([direction, list(key)])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    """Return (direction, key), or None for a missing/bad token."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, key = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        return None
+    if direction not in ('a', 'b') or not isinstance(key, list) or not key:
+        return None
+    return direction, key
+
+
+def page_size(requested, default=DEFAULT_PAGE_SIZE):
+    try:
+        size = int(requested)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def keyset_page(fetch, key, key_types, token=None, per_page=DEFAULT_PAGE_SIZE,
+                items_key='books'):
+    """One page from fetch(after=, before=, limit=) plus next/prev tokens.
+
+    `key(row)` gives the sort key a token resumes from and `key_types` its
+    expected shape; a token of another shape restarts at the first page.
+    Tokens are None at either end of the listing.
+    """
+    position = decode_token(token)
+    if position and not _matches(position[1], key_types):
+        position = None
+
+    after = before = None
+    if position:
+        direction, position_key = position
+        if direction == 'a':
+            after = position_key
+        else:
+            before = position_key
+
+    # One extra row tells us whether another page exists in that direction
+    rows = fetch(after=after, before=before, limit=per_page + 1)
+    more = len(rows) > per_page
+
+    if before:
+        rows = rows[1:] if more else rows
+        has_prev, has_next = more, True
+    else:
+        rows = rows[:per_page]
+        has_prev, has_next = after is not None, more
+
+    return {
+        items_key: rows,
+        'next_token': encode_token('a', key(rows[-1])) if rows and has_next else None,
+        'prev_token': encode_token('b', key(rows[0])) if rows and has_prev else None,
+    }
+
+
+def catalog_page(repo, query='', category='All', token=None,
+                 per_page=DEFAULT_PAGE_SIZE, index=None, search_books=None, get_books=None):
+    """A catalog page; ranked through `index` when there is a text query.
+
+    `search_books` / `get_books` stand in for the repository methods of the
+    same name (e.g. to fold the page into a batched read).
+    """
+    search_books = search_books or repo.search_books
+    get_books = get_books or repo.get_books
+
+    if query and index is not None:
+        def fetch(after, before, limit):
+            hits = index.search(query, category, after=after, before=before, limit=limit)
+            rows = get_books([book_id for _, book_id in hits])
+            # Books deleted outside the app since the index was built drop out
+            return [
+                dict(rows[book_id], sort_key=sort_key)
+                for sort_key, book_id in hits if book_id in rows
+            ]
+
+        return keyset_page(fetch, lambda book: book['sort_key'], (int, str, int), token, per_page)
+
+    def fetch(after, before, limit):
+        return search_books(query, category, after=after, before=before, limit=limit)
+
+    return keyset_page(fetch, lambda book: (book['title'], book['id']), (str, int), token, per_page)
+
+
+def listing_page(fetch, id_field, value_type, tag, token=None, per_page=DEFAULT_PAGE_SIZE):
+    """A dashboard listing page sorted on an arbitrary column.
+
+    `fetch` returns rows carrying SortValue (see Repository._keyset_dicts).
+    Tokens are tagged with the ordering (`tag`, e.g. "title:desc") so a
+    token from another ordering restarts at the first page.
+    """
+    position = decode_token(token)
+    if position and position[1][:1] != [tag]:
+        token = None
+
+    def fetch_rows(after, before, limit):
+        return fetch(after=after and after[1:], before=before and before[1:], limit=limit)
+
+    page = keyset_page(
+        fetch_rows,
+        lambda row: (tag, row['SortValue'], row[id_field]),
+        (str, value_type, int),
+        token, per_page, items_key='items',
+    )
+    for row in page['items']:
+        del row['SortValue']
+    return page
+
+
+def _matches(key, key_types):
+    return len(key) == len(key_types) and all(
+        isinstance(part, kind) and not isinstance(part, bool)
+        for part, kind in zip(key, key_types)
+    )
@@ -0,0 +1,205 @@
+# provisioning.py
+# Bulk reader provisioning (semester-start account creation).
+#
+# Accounts come from a CSV or JSON Lines file with username and password
+# fields - uploaded to /librarian/provision_readers or passed to the
+# `flask provision-readers` command. Rows are handled in batches of
+# PROVISION_BATCH_SIZE:
+#   1. usernames that already exist (or repeat within the file) are skipped
+#      and reported, before any hashing is spent on them
+#   2. the remaining passwords are hashed across the hashing process pool
+#   3. the batch is inserted in one transaction through
+#      LibraryData.CreateReaderAccounts, which skips rows that would
+#      violate UQ_Accounts_Username instead of aborting the batch
+# Progress and throughput are reported after every batch.
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from bulk_import import MAX_REPORTED_ERRORS, detect_format, iter_records
+
+# LibraryData.Accounts.Username width
+USERNAME_LIMIT = 50
+
+
+class ProvisionReport:
+    def __init__(self, source=None):
+        self.source = source
+        self.rows = 0
+        self.created = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.batches = 0
+        self.errors = []   # [(line, message)]
+        self.done = False
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def error(self, line, message):
+        self.failed += 1
+        self._note(line, message)
+
+    def duplicate(self, line, username):
+        self.duplicates += 1
+        self._note(line, f"duplicate username {username!r}")
+
+    def tick(self):
+        self.elapsed = time.perf_counter() - self.started
+
+    @property
+    def rate(self):
+        return self.created / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        return (f"{self.rows} rows: {self.created} created, {self.duplicates} duplicates, "
+                f"{self.failed} failed in {self.elapsed:.1f}s ({self.rate:.1f} accounts/s)")
+
+    def as_dict(self):
+        return {
+            'source': self.source,
+            'done': self.done,
+            'rows': self.rows,
+            'created': self.created,
+            'duplicates': self.duplicates,
+            'failed': self.failed,
+            'batches': self.batches,
+            'seconds': round(self.elapsed, 3),
+            'accounts_per_second': round(self.rate, 2),
+            'errors': [{'line': line, 'error': msg} for line, msg in self.errors],
+            'errors_truncated': self.duplicates + self.failed > len(self.errors),
+        }
+
+    def _note(self, line, message):
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+
+def validate_account(record):
+    """(username, password) from a raw record, or raise ValueError."""
+    fields = {str(k).strip().lower(): v for k, v in record.items() if k is not None}
+    username = str(fields.get('username') or '').strip()
+    password = fields.get('password')
+    password = '' if password is None else str(password)
+
+    if not username:
+        raise ValueError("missing username")
+    if len(username) > USERNAME_LIMIT:
+        raise ValueError(f"username longer than {USERNAME_LIMIT} characters")
+    if not password.strip():
+        raise ValueError("missing password")
+    return username, password
+
+
+# =========================
+# PROVISIONING
+# =========================
+def provision_readers(repo, hasher, stream, fmt='csv', batch_size=500,
+                      report=None, progress=None):
+    report = report or ProvisionReport()
+    seen = set()
+    batch = []
+
+    for line_no, record, error in iter_records(stream, fmt):
+        report.rows += 1
+        if error is None:
+            try:
+                username, password = validate_account(record)
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            report.error(line_no, error)
+            continue
+
+        key = username.casefold()
+        if key in seen:
+            report.duplicate(line_no, username)
+            continue
+        seen.add(key)
+        batch.append((line_no, username, password))
+
+        if len(batch) >= batch_size:
+            _provision_batch(repo, hasher, batch, report, progress)
+            batch = []
+
+    if batch:
+        _provision_batch(repo, hasher, batch, report, progress)
+
+    report.tick()
+    report.done = True
+    return report
+
+
+def _provision_batch(repo, hasher, batch, report, progress):
+    report.batches += 1
+
+    # Skip existing usernames before spending bcrypt time on them
+    existing = {name.casefold() for name in repo.existing_usernames(u for _, u, _ in batch)}
+    todo = []
+    for line_no, username, password in batch:
+        if username.casefold() in existing:
+            report.duplicate(line_no, username)
+        else:
+            todo.append((line_no, username, password))
+
+    if todo:
+        hashes = hasher.hash_many([password for _, _, password in todo])
+        try:
+            created = set(repo.create_reader_accounts(
+                [(username, hashed) for (_, username, _), hashed in zip(todo, hashes)]
+            ))
+            repo.commit()
+        except Exception as e:
+            repo.rollback()
+            for line_no, _, _ in todo:
+                report.error(line_no, str(e))
+            created = None
+
+        if created is not None:
+            for line_no, username, _ in todo:
+                if username in created:
+                    report.created += 1
+                else:
+                    # Lost a race with another insert of the same name
+                    report.duplicate(line_no, username)
+
+    report.tick()
+    if progress:
+        progress(report)
+
+
+# =========================
+# CLI
+# =========================
+@click.command('provision-readers')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default=None,
+              help='Defaults to the file extension.')
+@click.option('--batch-size', type=int, default=None,
+              help='Accounts per transaction (default: PROVISION_BATCH_SIZE).')
+@with_appcontext
+def provision_readers_command(path, fmt, batch_size):
+    """Create reader accounts from a CSV/JSONL file of username,password."""
+    from db import get_repo, release_db_connection
+    from hashing import get_hasher
+
+    batch_size = batch_size or current_app.config.get('PROVISION_BATCH_SIZE', 500)
+    hasher = get_hasher()
+    click.echo(f"Hashing with {hasher.workers} worker(s) at cost {hasher.rounds}", err=True)
+
+    def progress(report):
+        click.echo(report.summary(), err=True)
+
+    try:
+        with open(path, 'rb') as stream:
+            report = provision_readers(
+                get_repo(), hasher, stream, detect_format(path, fmt),
+                batch_size=batch_size, progress=progress,
+            )
+    finally:
+        release_db_connection()
+
+    for line, message in report.errors[:20]:
+        click.echo(f"line {line}: {message}", err=True)
+    click.echo(report.summary())
@@ -1,7 +1,8 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from transaction import transactions_bp
-import pyodbc
-import bcrypt
+from db import get_repo
+from hashing import HashingBusy, get_hasher, hash_password
+from login_throttle import get_login_throttle
 from datetime import datetime, timedelta
 
 # =========================
@@ -13,30 +14,6 @@ PASSWORD_EXPIRY_DAYS = 180  # 6 months
 
 reader_bp = Blueprint('reader', __name__)
 
-# =========================
-# DATABASE CONNECTION
-# =========================
-def get_db_connection():
-    return pyodbc.connect(
-        "DRIVER={ODBC Driver 18 for SQL Server};"
-        "SERVER=localhost;"
-        "DATABASE=MMU_Library;"
-        "Trusted_Connection=yes;"
-        "Encrypt=no;"
-    )
-
-# =========================
-# PASSWORD HASHING
-# =========================
-def hash_pwd(password: str, rounds=12) -> str:
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds)).decode()
-
-def check_pwd(password: str, hashed: str) -> bool:
-    try:
-        return bcrypt.checkpw(password.encode(), hashed.encode())
-    except ValueError:
-        return False
-
 # =========================
 # HOME
 # =========================
@@ -53,95 +30,98 @@ def login():
     password = request.form.get('password')
     selected_role = request.form.get('role')
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    # =========================
+    # PRE-AUTH THROTTLE (before any DB or bcrypt work)
+    # =========================
+    throttle = get_login_throttle()
+    wait = throttle.check(request.remote_addr, username)
+    if wait:
+        flash(f"Too many login attempts. Try again in {int(wait) + 1} second(s).", "danger")
+        response = redirect(url_for('reader.home'))
+        response.headers['Retry-After'] = str(int(wait) + 1)
+        return response
 
-    cursor.execute("""
-        SELECT Password, Role, FailedAttempts, LockoutUntil, CreatedDate
-        FROM LibraryData.Accounts
-        WHERE Username = ?
-    """, (username,))
-    user = cursor.fetchone()
+    repo = get_repo()
+    user = repo.get_login(username)
 
     if not user:
-        conn.close()
+        throttle.failed(username)
         flash("Invalid username or password.", "danger")
         return redirect(url_for('reader.home'))
 
-    db_password, db_role, failed, lockout_until, pwd_created = user
+    db_password, db_role, _, lockout_until, pwd_created = user
 
     # =========================
-    # LOCKOUT CHECK & AUTO-RESET
+    # LOCKOUT CHECK (an expired lock is cleared by the attempt's write)
     # =========================
-    if lockout_until:
-        if lockout_until <= datetime.now():
-            # 🔓 Lock expired → reset counters
-            cursor.execute("""
-                UPDATE LibraryData.Accounts
-                SET FailedAttempts = 0,
-                    LockoutUntil = NULL
-                WHERE Username = ?
-            """, (username,))
-            conn.commit()
-            failed = 0
-        else:
-            remaining = int((lockout_until - datetime.now()).total_seconds() / 60) + 1
-            conn.close()
-            flash(f"Account locked. Try again in {remaining} minute(s).", "danger")
-            return redirect(url_for('reader.home'))
+    if lockout_until and lockout_until > datetime.now():
+        throttle.lock(username, lockout_until.timestamp())
+        remaining = int((lockout_until - datetime.now()).total_seconds() / 60) + 1
+        flash(f"Account locked. Try again in {remaining} minute(s).", "danger")
+        return redirect(url_for('reader.home'))
 
     # =========================
-    # INVALID PASSWORD OR ROLE
+    # PASSWORD & ROLE CHECK
     # =========================
-    if not check_pwd(password, db_password) or db_role != selected_role:
-        failed += 1
-
-        if failed >= MAX_ATTEMPTS:
-            if db_role == 'Librarian':
-                # 🔒 Permanent lock until password reset
-                cursor.execute("""
-                    UPDATE LibraryData.Accounts
-                    SET FailedAttempts = ?, LockoutUntil = '9999-12-31'
-                    WHERE Username = ?
-                """, (failed, username))
-            else:
-                # ⏱ Temporary lock for Reader
-                cursor.execute("""
-                    UPDATE LibraryData.Accounts
-                    SET FailedAttempts = ?,
-                        LockoutUntil = DATEADD(MINUTE, ?, GETDATE())
-                    WHERE Username = ?
-                """, (failed, LOCKOUT_MINUTES, username))
-
-            conn.commit()
-            conn.close()
-            flash("Account locked due to multiple failed attempts.", "danger")
-            return redirect(url_for('reader.home'))
+    hasher = get_hasher()
+    try:
+        valid = hasher.verify(password, db_password)
+        success = valid and db_role == selected_role
+
+        # 🔁 Upgrade the stored hash when BCRYPT_ROUNDS has changed
+        new_hash = None
+        if success and hasher.needs_rehash(db_password):
+            try:
+                new_hash = hasher.hash(password)
+            except HashingBusy:
+                pass  # try again on the next login
+    except HashingBusy:
+        # ⏳ Shed load without counting it as a failed attempt
+        flash("Server is busy, please try again shortly.", "danger")
+        return redirect(url_for('reader.home'))
+
+    # =========================
+    # ONE ATOMIC WRITE: reset, increment or lock
+    # =========================
+    result = repo.record_login(
+        username, success, MAX_ATTEMPTS, LOCKOUT_MINUTES, db_password, new_hash
+    )
+    repo.commit()
+
+    if result is None:
+        flash("Invalid username or password.", "danger")
+        return redirect(url_for('reader.home'))
 
-        cursor.execute("""
-            UPDATE LibraryData.Accounts
-            SET FailedAttempts = ?
-            WHERE Username = ?
-        """, (failed, username))
-        conn.commit()
-        conn.close()
+    failed, lockout_until, account_id, credential_version = result
 
-        flash(f"Invalid login. Attempt {failed}/{MAX_ATTEMPTS}.", "danger")
+    if not success:
+        throttle.failed(username)
+        if lockout_until:
+            flash("Account locked due to multiple failed attempts.", "danger")
+        else:
+            flash(f"Invalid login. Attempt {failed}/{MAX_ATTEMPTS}.", "danger")
+        return redirect(url_for('reader.home'))
+
+    if lockout_until:
+        # 🔒 A concurrent attempt locked the account first
+        throttle.lock(username, lockout_until.timestamp())
+        flash("Account locked due to multiple failed attempts.", "danger")
         return redirect(url_for('reader.home'))
 
     # =========================
     # SUCCESSFUL LOGIN
     # =========================
-    cursor.execute("""
-        UPDATE LibraryData.Accounts
-        SET FailedAttempts = 0, LockoutUntil = NULL
-        WHERE Username = ?
-    """, (username,))
-    conn.commit()
-    conn.close()
+    throttle.succeeded(username)
 
     session['username'] = username
     session['role'] = db_role
+    # 🪪 Identity record for the transaction routes (the session cookie is
+    # signed with app.secret_key); refused once CredentialVersion moves
+    session['identity'] = {
+        'account_id': account_id,
+        'role': db_role,
+        'credential_version': credential_version,
+    }
 
     # =========================
     # PASSWORD EXPIRY (LIBRARIAN)
@@ -165,20 +145,20 @@ def change_password():
 
     if request.method == 'POST':
         new_password = request.form.get('new_password')
-        hashed = hash_pwd(new_password)
-
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            UPDATE LibraryData.Accounts
-            SET Password = ?,
-                CreatedDate = GETDATE(),
-                FailedAttempts = 0,
-                LockoutUntil = NULL
-            WHERE Username = ?
-        """, (hashed, session['username']))
-        conn.commit()
-        conn.close()
+        try:
+            hashed = hash_password(new_password)
+        except HashingBusy:
+            flash("Server is busy, please try again shortly.", "danger")
+            return redirect(url_for('reader.change_password'))
+
+        repo = get_repo()
+        credential_version = repo.change_password(session['username'], hashed)
+        repo.commit()
+
+        # 🪪 Other sessions of this account are now stale; this one carries on
+        identity = session.get('identity')
+        if identity and credential_version is not None:
+            session['identity'] = dict(identity, credential_version=credential_version)
 
         session.pop('force_pwd_change', None)
         flash("Password updated successfully.", "success")
@@ -0,0 +1,212 @@
+# search_index.py
+# In-process trigram index over the catalog's Title / Author / Category.
+#
+# `Title LIKE '%q%'` cannot use an index, so every search used to scan
+# LibraryData.Books. The index keeps trigram -> BookID postings in memory;
+# a search intersects the postings for the query's trigrams, verifies the
+# (few) candidates and ranks them, so its cost follows the number of matches
+# rather than the catalog size. Only searchable text lives here - the page's
+# rows (and their Available flag) are still read from the database by ID.
+#
+# The index is built from the database on first use, kept up to date by the
+# librarian routes (index_book / unindex_book) and rebuilt after
+# CATALOG_INDEX_TTL seconds to pick up changes made outside this process.
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+from flask import current_app
+
+# Rank buckets, best first
+RANK_TITLE_EXACT = 0
+RANK_TITLE_PREFIX = 1
+RANK_TITLE_WORD = 2
+RANK_TITLE_SUBSTRING = 3
+RANK_AUTHOR_PREFIX = 4
+RANK_AUTHOR_SUBSTRING = 5
+
+
+def normalize(text):
+    return ' '.join((text or '').casefold().split())
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class CatalogIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._docs = {}                      # BookID -> (title, author, category)
+        self._grams = defaultdict(set)       # trigram -> {BookID}
+        self._categories = defaultdict(set)  # category -> {BookID}
+        self.built_at = None
+
+    def __len__(self):
+        return len(self._docs)
+
+    # =========================
+    # MAINTENANCE
+    # =========================
+    def build(self, books):
+        """Replace the contents with rows carrying BookID/Title/Author/Category."""
+        with self._lock:
+            self._docs.clear()
+            self._grams.clear()
+            self._categories.clear()
+            for book in books:
+                self._add(book['BookID'], book['Title'], book['Author'], book['Category'])
+            self.built_at = time.monotonic()
+
+    def add(self, book_id, title, author, category):
+        with self._lock:
+            self._remove(book_id)
+            self._add(book_id, title, author, category)
+
+    def remove(self, book_id):
+        with self._lock:
+            self._remove(book_id)
+
+    def _add(self, book_id, title, author, category):
+        title, author = normalize(title), normalize(author)
+        self._docs[book_id] = (title, author, category)
+        for gram in trigrams(title) | trigrams(author):
+            self._grams[gram].add(book_id)
+        self._categories[category].add(book_id)
+
+    def _remove(self, book_id):
+        doc = self._docs.pop(book_id, None)
+        if doc is None:
+            return
+        title, author, category = doc
+        for gram in trigrams(title) | trigrams(author):
+            postings = self._grams.get(gram)
+            if postings is not None:
+                postings.discard(book_id)
+                if not postings:
+                    del self._grams[gram]
+        members = self._categories.get(category)
+        if members is not None:
+            members.discard(book_id)
+            if not members:
+                del self._categories[category]
+
+    # =========================
+    # QUERYING
+    # =========================
+    def search(self, query, category='All', after=None, before=None, limit=None):
+        """Ranked matches as [((rank, title, BookID), BookID), ...].
+
+        `after` / `before` are sort keys from a previous page (keyset
+        pagination); results are always in ascending key order.
+        """
+        q = normalize(query)
+
+        with self._lock:
+            candidates = self._candidates(q)
+            if category and category != 'All':
+                candidates = candidates & self._categories.get(category, set())
+
+            keys = []
+            for book_id in candidates:
+                title, author, _ = self._docs[book_id]
+                rank = self._rank(q, title, author)
+                if rank is not None:
+                    keys.append((rank, title, book_id))
+
+        keys.sort()
+
+        if after:
+            start = bisect_right(keys, tuple(after))
+            keys = keys[start:start + limit] if limit else keys[start:]
+        elif before:
+            end = bisect_left(keys, tuple(before))
+            keys = keys[max(0, end - limit):end] if limit else keys[:end]
+        elif limit:
+            keys = keys[:limit]
+
+        return [(key, key[2]) for key in keys]
+
+    def _candidates(self, q):
+        if len(q) < 3:
+            # Too short for trigrams; the verify step filters everything
+            return set(self._docs)
+
+        postings = []
+        for gram in trigrams(q):
+            ids = self._grams.get(gram)
+            if not ids:
+                return set()
+            postings.append(ids)
+
+        postings.sort(key=len)
+        result = set(postings[0])
+        for ids in postings[1:]:
+            result &= ids
+            if not result:
+                break
+        return result
+
+    @staticmethod
+    def _rank(q, title, author):
+        if not q:
+            return RANK_TITLE_EXACT
+        if title == q:
+            return RANK_TITLE_EXACT
+        if title.startswith(q):
+            return RANK_TITLE_PREFIX
+        if f' {q}' in title:
+            return RANK_TITLE_WORD
+        if q in title:
+            return RANK_TITLE_SUBSTRING
+        if author.startswith(q) or f' {q}' in author:
+            return RANK_AUTHOR_PREFIX
+        if q in author:
+            return RANK_AUTHOR_SUBSTRING
+        return None
+
+
+# =========================
+# FLASK INTEGRATION
+# =========================
+_index_lock = threading.Lock()
+
+
+def get_catalog_index(repo):
+    """The app's index, (re)built from `repo` when missing or older than the TTL."""
+    app = current_app._get_current_object()
+    ttl = app.config.get('CATALOG_INDEX_TTL')
+    index = app.extensions.get('catalog_index')
+
+    if index is None or (ttl and time.monotonic() - index.built_at > ttl):
+        with _index_lock:
+            index = app.extensions.get('catalog_index')
+            if index is None or (ttl and time.monotonic() - index.built_at > ttl):
+                fresh = CatalogIndex()
+                fresh.build(repo.list_inventory())
+                app.extensions['catalog_index'] = index = fresh
+    return index
+
+
+def index_book(book_id, title, author, category):
+    index = current_app.extensions.get('catalog_index')
+    if index is not None:
+        index.add(book_id, title, author, category)
+
+
+def unindex_book(book_id):
+    index = current_app.extensions.get('catalog_index')
+    if index is not None:
+        index.remove(book_id)
+
+
+def rebuild_catalog_index(repo):
+    """Rebuild an already-built index in one pass (after bulk changes)."""
+    app = current_app._get_current_object()
+    if app.extensions.get('catalog_index') is None:
+        return
+    fresh = CatalogIndex()
+    fresh.build(repo.list_inventory())
+    with _index_lock:
+        app.extensions['catalog_index'] = fresh
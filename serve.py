@@ -0,0 +1,50 @@
+# serve.py
+# Serve the app on gevent's WSGI server. Use this rather than `python app.py`
+# wherever reader pages keep live catalog updates open
+# (/api/catalog/events).
+#
+# `python app.py` is Flask's threaded dev server: each open reader page
+# holds a server thread for its event stream, so LIVE_UPDATES_MAX_SUBSCRIBERS
+# resolves to 32 there. Here gevent patches threading and sockets before the
+# app is imported, so an idle stream is a greenlet parked on CatalogFeed's
+# Condition (a few KB) and the cap resolves to 2000. pyodbc, sqlite3 and
+# the pool's connects cannot yield, so their calls run on gevent's native
+# thread pool, sized to DB_POOL_SIZE, and a slow query leaves the other
+# greenlets running.
+#
+#   pip install gevent
+#   python serve.py --host 0.0.0.0 --port 5000
+#
+# gevent.pywsgi runs on Windows as well as Linux. Behind gunicorn, the
+# equivalent is `gunicorn -k gevent app:app`. That gets the greenlet cap,
+# but leaves database calls on the event loop.
+from gevent import monkey
+
+monkey.patch_all()
+
+import argparse  # noqa: E402
+
+from gevent import get_hub  # noqa: E402
+from gevent.pywsgi import WSGIServer  # noqa: E402
+
+import instrumentation  # noqa: E402
+from app import app  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve the library app on gevent.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    threadpool = get_hub().threadpool
+    threadpool.maxsize = app.config['DB_POOL_SIZE']
+    instrumentation.run_blocking_calls_with(threadpool.apply)
+
+    server = WSGIServer((args.host, args.port), app)
+    print(f'Serving on http://{args.host}:{args.port} (gevent)')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
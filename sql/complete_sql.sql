@@ -16,7 +16,10 @@ BEGIN
         [Role] [nvarchar](50) NOT NULL DEFAULT ('Reader'),
         [CreatedDate] [datetime] NOT NULL DEFAULT (getdate()),
         [FailedAttempts] [int] NOT NULL DEFAULT (0),
-        [LockoutUntil] [datetime] NULL
+        [LockoutUntil] [datetime] NULL,
+        -- Bumped by password resets and lockouts; sessions carry the value
+        -- they logged in with and are refused once it moves
+        [CredentialVersion] [int] NOT NULL DEFAULT (0)
     ) ON [PRIMARY];
 END
 GO
@@ -30,7 +33,9 @@ BEGIN
         [Author] [nvarchar](255) NOT NULL,
         [Category] [nvarchar](100) NULL,
         [Available] [int] NOT NULL DEFAULT (1),
-        [DueDate] [datetime] NULL
+        [DueDate] [datetime] NULL,
+        -- CatalogVersion of the last change to the row (catalog delta sync)
+        [ChangeVersion] [bigint] NOT NULL DEFAULT (0)
     ) ON [PRIMARY];
 END
 GO
@@ -124,6 +129,48 @@ GO
 USE MMU_Library;
 GO
 
+-- Catalog version counter: bumped by every procedure that changes the
+-- catalog so the app's metadata cache can tell when to reload
+IF OBJECT_ID(N'LibraryData.CatalogVersion', N'U') IS NULL
+BEGIN
+    CREATE TABLE LibraryData.CatalogVersion (
+        ID INT NOT NULL CONSTRAINT PK_CatalogVersion PRIMARY KEY
+            CONSTRAINT CK_CatalogVersion_Single CHECK (ID = 1),
+        Version BIGINT NOT NULL DEFAULT (0)
+    );
+    INSERT INTO LibraryData.CatalogVersion (ID, Version) VALUES (1, 0);
+END
+GO
+
+-- Catalog delta sync (/api/catalog?since=N). Every procedure that changes a
+-- book bumps CatalogVersion before it locks any Books row and stamps the
+-- row's ChangeVersion with the new value; deleted books leave a tombstone
+-- here. The bump holds the CatalogVersion row lock until commit, so
+-- versions are handed out in commit order and a client that has seen
+-- version N has seen every change up to N.
+--
+-- Locks held to commit are taken in one order everywhere: Accounts,
+-- CatalogVersion, BorrowHistory, Books, LoanDueSummary. CatalogVersion is
+-- a single row, so catalog writes - borrows and returns included - run one
+-- at a time from the bump to the commit. That stretch is a few single-row
+-- writes plus the commit's log flush, which caps catalog writes at about
+-- one per log flush (hundreds to low thousands a second). Refusals (stale
+-- session, borrow limit, book out, nothing to return) are decided before
+-- the bump, so only writes that go ahead wait for it.
+IF OBJECT_ID(N'LibraryData.BookTombstones', N'U') IS NULL
+    CREATE TABLE LibraryData.BookTombstones (
+        BookID         INT    NOT NULL,
+        DeletedVersion BIGINT NOT NULL,
+        CONSTRAINT PK_BookTombstones PRIMARY KEY (DeletedVersion, BookID)
+    );
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_LibraryData_Books_ChangeVersion')
+    CREATE INDEX IX_LibraryData_Books_ChangeVersion
+    ON LibraryData.Books(ChangeVersion)
+    INCLUDE (Title, Author, Category, Available);
+GO
+
 -- Update your AddBook procedure to the new schema path
 CREATE OR ALTER PROCEDURE LibraryData.AddBook
     @Title NVARCHAR(255),
@@ -131,14 +178,34 @@ CREATE OR ALTER PROCEDURE LibraryData.AddBook
     @Category NVARCHAR(100)
 AS
 BEGIN
-    INSERT INTO LibraryData.Books (Title, Author, Category, Available)
-    VALUES (@Title, @Author, @Category, 1);
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    DECLARE @Version BIGINT;
+    DECLARE @BookID INT;
+
+    BEGIN TRANSACTION;
+
+    UPDATE LibraryData.CatalogVersion SET @Version = Version = Version + 1;
+
+    INSERT INTO LibraryData.Books (Title, Author, Category, Available, ChangeVersion)
+    VALUES (@Title, @Author, @Category, 1, @Version);
+
+    SET @BookID = CAST(SCOPE_IDENTITY() AS INT);
+
+    COMMIT TRANSACTION;
+
+    -- New BookID for the app's in-process search index
+    SELECT @BookID AS BookID;
 END;
 GO
 
 USE MMU_Library;
 GO
 -- EditBook
+-- A category change on a book that is out on loan moves that loan's count
+-- in LibraryData.LoanDueSummary to the new category. Returns one row
+-- (Updated).
 CREATE OR ALTER PROCEDURE LibraryData.EditBook
     @BookID INT,
     @Title NVARCHAR(255),
@@ -146,11 +213,50 @@ CREATE OR ALTER PROCEDURE LibraryData.EditBook
     @Category NVARCHAR(100)
 AS
 BEGIN
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    DECLARE @OldCategory NVARCHAR(100);
+    DECLARE @AccountID INT;
+    DECLARE @DueDay DATE;
+    DECLARE @Version BIGINT;
+    DECLARE @Updated INT;
+
+    BEGIN TRANSACTION;
+
+    UPDATE LibraryData.CatalogVersion SET @Version = Version = Version + 1;
+
+    SELECT @OldCategory = ISNULL(Category, '')
+    FROM LibraryData.Books WITH (UPDLOCK, ROWLOCK)
+    WHERE BookID = @BookID;
+
     UPDATE LibraryData.Books
     SET Title = @Title,
         Author = @Author,
-        Category = @Category
+        Category = @Category,
+        ChangeVersion = @Version
     WHERE BookID = @BookID;
+
+    SET @Updated = @@ROWCOUNT;
+
+    IF @OldCategory <> ISNULL(@Category, '')
+    BEGIN
+        SELECT @AccountID = AccountID,
+               @DueDay = CAST(DATEADD(day, 14, BorrowDate) AS DATE)
+        FROM LibraryData.BorrowHistory
+        WHERE BookID = @BookID AND ReturnDate IS NULL;
+
+        IF @AccountID IS NOT NULL
+        BEGIN
+            EXEC LibraryData.AdjustLoanDueSummary @DueDay, @AccountID, @OldCategory, -1;
+            EXEC LibraryData.AdjustLoanDueSummary @DueDay, @AccountID, @Category, 1;
+        END
+    END
+
+    COMMIT TRANSACTION;
+
+    -- 0 when the book does not exist (the app's search index is left alone)
+    SELECT @Updated AS Updated;
 END;
 GO
 
@@ -162,9 +268,20 @@ CREATE OR ALTER PROCEDURE LibraryData.DeleteBook
 AS
 BEGIN
     SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    DECLARE @Version BIGINT;
+
+    BEGIN TRANSACTION;
+
+    UPDATE LibraryData.CatalogVersion SET @Version = Version = Version + 1;
 
     DELETE FROM LibraryData.Books
+    OUTPUT deleted.BookID, @Version
+    INTO LibraryData.BookTombstones (BookID, DeletedVersion)
     WHERE BookID = @BookID;
+
+    COMMIT TRANSACTION;
 END;
 GO
 
@@ -176,13 +293,24 @@ CREATE OR ALTER PROCEDURE LibraryData.ToggleBookStatus
 AS
 BEGIN
     SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    DECLARE @Version BIGINT;
+
+    BEGIN TRANSACTION;
+
+    UPDATE LibraryData.CatalogVersion SET @Version = Version = Version + 1;
+
     -- Updated to use the LibraryData schema
     UPDATE LibraryData.Books
     SET Available = CASE 
         WHEN Available = 1 THEN 0 
         ELSE 1 
-    END
+    END,
+        ChangeVersion = @Version
     WHERE BookID = @BookID;
+
+    COMMIT TRANSACTION;
 END;
 GO
 
@@ -213,7 +341,8 @@ BEGIN
     SET Password = @HashedPassword,
         FailedAttempts = 0,
         LockoutUntil = NULL,
-        CreatedDate = GETDATE()
+        CreatedDate = GETDATE(),
+        CredentialVersion = CredentialVersion + 1
     WHERE Username = @Username;
 END;
 GO
@@ -240,69 +369,290 @@ GO
 --Joyce's part
 USE MMU_Library;
 GO
+-- Open-loan summary for the overdue report: open loans counted per due day
+-- (BorrowDate + 14 days), reader and category. BorrowBook adds to it,
+-- ReturnBook subtracts, and EditBook moves a loan when the category
+-- changes, so the dashboard reads the overdue totals from the rows with
+-- DueDay < today instead of scanning BorrowHistory.
+IF OBJECT_ID(N'LibraryData.LoanDueSummary', N'U') IS NULL
+BEGIN
+    CREATE TABLE LibraryData.LoanDueSummary (
+        DueDay    DATE          NOT NULL,
+        AccountID INT           NOT NULL,
+        Category  NVARCHAR(100) NOT NULL,
+        OpenLoans INT           NOT NULL,
+        CONSTRAINT PK_LoanDueSummary PRIMARY KEY (DueDay, AccountID, Category)
+    );
+
+    -- Start from the loans that are open right now
+    INSERT INTO LibraryData.LoanDueSummary (DueDay, AccountID, Category, OpenLoans)
+    SELECT CAST(DATEADD(day, 14, bh.BorrowDate) AS DATE), bh.AccountID,
+           ISNULL(b.Category, ''), COUNT(*)
+    FROM LibraryData.BorrowHistory bh
+    JOIN LibraryData.Books b ON b.BookID = bh.BookID
+    WHERE bh.ReturnDate IS NULL
+    GROUP BY CAST(DATEADD(day, 14, bh.BorrowDate) AS DATE), bh.AccountID, ISNULL(b.Category, '');
+END
+GO
+
+-- Adds @Delta open loans to one summary row; rows that reach zero are removed
+CREATE OR ALTER PROCEDURE LibraryData.AdjustLoanDueSummary
+    @DueDay DATE,
+    @AccountID INT,
+    @Category NVARCHAR(100),
+    @Delta INT
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    SET @Category = ISNULL(@Category, '');
+
+    UPDATE LibraryData.LoanDueSummary
+    SET OpenLoans = OpenLoans + @Delta
+    WHERE DueDay = @DueDay AND AccountID = @AccountID AND Category = @Category;
+
+    IF @@ROWCOUNT = 0 AND @Delta > 0
+        INSERT INTO LibraryData.LoanDueSummary (DueDay, AccountID, Category, OpenLoans)
+        VALUES (@DueDay, @AccountID, @Category, @Delta);
+
+    DELETE FROM LibraryData.LoanDueSummary
+    WHERE DueDay = @DueDay AND AccountID = @AccountID AND Category = @Category
+      AND OpenLoans <= 0;
+END;
+GO
+
 --Borrow Book
+-- Returns one row (Status, DueDate). Status codes:
+--   0 = borrowed, 1 = account not found (or @CredentialVersion is stale),
+--   2 = borrow limit reached, 3 = book not available, 4 = book does not exist
+-- The account row is locked first so one reader's concurrent borrows are
+-- serialised (limit check), and the book is claimed with a conditional
+-- UPDATE so two readers can never both borrow the same copy. Only a borrow
+-- that passes the checks bumps CatalogVersion, right before the claim.
 CREATE OR ALTER PROCEDURE LibraryData.BorrowBook
     @AccountID INT,
-    @BookID INT
+    @BookID INT,
+    @MaxLoans INT = 3,
+    @CredentialVersion INT = NULL
 AS
 BEGIN
     SET NOCOUNT ON;
-
-    -- 1. Check if the book exists and is available in the LibraryData schema
-    IF EXISTS (
-        SELECT 1 FROM LibraryData.Books
-        WHERE BookID = @bookID AND Available = 1
+    SET XACT_ABORT ON;
+
+    DECLARE @Status INT = 0;
+    DECLARE @Now DATETIME = GETDATE();
+    DECLARE @DueDate DATETIME = DATEADD(day, 14, @Now);
+    DECLARE @DueDay DATE = CAST(DATEADD(day, 14, @Now) AS DATE);
+    DECLARE @OpenLoans INT;
+    DECLARE @Category NVARCHAR(100);
+    DECLARE @Version BIGINT;
+
+    BEGIN TRANSACTION;
+
+    -- 1. Lock the borrower's account row for the rest of the transaction
+    --    (and refuse a session from before a reset/lockout)
+    IF NOT EXISTS (
+        SELECT 1 FROM LibraryData.Accounts WITH (UPDLOCK, ROWLOCK)
+        WHERE AccountID = @AccountID
+          AND (@CredentialVersion IS NULL OR CredentialVersion = @CredentialVersion)
     )
+        SET @Status = 1;
+
+    -- 2. Borrow limit check (the account lock already serialises this
+    --    reader's borrows, so no range lock is held into the bump)
+    IF @Status = 0
     BEGIN
-        -- 2. Mark the book as borrowed and set a 14-day due date
-        UPDATE LibraryData.Books
-        SET Available = 0, 
-            DueDate = DATEADD(day, 14, GETDATE())
-        WHERE BookID = @bookID;
+        SELECT @OpenLoans = COUNT(*)
+        FROM LibraryData.BorrowHistory
+        WHERE AccountID = @AccountID
+          AND Status = 'borrow'
+          AND ReturnDate IS NULL;
+
+        IF @OpenLoans >= @MaxLoans
+            SET @Status = 2;
+    END
 
-        -- 3. Log the transaction using the new 'AccountID', 'BorrowDate', and 'Status' columns
-        INSERT INTO LibraryData.BorrowHistory (AccountID, BookID, BorrowDate, Status)
-        VALUES (@AccountID, @bookID, GETDATE(), 'borrow');
-        
-        PRINT 'Book borrowed successfully.';
+    -- 3. Refuse a book that is out or gone without bumping the version
+    IF @Status = 0
+       AND NOT EXISTS (SELECT 1 FROM LibraryData.Books WHERE BookID = @BookID AND Available = 1)
+        SET @Status = CASE
+            WHEN EXISTS (SELECT 1 FROM LibraryData.Books WHERE BookID = @BookID) THEN 3
+            ELSE 4
+        END;
+
+    -- 4. CatalogVersion, then claim the book only if it is still available
+    IF @Status = 0
+    BEGIN
+        UPDATE LibraryData.CatalogVersion SET @Version = Version = Version + 1;
+
+        UPDATE LibraryData.Books WITH (UPDLOCK, ROWLOCK)
+        SET @Category = ISNULL(Category, ''),
+            Available = 0,
+            DueDate = @DueDate,
+            ChangeVersion = @Version
+        WHERE BookID = @BookID AND Available = 1;
+
+        IF @@ROWCOUNT = 0
+            SET @Status = CASE
+                WHEN EXISTS (SELECT 1 FROM LibraryData.Books WHERE BookID = @BookID) THEN 3
+                ELSE 4
+            END;
     END
-    ELSE
+
+    -- 5. Log the loan and count it in the overdue summary
+    IF @Status = 0
     BEGIN
-        -- 4. Handle cases where the book is already out or doesn't exist
-        PRINT 'Book not available or does not exist.';
+        INSERT INTO LibraryData.BorrowHistory (AccountID, BookID, BorrowDate, Status)
+        VALUES (@AccountID, @BookID, @Now, 'borrow');
+
+        EXEC LibraryData.AdjustLoanDueSummary @DueDay, @AccountID, @Category, 1;
     END
+
+    COMMIT TRANSACTION;
+
+    SELECT @Status AS Status, CASE WHEN @Status = 0 THEN @DueDate END AS DueDate;
 END;
 GO
 
 USE MMU_Library;
 GO
 -- Return Book
+-- Returns one row (Status). Status codes:
+--   0 = returned, 1 = account not found (or @CredentialVersion is stale),
+--   5 = no open loan of this book
+-- Closes the reader's open loan and only then frees the book, so a reader
+-- cannot "return" a copy somebody else is holding.
 CREATE OR ALTER PROCEDURE LibraryData.ReturnBook
     @AccountID INT,
-    @BookID INT
+    @BookID INT,
+    @CredentialVersion INT = NULL
 AS
 BEGIN
     SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    DECLARE @Status INT = 0;
+    DECLARE @BorrowDate DATETIME;
+    DECLARE @Category NVARCHAR(100);
+    DECLARE @Version BIGINT;
+
+    BEGIN TRANSACTION;
 
-    -- Ensure the book is currently marked as borrowed
-    IF EXISTS (
-        SELECT 1 FROM LibraryData.Books
-        WHERE BookID = @bookID AND Available = 0
+    IF NOT EXISTS (
+        SELECT 1 FROM LibraryData.Accounts
+        WHERE AccountID = @AccountID
+          AND (@CredentialVersion IS NULL OR CredentialVersion = @CredentialVersion)
     )
+        SET @Status = 1;
+
+    -- Nothing to return: refused without bumping the version
+    IF @Status = 0 AND NOT EXISTS (
+        SELECT 1 FROM LibraryData.BorrowHistory
+        WHERE AccountID = @AccountID
+          AND BookID = @BookID
+          AND ReturnDate IS NULL
+    )
+        SET @Status = 5;
+
+    -- CatalogVersion before the loan and book rows (lock order: see the
+    -- BookTombstones comment)
+    IF @Status = 0
     BEGIN
-        -- Make the book available again
-        UPDATE LibraryData.Books
-        SET Available = 1, DueDate = NULL
-        WHERE BookID = @bookID;
-
-        -- Log the action using 'return' and record return date 
-        INSERT INTO LibraryData.BorrowHistory (AccountID, BookID, ReturnDate, Status)
-        VALUES (@AccountID, @bookID, GETDATE(), 'return');
+        UPDATE LibraryData.CatalogVersion SET @Version = Version = Version + 1;
+
+        UPDATE LibraryData.BorrowHistory WITH (UPDLOCK, ROWLOCK)
+        SET @BorrowDate = BorrowDate,
+            ReturnDate = GETDATE(),
+            Status = 'return'
+        WHERE AccountID = @AccountID
+          AND BookID = @BookID
+          AND ReturnDate IS NULL;
+
+        IF @@ROWCOUNT = 0
+            SET @Status = 5;
     END
-    ELSE
+
+    IF @Status = 0
     BEGIN
-        PRINT 'Book was not borrowed or does not exist';
+        UPDATE LibraryData.Books WITH (UPDLOCK, ROWLOCK)
+        SET @Category = ISNULL(Category, ''),
+            Available = 1,
+            DueDate = NULL,
+            ChangeVersion = @Version
+        WHERE BookID = @BookID;
+
+        DECLARE @DueDay DATE = CAST(DATEADD(day, 14, @BorrowDate) AS DATE);
+        EXEC LibraryData.AdjustLoanDueSummary @DueDay, @AccountID, @Category, -1;
     END
+
+    COMMIT TRANSACTION;
+
+    SELECT @Status AS Status;
+END;
+GO
+
+USE MMU_Library;
+GO
+-- Record Login Attempt
+-- Called once per login, after the application has checked the password
+-- with bcrypt, and applies the lockout rules in a single UPDATE...OUTPUT:
+--   * an expired lockout is cleared (the attempt counts from zero)
+--   * success resets FailedAttempts/LockoutUntil, and stores @NewHash when
+--     the bcrypt cost was upgraded and the password is still @OldHash
+--   * failure increments FailedAttempts; reaching @MaxAttempts locks the
+--     account for @LockoutMinutes (readers) or until a password reset
+--     (librarians)
+--   * while a lockout is active nothing changes, so a success racing a
+--     concurrent lockout is refused
+--   * a new lockout bumps CredentialVersion, ending existing sessions
+-- Returns one row (FailedAttempts, LockoutUntil, AccountID,
+-- CredentialVersion) as left by the update, or no row when the account
+-- does not exist.
+CREATE OR ALTER PROCEDURE LibraryData.RecordLoginAttempt
+    @Username NVARCHAR(50),
+    @Success BIT,
+    @MaxAttempts INT,
+    @LockoutMinutes INT,
+    @OldHash NVARCHAR(255) = NULL,
+    @NewHash NVARCHAR(255) = NULL
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    DECLARE @Now DATETIME = GETDATE();
+
+    WITH Attempt AS (
+        SELECT AccountID, FailedAttempts, LockoutUntil, Password, Role, CredentialVersion,
+               CASE WHEN LockoutUntil > @Now THEN 1 ELSE 0 END AS Locked,
+               CASE WHEN LockoutUntil <= @Now THEN 0 ELSE FailedAttempts END AS Failed
+        FROM LibraryData.Accounts WITH (UPDLOCK, ROWLOCK)
+        WHERE Username = @Username
+    )
+    UPDATE Attempt
+    SET FailedAttempts = CASE
+            WHEN Locked = 1 THEN FailedAttempts
+            WHEN @Success = 1 THEN 0
+            ELSE Failed + 1
+        END,
+        LockoutUntil = CASE
+            WHEN Locked = 1 THEN LockoutUntil
+            WHEN @Success = 1 THEN NULL
+            WHEN Failed + 1 < @MaxAttempts THEN NULL
+            WHEN Role = 'Librarian' THEN CAST('9999-12-31' AS DATETIME)
+            ELSE DATEADD(MINUTE, @LockoutMinutes, @Now)
+        END,
+        Password = CASE
+            WHEN Locked = 0 AND @Success = 1 AND @NewHash IS NOT NULL
+                 AND Password = @OldHash THEN @NewHash
+            ELSE Password
+        END,
+        CredentialVersion = CASE
+            WHEN Locked = 0 AND @Success = 0 AND Failed + 1 >= @MaxAttempts
+                THEN CredentialVersion + 1
+            ELSE CredentialVersion
+        END
+    OUTPUT inserted.FailedAttempts, inserted.LockoutUntil,
+           inserted.AccountID, inserted.CredentialVersion;
 END;
 GO
 
@@ -332,6 +682,8 @@ GO
 -- These procedures now live in the LibraryData schema
 GRANT EXECUTE ON LibraryData.BorrowBook TO transaction_role;
 GRANT EXECUTE ON LibraryData.ReturnBook TO transaction_role;
+-- The shared /login route (readers and librarians) applies each attempt here
+GRANT EXECUTE ON LibraryData.RecordLoginAttempt TO transaction_role;
 GO
 
 -- 2. Apply Deny Restrictions
@@ -345,6 +697,7 @@ USE MMU_Library;
 GO
 -- 1. Grant visibility to the entire book catalog
 GRANT SELECT ON LibraryData.Books TO reader_role;
+GRANT SELECT ON LibraryData.BookTombstones TO reader_role;
 -- 2. Grant visibility to their own history
 GRANT SELECT ON LibraryData.BorrowHistory TO reader_role;
 -- 3. Block all editing to prevent tampering
@@ -544,6 +897,8 @@ WITH (STATE = ON);
 GO
 
 --USING INDEX METHOD
+-- Later indexes are versioned migrations under migrations/, applied and
+-- recorded in LibraryData.SchemaMigrations by: flask --app app migrate
 USE MMU_Library;
 GO
 
@@ -571,3 +926,258 @@ GO
 
 
 
+
+-- Keyset pagination of the reader catalog (ORDER BY Title, BookID)
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_LibraryData_Books_Title')
+    CREATE INDEX IX_LibraryData_Books_Title
+    ON LibraryData.Books(Title, BookID)
+    INCLUDE (Author, Category, Available);
+GO
+
+-- Bulk catalog import: one table-valued parameter per batch, so a batch of
+-- rows is a single round trip and a single CatalogVersion bump
+USE MMU_Library;
+GO
+IF TYPE_ID(N'LibraryData.BookImportRows') IS NULL
+    CREATE TYPE LibraryData.BookImportRows AS TABLE (
+        Title NVARCHAR(255) NOT NULL,
+        Author NVARCHAR(255) NOT NULL,
+        Category NVARCHAR(100) NOT NULL
+    );
+GO
+
+-- Returns one row (Inserted)
+CREATE OR ALTER PROCEDURE LibraryData.AddBooks
+    @Books LibraryData.BookImportRows READONLY
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    DECLARE @Version BIGINT;
+    DECLARE @Inserted INT = 0;
+
+    IF EXISTS (SELECT 1 FROM @Books)
+    BEGIN
+        BEGIN TRANSACTION;
+
+        UPDATE LibraryData.CatalogVersion SET @Version = Version = Version + 1;
+
+        INSERT INTO LibraryData.Books (Title, Author, Category, Available, ChangeVersion)
+        SELECT Title, Author, Category, 1, @Version
+        FROM @Books;
+
+        SET @Inserted = @@ROWCOUNT;
+
+        COMMIT TRANSACTION;
+    END
+
+    SELECT @Inserted AS Inserted;
+END;
+GO
+
+GRANT EXECUTE ON LibraryData.AddBooks TO librarian_role;
+GRANT EXECUTE ON TYPE::LibraryData.BookImportRows TO librarian_role;
+GO
+
+-- Bulk reader provisioning: one table-valued parameter per batch. Rows whose
+-- Username already exists are skipped rather than failing the batch on
+-- UQ_Accounts_Username; the usernames actually created are returned.
+USE MMU_Library;
+GO
+IF TYPE_ID(N'LibraryData.AccountImportRows') IS NULL
+    CREATE TYPE LibraryData.AccountImportRows AS TABLE (
+        Username NVARCHAR(50) NOT NULL PRIMARY KEY,
+        Password NVARCHAR(255) NOT NULL
+    );
+GO
+
+-- Returns one row (Username) per account created
+CREATE OR ALTER PROCEDURE LibraryData.CreateReaderAccounts
+    @Accounts LibraryData.AccountImportRows READONLY
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    BEGIN TRANSACTION;
+
+    INSERT INTO LibraryData.Accounts (Username, Password, Role)
+    OUTPUT inserted.Username
+    SELECT a.Username, a.Password, 'Reader'
+    FROM @Accounts a
+    WHERE NOT EXISTS (
+        SELECT 1 FROM LibraryData.Accounts x WITH (UPDLOCK, HOLDLOCK)
+        WHERE x.Username = a.Username
+    );
+
+    COMMIT TRANSACTION;
+END;
+GO
+
+GRANT EXECUTE ON LibraryData.CreateReaderAccounts TO librarian_role;
+GRANT EXECUTE ON TYPE::LibraryData.AccountImportRows TO librarian_role;
+GO
+
+-- Bulk librarian actions on a multi-selection: the selected keys go in as
+-- one table-valued parameter and the whole selection is applied in one
+-- transaction. Each procedure returns one row per requested key with a
+-- Status code:
+--   0 = applied, 1 = not found,
+--   2 = referenced by BorrowHistory (cannot be deleted),
+--   3 = protected (main librarian account)
+-- Rows that cannot be applied are reported instead of failing the batch.
+USE MMU_Library;
+GO
+IF TYPE_ID(N'LibraryData.BookIDList') IS NULL
+    CREATE TYPE LibraryData.BookIDList AS TABLE (
+        BookID INT NOT NULL PRIMARY KEY
+    );
+GO
+
+IF TYPE_ID(N'LibraryData.UsernameList') IS NULL
+    CREATE TYPE LibraryData.UsernameList AS TABLE (
+        Username NVARCHAR(50) NOT NULL PRIMARY KEY
+    );
+GO
+
+-- Returns (BookID, Status, Available) per requested book
+CREATE OR ALTER PROCEDURE LibraryData.ToggleBooksStatus
+    @BookIDs LibraryData.BookIDList READONLY
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    DECLARE @Toggled TABLE (BookID INT PRIMARY KEY, Available INT);
+    DECLARE @Version BIGINT;
+
+    BEGIN TRANSACTION;
+
+    IF EXISTS (SELECT 1 FROM LibraryData.Books b JOIN @BookIDs i ON i.BookID = b.BookID)
+    BEGIN
+        UPDATE LibraryData.CatalogVersion SET @Version = Version = Version + 1;
+
+        UPDATE b
+        SET Available = CASE WHEN b.Available = 1 THEN 0 ELSE 1 END,
+            ChangeVersion = @Version
+        OUTPUT inserted.BookID, inserted.Available INTO @Toggled
+        FROM LibraryData.Books b
+        JOIN @BookIDs i ON i.BookID = b.BookID;
+    END
+
+    COMMIT TRANSACTION;
+
+    SELECT i.BookID,
+           CASE WHEN t.BookID IS NULL THEN 1 ELSE 0 END AS Status,
+           t.Available
+    FROM @BookIDs i
+    LEFT JOIN @Toggled t ON t.BookID = i.BookID
+    ORDER BY i.BookID;
+END;
+GO
+
+-- Returns (BookID, Status) per requested book
+CREATE OR ALTER PROCEDURE LibraryData.DeleteBooks
+    @BookIDs LibraryData.BookIDList READONLY
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    DECLARE @Outcome TABLE (BookID INT PRIMARY KEY, Status INT NOT NULL);
+    DECLARE @Version BIGINT;
+
+    BEGIN TRANSACTION;
+
+    -- CatalogVersion before any Books lock, as in every catalog procedure
+    IF EXISTS (SELECT 1 FROM LibraryData.Books b JOIN @BookIDs i ON i.BookID = b.BookID)
+        UPDATE LibraryData.CatalogVersion SET @Version = Version = Version + 1;
+
+    -- Lock the selected books and their history so the checks hold until
+    -- the delete
+    INSERT INTO @Outcome (BookID, Status)
+    SELECT i.BookID,
+           CASE
+               WHEN b.BookID IS NULL THEN 1
+               WHEN EXISTS (
+                   SELECT 1 FROM LibraryData.BorrowHistory h WITH (UPDLOCK, HOLDLOCK)
+                   WHERE h.BookID = i.BookID
+               ) THEN 2
+               ELSE 0
+           END
+    FROM @BookIDs i
+    LEFT JOIN LibraryData.Books b WITH (UPDLOCK, HOLDLOCK) ON b.BookID = i.BookID;
+
+    DELETE b
+    OUTPUT deleted.BookID, @Version
+    INTO LibraryData.BookTombstones (BookID, DeletedVersion)
+    FROM LibraryData.Books b
+    JOIN @Outcome o ON o.BookID = b.BookID
+    WHERE o.Status = 0;
+
+    COMMIT TRANSACTION;
+
+    SELECT BookID, Status FROM @Outcome ORDER BY BookID;
+END;
+GO
+
+-- Returns (Username, Status) per requested account
+CREATE OR ALTER PROCEDURE LibraryData.DeleteUsers
+    @Usernames LibraryData.UsernameList READONLY
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    DECLARE @Outcome TABLE (
+        Username NVARCHAR(50) PRIMARY KEY,
+        AccountID INT NULL,
+        Status INT NOT NULL
+    );
+
+    BEGIN TRANSACTION;
+
+    INSERT INTO @Outcome (Username, AccountID, Status)
+    SELECT u.Username, a.AccountID,
+           CASE
+               WHEN a.AccountID IS NULL THEN 1
+               WHEN LOWER(a.Username) = 'librarian' THEN 3
+               WHEN EXISTS (
+                   SELECT 1 FROM LibraryData.BorrowHistory h WITH (UPDLOCK, HOLDLOCK)
+                   WHERE h.AccountID = a.AccountID
+               ) THEN 2
+               ELSE 0
+           END
+    FROM @Usernames u
+    LEFT JOIN LibraryData.Accounts a WITH (UPDLOCK, HOLDLOCK) ON a.Username = u.Username;
+
+    DELETE a
+    FROM LibraryData.Accounts a
+    JOIN @Outcome o ON o.AccountID = a.AccountID
+    WHERE o.Status = 0;
+
+    COMMIT TRANSACTION;
+
+    SELECT Username, Status FROM @Outcome ORDER BY Username;
+END;
+GO
+
+GRANT EXECUTE ON LibraryData.ToggleBooksStatus TO librarian_role;
+GRANT EXECUTE ON LibraryData.DeleteBooks TO librarian_role;
+GRANT EXECUTE ON LibraryData.DeleteUsers TO librarian_role;
+GRANT EXECUTE ON TYPE::LibraryData.BookIDList TO librarian_role;
+GRANT EXECUTE ON TYPE::LibraryData.UsernameList TO librarian_role;
+GO
+
+-- Overdue report: open loans only, ordered by BorrowDate and covering the
+-- columns the report joins on, so listing the overdue loans (BorrowDate
+-- before today - 14 days) is a range seek over the overdue rows alone
+USE MMU_Library;
+GO
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_LibraryData_BorrowHistory_OpenLoans')
+    CREATE INDEX IX_LibraryData_BorrowHistory_OpenLoans
+    ON LibraryData.BorrowHistory(BorrowDate)
+    INCLUDE (AccountID, BookID)
+    WHERE ReturnDate IS NULL;
+GO
@@ -0,0 +1,30 @@
+# storage/__init__.py
+# Pluggable data-access backends. DB_BACKEND selects one:
+#   'sqlserver' - MMU_Library on SQL Server (default)
+#   'sqlite'    - local stand-in for benchmarks and load tests
+from .base import (
+    BULK_IN_USE, BULK_NOT_FOUND, BULK_OK, BULK_PROTECTED,
+    LOAN_DAYS, LOAN_LIMIT_REACHED, LOAN_NO_ACCOUNT, LOAN_NO_BOOK,
+    LOAN_NOT_AVAILABLE, LOAN_NOT_BORROWED, LOAN_OK, Repository, StorageError,
+)
+from .sqlite import SqliteBackend, SqliteRepository
+from .sqlserver import SqlServerBackend, SqlServerRepository
+
+__all__ = [
+    'Repository', 'StorageError',
+    'LOAN_DAYS', 'LOAN_OK', 'LOAN_NO_ACCOUNT', 'LOAN_LIMIT_REACHED',
+    'LOAN_NOT_AVAILABLE', 'LOAN_NO_BOOK', 'LOAN_NOT_BORROWED',
+    'BULK_OK', 'BULK_NOT_FOUND', 'BULK_IN_USE', 'BULK_PROTECTED',
+    'SqlServerBackend', 'SqlServerRepository',
+    'SqliteBackend', 'SqliteRepository',
+    'create_backend',
+]
+
+
+def create_backend(config):
+    name = config.get('DB_BACKEND', 'sqlserver')
+    if name == 'sqlserver':
+        return SqlServerBackend(config['DB_CONN_STR'])
+    if name == 'sqlite':
+        return SqliteBackend(config.get('DB_SQLITE_PATH', ':memory:'))
+    raise ValueError(f"Unknown DB_BACKEND: {name!r}")
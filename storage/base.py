@@ -0,0 +1,607 @@
+# storage/base.py
+# Data-access layer shared by every backend.
+#
+# Blueprints never build SQL themselves; they call a Repository bound to the
+# request's pooled connection. Queries that are portable between SQL Server
+# and SQLite live here (the SQLite backend attaches its database under the
+# name "LibraryData" so the schema-qualified table names work unchanged);
+# backends override the statements that need dialect-specific date
+# functions and the stored-procedure calls.
+from datetime import date, datetime, time, timedelta
+
+
+class StorageError(Exception):
+    """Raised when a stored-procedure rule rejects an operation."""
+
+
+# Status codes returned by LibraryData.BorrowBook / ReturnBook
+LOAN_OK = 0
+LOAN_NO_ACCOUNT = 1
+LOAN_LIMIT_REACHED = 2
+LOAN_NOT_AVAILABLE = 3
+LOAN_NO_BOOK = 4
+LOAN_NOT_BORROWED = 5
+
+# Loan period applied by LibraryData.BorrowBook (due = BorrowDate + 14 days)
+LOAN_DAYS = 14
+
+# Per-item status codes returned by the bulk librarian procedures
+# (LibraryData.ToggleBooksStatus / DeleteBooks / DeleteUsers)
+BULK_OK = 0
+BULK_NOT_FOUND = 1
+BULK_IN_USE = 2      # referenced by BorrowHistory
+BULK_PROTECTED = 3   # main librarian account
+
+
+def _dicts(cursor):
+    # Column names are read once per result set, not per row
+    columns = tuple(col[0] for col in cursor.description)
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+class Repository:
+    # Appended after ORDER BY to cap the row count; takes one parameter
+    LIMIT_CLAUSE = None
+    # Select-list item giving an open loan's due date as "due_date"
+    DUE_DATE_COLUMN = None
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    # =========================
+    # TRANSACTION CONTROL
+    # =========================
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+    # =========================
+    # HELPERS
+    # =========================
+    def _execute(self, sql, params=()):
+        cursor = self.conn.cursor()
+        cursor.execute(sql, params)
+        return cursor
+
+    def _fetch_one(self, sql, params=()):
+        return self._execute(sql, params).fetchone()
+
+    def _fetch_value(self, sql, params=()):
+        row = self._fetch_one(sql, params)
+        return row[0] if row else None
+
+    def _fetch_dicts(self, sql, params=()):
+        return _dicts(self._execute(sql, params))
+
+    def _fetch_result_sets(self, statements):
+        """Rows of each (sql, params) in `statements`, as lists of dicts.
+
+        Run one after another here; backends that can send a multi-statement
+        batch override this to make it a single round trip.
+        """
+        return [self._fetch_dicts(sql, params) for sql, params in statements]
+
+    def _keyset_dicts(self, sql, params, sort_expr, id_col, descending=False,
+                      after=None, before=None, limit=None):
+        """Rows of `sql` (which ends in a WHERE clause) ordered by
+        (sort_expr, id_col), resuming after/before a (value, id) key.
+        Rows come back in display order either way."""
+        params = list(params)
+        forward, backward = ('<', '>') if descending else ('>', '<')
+        asc, desc = ('DESC', 'ASC') if descending else ('ASC', 'DESC')
+
+        order = f"{sort_expr} {asc}, {id_col} {asc}"
+        if after:
+            sql += f" AND ({sort_expr} {forward} ? OR ({sort_expr} = ? AND {id_col} {forward} ?))"
+            params.extend([after[0], after[0], after[1]])
+        elif before:
+            sql += f" AND ({sort_expr} {backward} ? OR ({sort_expr} = ? AND {id_col} {backward} ?))"
+            params.extend([before[0], before[0], before[1]])
+            order = f"{sort_expr} {desc}, {id_col} {desc}"
+
+        sql += f" ORDER BY {order}"
+        if limit is not None:
+            sql += self.LIMIT_CLAUSE
+            params.append(limit)
+
+        rows = self._fetch_dicts(sql, params)
+        if before:
+            rows.reverse()
+        return rows
+
+    # =========================
+    # ACCOUNTS
+    # =========================
+    def get_login(self, username):
+        return self._fetch_one("""
+            SELECT Password, Role, FailedAttempts, LockoutUntil, CreatedDate
+            FROM LibraryData.Accounts
+            WHERE Username = ?
+        """, (username,))
+
+    def get_account_id(self, username):
+        return self._fetch_value(
+            "SELECT AccountID FROM LibraryData.Accounts WHERE Username = ?",
+            (username,)
+        )
+
+    def record_login(self, username, success, max_attempts, lockout_minutes,
+                     old_hash=None, new_hash=None):
+        """Apply one login attempt atomically (LibraryData.RecordLoginAttempt).
+
+        Returns (FailedAttempts, LockoutUntil, AccountID, CredentialVersion)
+        after the update, or None when the account no longer exists. A new
+        lockout bumps CredentialVersion.
+        """
+        raise NotImplementedError
+
+    def change_password(self, username, hashed):
+        """Set the user's own new password and bump CredentialVersion.
+
+        Returns the new CredentialVersion, or None when the account is gone.
+        """
+        raise NotImplementedError
+
+    def existing_usernames(self, usernames):
+        """The subset of `usernames` that already have an account."""
+        usernames = list(usernames)
+        found = set()
+        # Stay well under SQL Server's 2100-parameter limit
+        for start in range(0, len(usernames), 1000):
+            chunk = usernames[start:start + 1000]
+            placeholders = ', '.join('?' * len(chunk))
+            cursor = self._execute(f"""
+                SELECT Username FROM LibraryData.Accounts
+                WHERE Username IN ({placeholders})
+            """, chunk)
+            found.update(row[0] for row in cursor.fetchall())
+        return found
+
+    # Sortable columns for the dashboard's member listing
+    MEMBER_SORTS = {
+        'id': 'AccountID',
+        'username': 'Username',
+        'role': 'Role',
+    }
+
+    def list_members_page(self, sort='username', descending=False, query='', role=None,
+                          after=None, before=None, limit=None):
+        """One keyset page of accounts; each row carries SortValue for the key."""
+        sort_expr = self.MEMBER_SORTS[sort]
+        sql = f"""
+            SELECT AccountID, Username, Role, CreatedDate, FailedAttempts, LockoutUntil,
+                   {sort_expr} AS SortValue
+            FROM LibraryData.Accounts
+            WHERE 1=1
+        """
+        params = []
+        if query:
+            sql += " AND Username LIKE ?"
+            params.append(f"%{query}%")
+        if role:
+            sql += " AND Role = ?"
+            params.append(role)
+        return self._keyset_dicts(sql, params, sort_expr, 'AccountID', descending,
+                                  after, before, limit)
+
+    def get_member(self, username):
+        """One account row, shaped like list_members_page rows."""
+        rows = self._fetch_dicts("""
+            SELECT AccountID, Username, Role, CreatedDate, FailedAttempts, LockoutUntil
+            FROM LibraryData.Accounts
+            WHERE Username = ?
+        """, (username,))
+        return rows[0] if rows else None
+
+    def list_members(self):
+        return self._fetch_dicts("""
+            SELECT Username, Role
+            FROM LibraryData.Accounts
+            ORDER BY Username
+        """)
+
+    # =========================
+    # BOOKS
+    # =========================
+    def list_inventory(self):
+        return self._fetch_dicts("""
+            SELECT BookID, Title, Author, Category, Available
+            FROM LibraryData.Books
+            ORDER BY BookID
+        """)
+
+    # Sortable columns for the dashboard's inventory listing
+    INVENTORY_SORTS = {
+        'id': 'BookID',
+        'title': 'Title',
+        'author': 'Author',
+        'category': "COALESCE(Category, '')",
+        'available': 'Available',
+    }
+
+    def list_inventory_page(self, sort='id', descending=False, query='', category='All',
+                            available=None, after=None, before=None, limit=None):
+        """One keyset page of books; each row carries SortValue for the key."""
+        sort_expr = self.INVENTORY_SORTS[sort]
+        sql = f"""
+            SELECT BookID, Title, Author, Category, Available, DueDate,
+                   {sort_expr} AS SortValue
+            FROM LibraryData.Books
+            WHERE 1=1
+        """
+        params = []
+        if query:
+            sql += " AND (Title LIKE ? OR Author LIKE ?)"
+            params.extend([f"%{query}%", f"%{query}%"])
+        if category and category != 'All':
+            sql += " AND Category = ?"
+            params.append(category)
+        if available is not None:
+            sql += " AND Available = ?"
+            params.append(1 if available else 0)
+        return self._keyset_dicts(sql, params, sort_expr, 'BookID', descending,
+                                  after, before, limit)
+
+    def get_inventory_book(self, book_id):
+        """One book row, shaped like list_inventory_page rows."""
+        rows = self._fetch_dicts("""
+            SELECT BookID, Title, Author, Category, Available, DueDate
+            FROM LibraryData.Books
+            WHERE BookID = ?
+        """, (book_id,))
+        return rows[0] if rows else None
+
+    def catalog_version(self):
+        return self._fetch_value("SELECT Version FROM LibraryData.CatalogVersion WHERE ID = 1")
+
+    def catalog_summary(self):
+        """Per-category totals: [{'Category', 'Total', 'Available'}, ...]."""
+        return self._fetch_dicts("""
+            SELECT Category,
+                   COUNT(*) AS Total,
+                   SUM(CASE WHEN Available = 1 THEN 1 ELSE 0 END) AS Available
+            FROM LibraryData.Books
+            GROUP BY Category
+            ORDER BY Category
+        """)
+
+    def _bump_catalog_version(self):
+        """Advance CatalogVersion; returns the new value, which the changed
+        Books rows are stamped with (ChangeVersion)."""
+        self._execute("UPDATE LibraryData.CatalogVersion SET Version = Version + 1")
+        return self.catalog_version()
+
+    def get_books(self, book_ids):
+        """Catalog rows for the given IDs, keyed by BookID."""
+        if not book_ids:
+            return {}
+        return {row['id']: row for row in self._fetch_dicts(*self._get_books_sql(book_ids))}
+
+    def _get_books_sql(self, book_ids):
+        placeholders = ', '.join('?' * len(book_ids)) or 'NULL'
+        return f"""
+            SELECT
+                BookID AS id,
+                Title AS title,
+                Author AS author,
+                Category AS category,
+                Available AS available
+            FROM LibraryData.Books
+            WHERE BookID IN ({placeholders})
+        """, list(book_ids)
+
+    def search_books(self, query='', category='All', after=None, before=None, limit=None):
+        """Catalog rows ordered by (Title, BookID).
+
+        `after` / `before` are (title, book_id) keyset bounds; with `before`
+        the rows are still returned in ascending order.
+        """
+        rows = self._fetch_dicts(*self._search_books_sql(query, category, after, before, limit))
+        if before:
+            rows.reverse()
+        return rows
+
+    def _search_books_sql(self, query, category, after, before, limit):
+        sql = """
+            SELECT
+                BookID AS id,
+                Title AS title,
+                Author AS author,
+                Category AS category,
+                Available AS available
+            FROM LibraryData.Books
+            WHERE 1=1
+        """
+        params = []
+
+        if query:
+            sql += " AND (Title LIKE ? OR Author LIKE ?)"
+            params.extend([f"%{query}%", f"%{query}%"])
+
+        if category and category != 'All':
+            sql += " AND Category = ?"
+            params.append(category)
+
+        order = "Title, BookID"
+        if after:
+            sql += " AND (Title > ? OR (Title = ? AND BookID > ?))"
+            params.extend([after[0], after[0], after[1]])
+        elif before:
+            sql += " AND (Title < ? OR (Title = ? AND BookID < ?))"
+            params.extend([before[0], before[0], before[1]])
+            order = "Title DESC, BookID DESC"
+
+        sql += f" ORDER BY {order}"
+
+        if limit is not None:
+            sql += self.LIMIT_CLAUSE
+            params.append(limit)
+        return sql, params
+
+    # =========================
+    # CATALOG SYNC
+    # =========================
+    def catalog_changes(self, since=None):
+        """The catalog as of CatalogVersion, whole or as a delta.
+
+        Returns {'version', 'books', 'deleted'}: every book (since=None), or
+        only the books changed and the BookIDs deleted after version `since`,
+        ordered by BookID. The version is read first: procedures hand out
+        versions in commit order, so every change up to it is visible to the
+        reads that follow (a later change may show up too, and is simply
+        sent again next time).
+        """
+        books_sql = """
+            SELECT BookID AS id, Title AS title, Author AS author,
+                   Category AS category, Available AS available,
+                   ChangeVersion AS version
+            FROM LibraryData.Books
+        """
+        statements = [("SELECT Version FROM LibraryData.CatalogVersion WHERE ID = 1", ())]
+        if since is None:
+            statements.append((books_sql + " ORDER BY BookID", ()))
+        else:
+            statements += [
+                (books_sql + " WHERE ChangeVersion > ? ORDER BY BookID", (since,)),
+                ("""
+                    SELECT BookID AS id, DeletedVersion AS version
+                    FROM LibraryData.BookTombstones
+                    WHERE DeletedVersion > ?
+                    ORDER BY BookID
+                """, (since,)),
+            ]
+
+        versions, books, *deleted = self._fetch_result_sets(statements)
+        return {
+            'version': versions[0]['Version'],
+            'books': books,
+            'deleted': deleted[0] if deleted else [],
+        }
+
+    # =========================
+    # READER CATALOG PAGE
+    # =========================
+    def reader_page(self, account_id, query='', category='All', after=None, before=None,
+                    limit=None, book_ids=None):
+        """Everything the reader catalog page reads, in one batch.
+
+        Returns {'books', 'borrowed', 'catalog_version', 'credential_version'}:
+        a search_books listing (or, with `book_ids`, the get_books rows keyed
+        by BookID), the reader's open loans, the current CatalogVersion for
+        the metadata cache and the account's CredentialVersion (None once
+        the account is gone) for the session check.
+        """
+        if book_ids is not None:
+            books_sql = self._get_books_sql(book_ids)
+        else:
+            books_sql = self._search_books_sql(query, category, after, before, limit)
+
+        books, versions, borrowed = self._fetch_result_sets([
+            books_sql,
+            ("""
+                SELECT
+                    (SELECT Version FROM LibraryData.CatalogVersion WHERE ID = 1) AS CatalogVersion,
+                    (SELECT CredentialVersion FROM LibraryData.Accounts
+                     WHERE AccountID = ?) AS CredentialVersion
+            """, (account_id,)),
+            (self._borrowed_books_sql(), (account_id,)),
+        ])
+
+        if book_ids is not None:
+            books = {row['id']: row for row in books}
+        elif before:
+            books.reverse()
+        return {
+            'books': books,
+            'borrowed': borrowed,
+            'catalog_version': versions[0]['CatalogVersion'],
+            'credential_version': versions[0]['CredentialVersion'],
+        }
+
+    # =========================
+    # EXPORTS
+    # =========================
+    # Never includes Accounts.Password
+    EXPORT_QUERIES = {
+        'inventory': """
+            SELECT BookID, Title, Author, Category, Available, DueDate
+            FROM LibraryData.Books
+            ORDER BY BookID
+        """,
+        'members': """
+            SELECT AccountID, Username, Role, CreatedDate, FailedAttempts, LockoutUntil
+            FROM LibraryData.Accounts
+            ORDER BY AccountID
+        """,
+        'borrow_history': """
+            SELECT bh.BorrowID, bh.AccountID, a.Username, bh.BookID, b.Title,
+                   bh.BorrowDate, bh.ReturnDate, bh.Status
+            FROM LibraryData.BorrowHistory bh
+            LEFT JOIN LibraryData.Accounts a ON a.AccountID = bh.AccountID
+            LEFT JOIN LibraryData.Books b ON b.BookID = bh.BookID
+            ORDER BY bh.BorrowID
+        """,
+    }
+
+    def export_rows(self, dataset, chunk_size=1000):
+        """(columns, chunks): rows arrive `chunk_size` at a time via fetchmany."""
+        cursor = self._execute(self.EXPORT_QUERIES[dataset])
+        columns = [col[0] for col in cursor.description]
+
+        def chunks():
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield rows
+
+        return columns, chunks()
+
+    # =========================
+    # OVERDUE REPORT
+    # =========================
+    # A loan is overdue once its due day (BorrowDate + LOAN_DAYS) has passed.
+    def overdue_loans(self, today=None, limit=None):
+        """Overdue open loans, oldest first: [{'Username', 'Title', 'DueDate', ...}].
+
+        A range seek on IX_LibraryData_BorrowHistory_OpenLoans, which holds
+        open loans only, so the cost follows the overdue count rather than
+        the size of BorrowHistory.
+        """
+        today = today or date.today()
+        cutoff = datetime.combine(today - timedelta(days=LOAN_DAYS), time.min)
+        sql = """
+            SELECT bh.BorrowID, a.Username, bh.BookID, b.Title, b.Category, bh.BorrowDate
+            FROM LibraryData.BorrowHistory bh
+            JOIN LibraryData.Accounts a ON a.AccountID = bh.AccountID
+            JOIN LibraryData.Books b ON b.BookID = bh.BookID
+            WHERE bh.ReturnDate IS NULL
+              AND bh.BorrowDate < ?
+            ORDER BY bh.BorrowDate
+        """
+        params = [cutoff]
+        if limit is not None:
+            sql += self.LIMIT_CLAUSE
+            params.append(limit)
+
+        rows = self._fetch_dicts(sql, params)
+        for row in rows:
+            row['DueDate'] = row['BorrowDate'] + timedelta(days=LOAN_DAYS)
+        return rows
+
+    def overdue_summary(self, today=None):
+        """Overdue totals per reader and per category, plus the oldest due day.
+
+        Read from LibraryData.LoanDueSummary, which the borrow/return
+        procedures keep current, one row per (due day, reader, category).
+        """
+        today = today or date.today()
+        rows = self._fetch_dicts("""
+            SELECT s.DueDay, a.Username, s.Category, s.OpenLoans
+            FROM LibraryData.LoanDueSummary s
+            JOIN LibraryData.Accounts a ON a.AccountID = s.AccountID
+            WHERE s.DueDay < ?
+        """, (today,))
+
+        readers, categories = {}, {}
+        for row in rows:
+            readers[row['Username']] = readers.get(row['Username'], 0) + row['OpenLoans']
+            category = row['Category'] or 'Uncategorised'
+            categories[category] = categories.get(category, 0) + row['OpenLoans']
+
+        def ranked(counts):
+            return sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+
+        return {
+            'total': sum(readers.values()),
+            'oldest_due': min((row['DueDay'] for row in rows), default=None),
+            'readers': ranked(readers),
+            'categories': ranked(categories),
+        }
+
+    # =========================
+    # BORROWING
+    # =========================
+    def borrowed_books(self, account_id):
+        return self._fetch_dicts(self._borrowed_books_sql(), (account_id,))
+
+    def _borrowed_books_sql(self):
+        return f"""
+            SELECT
+                b.BookID AS id,
+                b.Title AS title,
+                {self.DUE_DATE_COLUMN}
+            FROM LibraryData.BorrowHistory bh
+            JOIN LibraryData.Books b ON bh.BookID = b.BookID
+            WHERE bh.AccountID = ?
+              AND bh.Status = 'borrow'
+              AND bh.ReturnDate IS NULL
+            ORDER BY bh.BorrowDate
+        """
+
+    def borrow_book(self, account_id, book_id, max_loans, credential_version=None):
+        """Borrow in one atomic round trip; returns a LOAN_* status code.
+
+        With `credential_version` the account must still be at that version
+        (LOAN_NO_ACCOUNT otherwise), which is how stale sessions are refused.
+        """
+        raise NotImplementedError
+
+    def return_book(self, account_id, book_id, credential_version=None):
+        """Close the reader's open loan; returns a LOAN_* status code."""
+        raise NotImplementedError
+
+    # =========================
+    # STORED PROCEDURES
+    # =========================
+    def add_book(self, title, author, category):
+        """Insert a book and return its new BookID."""
+        raise NotImplementedError
+
+    def add_books(self, books):
+        """Insert [(title, author, category), ...]; returns the row count."""
+        raise NotImplementedError
+
+    def edit_book(self, book_id, title, author, category):
+        """Update a book; False when the BookID does not exist."""
+        raise NotImplementedError
+
+    def delete_book(self, book_id):
+        raise NotImplementedError
+
+    def toggle_book_status(self, book_id):
+        raise NotImplementedError
+
+    def toggle_books_status(self, book_ids):
+        """Toggle a selection in one transaction.
+
+        Returns [{'BookID', 'Status', 'Available'}, ...], one per requested ID.
+        """
+        raise NotImplementedError
+
+    def delete_books(self, book_ids):
+        """Delete a selection in one transaction; [{'BookID', 'Status'}, ...]."""
+        raise NotImplementedError
+
+    def create_reader_account(self, username, hashed):
+        raise NotImplementedError
+
+    def create_reader_accounts(self, accounts):
+        """Insert [(username, hashed), ...], skipping existing usernames.
+
+        Returns the usernames actually created.
+        """
+        raise NotImplementedError
+
+    def reset_user_password(self, username, hashed):
+        """Set a new password, clear any lockout and bump CredentialVersion."""
+        raise NotImplementedError
+
+    def delete_user(self, username):
+        raise NotImplementedError
+
+    def delete_users(self, usernames):
+        """Delete a selection in one transaction; [{'Username', 'Status'}, ...]."""
+        raise NotImplementedError
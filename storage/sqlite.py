@@ -0,0 +1,434 @@
+# storage/sqlite.py
+# Local stand-in backend so routes can be exercised and load-tested without
+# SQL Server. The database (a file, or a shared in-memory database for
+# ':memory:') is attached as "LibraryData", and the stored procedures are
+# mirrored as plain SQL in SqliteRepository.
+import json
+import sqlite3
+from datetime import date, datetime
+from pathlib import Path
+
+from .base import (
+    BULK_IN_USE, BULK_NOT_FOUND, BULK_OK, BULK_PROTECTED,
+    LOAN_LIMIT_REACHED, LOAN_NO_ACCOUNT, LOAN_NO_BOOK, LOAN_NOT_AVAILABLE,
+    LOAN_NOT_BORROWED, LOAN_OK, Repository, StorageError,
+)
+
+SCHEMA_FILE = Path(__file__).with_name('sqlite_schema.sql')
+
+
+# Store datetimes the way SQLite's datetime() prints them and read TIMESTAMP
+# columns back as datetime objects, matching what pyodbc returns.
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" ", timespec="seconds"))
+sqlite3.register_converter("TIMESTAMP", lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()))
+
+NOW = "datetime('now', 'localtime')"
+
+
+class SqliteRepository(Repository):
+    LIMIT_CLAUSE = " LIMIT ?"
+    DUE_DATE_COLUMN = "datetime(bh.BorrowDate, '+14 days') AS \"due_date [timestamp]\""
+
+    # =========================
+    # ACCOUNTS
+    # =========================
+    # LibraryData.RecordLoginAttempt
+    def record_login(self, username, success, max_attempts, lockout_minutes,
+                     old_hash=None, new_hash=None):
+        # SET expressions all see the pre-update row, as in the T-SQL CTE
+        locked = f"(LockoutUntil IS NOT NULL AND LockoutUntil > {NOW})"
+        failed = f"(CASE WHEN LockoutUntil <= {NOW} THEN 0 ELSE FailedAttempts END)"
+        rows = self._execute(f"""
+            UPDATE LibraryData.Accounts
+            SET FailedAttempts = CASE
+                    WHEN {locked} THEN FailedAttempts
+                    WHEN :success THEN 0
+                    ELSE {failed} + 1
+                END,
+                LockoutUntil = CASE
+                    WHEN {locked} THEN LockoutUntil
+                    WHEN :success THEN NULL
+                    WHEN {failed} + 1 < :max_attempts THEN NULL
+                    WHEN Role = 'Librarian' THEN '9999-12-31 00:00:00'
+                    ELSE datetime({NOW}, '+' || :minutes || ' minutes')
+                END,
+                Password = CASE
+                    WHEN NOT {locked} AND :success AND :new_hash IS NOT NULL
+                         AND Password = :old_hash THEN :new_hash
+                    ELSE Password
+                END,
+                CredentialVersion = CASE
+                    WHEN NOT {locked} AND NOT :success AND {failed} + 1 >= :max_attempts
+                        THEN CredentialVersion + 1
+                    ELSE CredentialVersion
+                END
+            WHERE Username = :username
+            RETURNING FailedAttempts, LockoutUntil AS "LockoutUntil [timestamp]",
+                      AccountID, CredentialVersion
+        """, {
+            'username': username, 'success': 1 if success else 0,
+            'max_attempts': max_attempts, 'minutes': lockout_minutes,
+            'old_hash': old_hash, 'new_hash': new_hash,
+        }).fetchall()
+        return tuple(rows[0]) if rows else None
+
+    def change_password(self, username, hashed):
+        # fetchall() runs RETURNING statements to completion
+        rows = self._execute(f"""
+            UPDATE LibraryData.Accounts
+            SET Password = ?,
+                CreatedDate = {NOW},
+                FailedAttempts = 0,
+                LockoutUntil = NULL,
+                CredentialVersion = CredentialVersion + 1
+            WHERE Username = ?
+            RETURNING CredentialVersion
+        """, (hashed, username)).fetchall()
+        return rows[0][0] if rows else None
+
+    # =========================
+    # BORROWING
+    # =========================
+    def _begin_immediate(self):
+        # Take SQLite's write lock up front - the equivalent of the
+        # UPDLOCK/HOLDLOCK hints in the SQL Server procedures
+        if not self.conn.in_transaction:
+            self._execute("BEGIN IMMEDIATE")
+
+    def borrow_book(self, account_id, book_id, max_loans, credential_version=None):
+        # LibraryData.BorrowBook
+        self._begin_immediate()
+
+        if not self._account_current(account_id, credential_version):
+            return LOAN_NO_ACCOUNT
+
+        open_loans = self._fetch_value("""
+            SELECT COUNT(*)
+            FROM LibraryData.BorrowHistory
+            WHERE AccountID = ?
+              AND Status = 'borrow'
+              AND ReturnDate IS NULL
+        """, (account_id,))
+        if open_loans >= max_loans:
+            return LOAN_LIMIT_REACHED
+
+        available = self._fetch_value(
+            "SELECT Available FROM LibraryData.Books WHERE BookID = ?", (book_id,)
+        )
+        if available is None:
+            return LOAN_NO_BOOK
+        if available != 1:
+            return LOAN_NOT_AVAILABLE
+
+        # The write lock is held, so the claim below cannot miss
+        version = self._bump_catalog_version()
+        (category, due_date), = self._execute(f"""
+            UPDATE LibraryData.Books
+            SET Available = 0,
+                DueDate = datetime({NOW}, '+14 days'),
+                ChangeVersion = ?
+            WHERE BookID = ? AND Available = 1
+            RETURNING COALESCE(Category, ''), DueDate
+        """, (version, book_id)).fetchall()
+
+        # fetchall() runs RETURNING statements to completion
+        (borrow_date,), = self._execute("""
+            INSERT INTO LibraryData.BorrowHistory
+                (AccountID, BookID, BorrowDate, Status)
+            VALUES (?, ?, datetime(?, '-14 days'), 'borrow')
+            RETURNING BorrowDate
+        """, (account_id, book_id, due_date)).fetchall()
+        self._adjust_loan_due_summary(borrow_date, account_id, category, 1)
+        return LOAN_OK
+
+    def return_book(self, account_id, book_id, credential_version=None):
+        # LibraryData.ReturnBook
+        self._begin_immediate()
+
+        if not self._account_current(account_id, credential_version):
+            return LOAN_NO_ACCOUNT
+
+        closed = self._execute(f"""
+            UPDATE LibraryData.BorrowHistory
+            SET ReturnDate = {NOW},
+                Status = 'return'
+            WHERE AccountID = ?
+              AND BookID = ?
+              AND ReturnDate IS NULL
+            RETURNING BorrowDate
+        """, (account_id, book_id)).fetchall()
+        if not closed:
+            return LOAN_NOT_BORROWED
+
+        version = self._bump_catalog_version()
+        (category,), = self._execute("""
+            UPDATE LibraryData.Books
+            SET Available = 1,
+                DueDate = NULL,
+                ChangeVersion = ?
+            WHERE BookID = ?
+            RETURNING COALESCE(Category, '')
+        """, (version, book_id)).fetchall()
+        self._adjust_loan_due_summary(closed[0][0], account_id, category, -1)
+        return LOAN_OK
+
+    def _account_current(self, account_id, credential_version):
+        return self._fetch_value("""
+            SELECT 1 FROM LibraryData.Accounts
+            WHERE AccountID = ?
+              AND (? IS NULL OR CredentialVersion = ?)
+        """, (account_id, credential_version, credential_version)) is not None
+
+    def _adjust_loan_due_summary(self, borrow_date, account_id, category, delta):
+        # LibraryData.AdjustLoanDueSummary
+        key = (borrow_date, account_id, category or '')
+        self._execute("""
+            INSERT INTO LibraryData.LoanDueSummary (DueDay, AccountID, Category, OpenLoans)
+            VALUES (date(?, '+14 days'), ?, ?, ?)
+            ON CONFLICT (DueDay, AccountID, Category)
+            DO UPDATE SET OpenLoans = OpenLoans + excluded.OpenLoans
+        """, key + (delta,))
+        self._execute("""
+            DELETE FROM LibraryData.LoanDueSummary
+            WHERE DueDay = date(?, '+14 days') AND AccountID = ? AND Category = ?
+              AND OpenLoans <= 0
+        """, key)
+
+    # =========================
+    # STORED PROCEDURES (mirrored)
+    # =========================
+    def add_book(self, title, author, category):
+        # LibraryData.AddBook
+        version = self._bump_catalog_version()
+        cursor = self._execute("""
+            INSERT INTO LibraryData.Books (Title, Author, Category, Available, ChangeVersion)
+            VALUES (?, ?, ?, 1, ?)
+        """, (title, author, category, version))
+        return cursor.lastrowid
+
+    def add_books(self, books):
+        # LibraryData.AddBooks
+        if not books:
+            return 0
+        version = self._bump_catalog_version()
+        cursor = self.conn.cursor()
+        cursor.executemany("""
+            INSERT INTO LibraryData.Books (Title, Author, Category, Available, ChangeVersion)
+            VALUES (?, ?, ?, 1, ?)
+        """, [(*book, version) for book in books])
+        return len(books)
+
+    def edit_book(self, book_id, title, author, category):
+        # LibraryData.EditBook
+        self._begin_immediate()
+        old_category = self._fetch_value(
+            "SELECT COALESCE(Category, '') FROM LibraryData.Books WHERE BookID = ?", (book_id,)
+        )
+        version = self._bump_catalog_version()
+        updated = self._execute("""
+            UPDATE LibraryData.Books
+            SET Title = ?,
+                Author = ?,
+                Category = ?,
+                ChangeVersion = ?
+            WHERE BookID = ?
+        """, (title, author, category, version, book_id)).rowcount
+
+        if old_category is not None and old_category != (category or ''):
+            loan = self._fetch_one("""
+                SELECT AccountID, BorrowDate
+                FROM LibraryData.BorrowHistory
+                WHERE BookID = ? AND ReturnDate IS NULL
+            """, (book_id,))
+            if loan:
+                account_id, borrow_date = loan
+                self._adjust_loan_due_summary(borrow_date, account_id, old_category, -1)
+                self._adjust_loan_due_summary(borrow_date, account_id, category, 1)
+        return updated > 0
+
+    def delete_book(self, book_id):
+        # LibraryData.DeleteBook
+        self._delete_books_with_tombstones([book_id])
+
+    def _delete_books_with_tombstones(self, book_ids):
+        # DELETE ... OUTPUT deleted.BookID INTO LibraryData.BookTombstones
+        version = self._bump_catalog_version()
+        selected = json.dumps(book_ids)
+        self._execute("""
+            INSERT INTO LibraryData.BookTombstones (BookID, DeletedVersion)
+            SELECT BookID, ? FROM LibraryData.Books
+            WHERE BookID IN (SELECT value FROM json_each(?))
+        """, (version, selected))
+        self._execute(
+            "DELETE FROM LibraryData.Books WHERE BookID IN (SELECT value FROM json_each(?))",
+            (selected,)
+        )
+
+    def toggle_book_status(self, book_id):
+        # LibraryData.ToggleBookStatus
+        version = self._bump_catalog_version()
+        self._execute("""
+            UPDATE LibraryData.Books
+            SET Available = CASE
+                WHEN Available = 1 THEN 0
+                ELSE 1
+            END,
+                ChangeVersion = ?
+            WHERE BookID = ?
+        """, (version, book_id))
+
+    # The selection travels as one JSON array parameter (read back with
+    # json_each), the stand-in for the LibraryData.BookIDList TVP.
+    def toggle_books_status(self, book_ids):
+        # LibraryData.ToggleBooksStatus
+        selected = sorted(set(book_ids))
+        self._begin_immediate()
+        toggled = {}
+        if self._fetch_value("""
+            SELECT 1 FROM LibraryData.Books
+            WHERE BookID IN (SELECT value FROM json_each(?))
+        """, (json.dumps(selected),)):
+            version = self._bump_catalog_version()
+            toggled = dict(self._execute("""
+                UPDATE LibraryData.Books
+                SET Available = CASE WHEN Available = 1 THEN 0 ELSE 1 END,
+                    ChangeVersion = ?
+                WHERE BookID IN (SELECT value FROM json_each(?))
+                RETURNING BookID, Available
+            """, (version, json.dumps(selected))).fetchall())
+        return [
+            {'BookID': book_id,
+             'Status': BULK_OK if book_id in toggled else BULK_NOT_FOUND,
+             'Available': toggled.get(book_id)}
+            for book_id in selected
+        ]
+
+    def delete_books(self, book_ids):
+        # LibraryData.DeleteBooks
+        selected = sorted(set(book_ids))
+        self._begin_immediate()
+        rows = self._execute("""
+            SELECT s.value,
+                   CASE
+                       WHEN b.BookID IS NULL THEN ?
+                       WHEN EXISTS (SELECT 1 FROM LibraryData.BorrowHistory h
+                                    WHERE h.BookID = s.value) THEN ?
+                       ELSE ?
+                   END
+            FROM json_each(?) s
+            LEFT JOIN LibraryData.Books b ON b.BookID = s.value
+        """, (BULK_NOT_FOUND, BULK_IN_USE, BULK_OK, json.dumps(selected))).fetchall()
+        doomed = [book_id for book_id, status in rows if status == BULK_OK]
+        if doomed:
+            self._delete_books_with_tombstones(doomed)
+        return [{'BookID': book_id, 'Status': status} for book_id, status in rows]
+
+    def create_reader_account(self, username, hashed):
+        # LibraryData.CreateReaderAccount
+        self._execute("""
+            INSERT INTO LibraryData.Accounts (Username, Password, Role)
+            VALUES (?, ?, 'Reader')
+        """, (username, hashed))
+
+    def create_reader_accounts(self, accounts):
+        # LibraryData.CreateReaderAccounts
+        self._begin_immediate()
+        cursor = self.conn.cursor()
+        created = []
+        for username, hashed in accounts:
+            cursor.execute("""
+                INSERT INTO LibraryData.Accounts (Username, Password, Role)
+                VALUES (?, ?, 'Reader')
+                ON CONFLICT (Username) DO NOTHING
+            """, (username, hashed))
+            if cursor.rowcount:
+                created.append(username)
+        return created
+
+    def reset_user_password(self, username, hashed):
+        # LibraryData.ResetUserPassword
+        self._execute(f"""
+            UPDATE LibraryData.Accounts
+            SET Password = ?,
+                FailedAttempts = 0,
+                LockoutUntil = NULL,
+                CreatedDate = {NOW},
+                CredentialVersion = CredentialVersion + 1
+            WHERE Username = ?
+        """, (hashed, username))
+
+    def delete_user(self, username):
+        # LibraryData.DeleteUser
+        if username.lower() == 'librarian':
+            raise StorageError('Cannot delete main librarian account')
+
+        self._execute("DELETE FROM LibraryData.Accounts WHERE Username = ?", (username,))
+
+    def delete_users(self, usernames):
+        # LibraryData.DeleteUsers
+        selected = sorted(set(usernames))
+        self._begin_immediate()
+        rows = self._execute("""
+            SELECT s.value, a.AccountID,
+                   CASE
+                       WHEN a.AccountID IS NULL THEN ?
+                       WHEN LOWER(a.Username) = 'librarian' THEN ?
+                       WHEN EXISTS (SELECT 1 FROM LibraryData.BorrowHistory h
+                                    WHERE h.AccountID = a.AccountID) THEN ?
+                       ELSE ?
+                   END
+            FROM json_each(?) s
+            LEFT JOIN LibraryData.Accounts a ON a.Username = s.value
+        """, (BULK_NOT_FOUND, BULK_PROTECTED, BULK_IN_USE, BULK_OK,
+              json.dumps(selected))).fetchall()
+        doomed = [account_id for _, account_id, status in rows if status == BULK_OK]
+        if doomed:
+            self._execute(
+                "DELETE FROM LibraryData.Accounts WHERE AccountID IN (SELECT value FROM json_each(?))",
+                (json.dumps(doomed),)
+            )
+        return [{'Username': username, 'Status': status} for username, _, status in rows]
+
+
+class SqliteBackend:
+    name = 'sqlite'
+    repository_class = SqliteRepository
+    session_context_sql = None   # no row-level security to feed
+
+    def __init__(self, path=':memory:', busy_timeout=5.0):
+        if path == ':memory:':
+            # Named shared-cache database so every pooled connection sees it
+            self.target = f"file:mmu_library_{id(self)}?mode=memory&cache=shared"
+        else:
+            self.target = str(path)
+        self.busy_timeout = busy_timeout
+        self._keeper = None
+
+    def setup(self):
+        conn = self.connect()
+        if self.target.startswith('file:'):
+            # An in-memory database only lives while a connection is open
+            self._keeper = conn
+        else:
+            conn.execute("PRAGMA LibraryData.journal_mode = WAL")
+        conn.executescript(SCHEMA_FILE.read_text())
+        conn.commit()
+        if self._keeper is None:
+            conn.close()
+
+    def connect(self):
+        conn = sqlite3.connect(
+            ':memory:',
+            uri=True,
+            timeout=self.busy_timeout,
+            detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+            check_same_thread=False,
+        )
+        conn.execute("ATTACH DATABASE ? AS LibraryData", (self.target,))
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    def repository(self, conn):
+        return self.repository_class(conn)
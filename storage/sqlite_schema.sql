@@ -0,0 +1,102 @@
+-- SQLite stand-in for the LibraryData schema in sql/complete_sql.sql.
+-- The database is attached as "LibraryData", so tables are created there.
+-- Security features (logins, roles, TDE, masking, RLS, audits) have no
+-- SQLite equivalent and are intentionally left out.
+
+CREATE TABLE IF NOT EXISTS LibraryData.Accounts (
+    AccountID         INTEGER       PRIMARY KEY AUTOINCREMENT,
+    Username          NVARCHAR(50)  NOT NULL,
+    Password          NVARCHAR(255) NOT NULL,
+    Role              NVARCHAR(50)  NOT NULL DEFAULT 'Reader',
+    CreatedDate       TIMESTAMP     NOT NULL DEFAULT (datetime('now', 'localtime')),
+    FailedAttempts    INT           NOT NULL DEFAULT 0,
+    LockoutUntil      TIMESTAMP     NULL,
+    CredentialVersion INT           NOT NULL DEFAULT 0,
+    CONSTRAINT UQ_Accounts_Username UNIQUE (Username)
+);
+
+CREATE TABLE IF NOT EXISTS LibraryData.Books (
+    BookID        INTEGER PRIMARY KEY AUTOINCREMENT,
+    Title         NVARCHAR(255) NOT NULL,
+    Author        NVARCHAR(255) NOT NULL,
+    Category      NVARCHAR(100) NULL,
+    Available     INT           NOT NULL DEFAULT 1,
+    DueDate       TIMESTAMP     NULL,
+    ChangeVersion BIGINT        NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS LibraryData.BorrowHistory (
+    BorrowID   INTEGER PRIMARY KEY AUTOINCREMENT,
+    AccountID  INT          NOT NULL,
+    BookID     INT          NOT NULL,
+    BorrowDate TIMESTAMP    NOT NULL DEFAULT (datetime('now', 'localtime')),
+    ReturnDate TIMESTAMP    NULL,
+    Status     NVARCHAR(50) NOT NULL,
+    CONSTRAINT FK_BorrowHistory_Accounts FOREIGN KEY (AccountID) REFERENCES Accounts (AccountID),
+    CONSTRAINT FK_BorrowHistory_Books FOREIGN KEY (BookID) REFERENCES Books (BookID),
+    CONSTRAINT CK_Borrow_Action CHECK (Status IN ('borrow', 'return'))
+);
+
+-- Bumped by every catalog change (see the metadata cache in catalog_cache.py)
+CREATE TABLE IF NOT EXISTS LibraryData.CatalogVersion (
+    ID      INT    NOT NULL PRIMARY KEY CHECK (ID = 1),
+    Version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT OR IGNORE INTO LibraryData.CatalogVersion (ID, Version) VALUES (1, 0);
+
+-- Deleted books for catalog delta sync (see BookTombstones in complete_sql.sql)
+CREATE TABLE IF NOT EXISTS LibraryData.BookTombstones (
+    BookID         INT    NOT NULL,
+    DeletedVersion BIGINT NOT NULL,
+    CONSTRAINT PK_BookTombstones PRIMARY KEY (DeletedVersion, BookID)
+);
+
+CREATE INDEX IF NOT EXISTS LibraryData.IX_LibraryData_BorrowHistory_AccountID
+    ON BorrowHistory (AccountID);
+
+CREATE INDEX IF NOT EXISTS LibraryData.IX_LibraryData_BorrowHistory_BookID
+    ON BorrowHistory (BookID);
+
+-- Open loans per due day, reader and category (see LoanDueSummary in
+-- complete_sql.sql); kept up to date by borrow/return/edit
+CREATE TABLE IF NOT EXISTS LibraryData.LoanDueSummary (
+    DueDay    DATE          NOT NULL,
+    AccountID INT           NOT NULL,
+    Category  NVARCHAR(100) NOT NULL,
+    OpenLoans INT           NOT NULL,
+    CONSTRAINT PK_LoanDueSummary PRIMARY KEY (DueDay, AccountID, Category)
+);
+
+-- Backfill from the open loans of a database created before the summary
+INSERT INTO LibraryData.LoanDueSummary (DueDay, AccountID, Category, OpenLoans)
+SELECT date(bh.BorrowDate, '+14 days'), bh.AccountID, COALESCE(b.Category, ''), COUNT(*)
+FROM LibraryData.BorrowHistory bh
+JOIN LibraryData.Books b ON b.BookID = bh.BookID
+WHERE bh.ReturnDate IS NULL
+  AND NOT EXISTS (SELECT 1 FROM LibraryData.LoanDueSummary)
+GROUP BY date(bh.BorrowDate, '+14 days'), bh.AccountID, COALESCE(b.Category, '');
+
+-- Overdue report: open loans only, in BorrowDate order
+CREATE INDEX IF NOT EXISTS LibraryData.IX_LibraryData_BorrowHistory_OpenLoans
+    ON BorrowHistory (BorrowDate, AccountID, BookID)
+    WHERE ReturnDate IS NULL;
+
+-- Keyset pagination of the catalog on (Title, BookID)
+CREATE INDEX IF NOT EXISTS LibraryData.IX_LibraryData_Books_Title
+    ON Books (Title, BookID);
+
+-- Seed data (same as the GUIDANCE section of complete_sql.sql)
+INSERT INTO LibraryData.Accounts (Username, Password, Role, FailedAttempts)
+SELECT 'librarian', '$2b$12$TguWcPbjDKl3g/eI2B6T8OZZu7bkHRpkF2nAk0y9fsDIDwciYteHe', 'Librarian', 0
+WHERE NOT EXISTS (SELECT 1 FROM LibraryData.Accounts);
+
+INSERT INTO LibraryData.Books (Title, Author, Category, Available)
+SELECT Title, Author, Category, 1
+FROM (
+    SELECT 'The Great Gatsby' AS Title, 'F. Scott Fitzgerald' AS Author, 'Fiction' AS Category
+    UNION ALL SELECT '1984', 'George Orwell', 'Science Fiction'
+    UNION ALL SELECT 'The Hobbit', 'J.R.R. Tolkien', 'Fantasy'
+    UNION ALL SELECT 'Python Programming', 'MMU Press', 'Technology'
+)
+WHERE NOT EXISTS (SELECT 1 FROM LibraryData.Books);
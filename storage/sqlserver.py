@@ -0,0 +1,150 @@
+# storage/sqlserver.py
+# Production backend: MMU_Library on SQL Server through pyodbc, using the
+# LibraryData stored procedures from sql/complete_sql.sql.
+from .base import Repository, _dicts
+
+
+class SqlServerRepository(Repository):
+    LIMIT_CLAUSE = " OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY"
+    DUE_DATE_COLUMN = "DATEADD(DAY, 14, bh.BorrowDate) AS due_date"
+
+    # =========================
+    # HELPERS
+    # =========================
+    def _fetch_result_sets(self, statements):
+        # One batch, one round trip: each SELECT comes back as its own
+        # result set, read in turn with nextset()
+        cursor = self._execute(
+            "SET NOCOUNT ON;\n" + ";\n".join(sql for sql, _ in statements),
+            [value for _, params in statements for value in params],
+        )
+        results = [_dicts(cursor)]
+        for _ in statements[1:]:
+            cursor.nextset()
+            results.append(_dicts(cursor))
+        return results
+
+    # =========================
+    # ACCOUNTS
+    # =========================
+    def record_login(self, username, success, max_attempts, lockout_minutes,
+                     old_hash=None, new_hash=None):
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "EXEC LibraryData.RecordLoginAttempt ?, ?, ?, ?, ?, ?",
+            (username, 1 if success else 0, max_attempts, lockout_minutes,
+             old_hash, new_hash)
+        )
+        row = cursor.fetchone()
+        return tuple(row) if row else None
+
+    def change_password(self, username, hashed):
+        return self._fetch_value("""
+            UPDATE LibraryData.Accounts
+            SET Password = ?,
+                CreatedDate = GETDATE(),
+                FailedAttempts = 0,
+                LockoutUntil = NULL,
+                CredentialVersion = CredentialVersion + 1
+            OUTPUT inserted.CredentialVersion
+            WHERE Username = ?
+        """, (hashed, username))
+
+    # =========================
+    # BORROWING
+    # =========================
+    def borrow_book(self, account_id, book_id, max_loans, credential_version=None):
+        # Session check, limit check, availability check and both writes
+        # happen server-side in one call/transaction
+        row = self._fetch_one(
+            "EXEC LibraryData.BorrowBook ?, ?, ?, ?",
+            (account_id, book_id, max_loans, credential_version)
+        )
+        return row[0]
+
+    def return_book(self, account_id, book_id, credential_version=None):
+        row = self._fetch_one(
+            "EXEC LibraryData.ReturnBook ?, ?, ?",
+            (account_id, book_id, credential_version)
+        )
+        return row[0]
+
+    # =========================
+    # STORED PROCEDURES
+    # =========================
+    def add_book(self, title, author, category):
+        cursor = self._execute("EXEC LibraryData.AddBook ?, ?, ?", (title, author, category))
+        return cursor.fetchone()[0]
+
+    def add_books(self, books):
+        # pyodbc sends a list of row tuples as a table-valued parameter
+        cursor = self._execute("EXEC LibraryData.AddBooks ?", ([tuple(b) for b in books],))
+        return cursor.fetchone()[0]
+
+    def edit_book(self, book_id, title, author, category):
+        cursor = self._execute(
+            "EXEC LibraryData.EditBook ?, ?, ?, ?",
+            (book_id, title, author, category)
+        )
+        return bool(cursor.fetchone()[0])
+
+    def delete_book(self, book_id):
+        self._execute("EXEC LibraryData.DeleteBook ?", (book_id,))
+
+    def toggle_book_status(self, book_id):
+        self._execute("EXEC LibraryData.ToggleBookStatus ?", (book_id,))
+
+    def toggle_books_status(self, book_ids):
+        return self._fetch_dicts(
+            "EXEC LibraryData.ToggleBooksStatus ?", ([(i,) for i in set(book_ids)],)
+        )
+
+    def delete_books(self, book_ids):
+        return self._fetch_dicts(
+            "EXEC LibraryData.DeleteBooks ?", ([(i,) for i in set(book_ids)],)
+        )
+
+    def create_reader_account(self, username, hashed):
+        self._execute("EXEC LibraryData.CreateReaderAccount ?, ?", (username, hashed))
+
+    def create_reader_accounts(self, accounts):
+        cursor = self._execute(
+            "EXEC LibraryData.CreateReaderAccounts ?", ([tuple(a) for a in accounts],)
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+    def reset_user_password(self, username, hashed):
+        self._execute("EXEC LibraryData.ResetUserPassword ?, ?", (username, hashed))
+
+    def delete_user(self, username):
+        self._execute("EXEC LibraryData.DeleteUser ?", (username,))
+
+    def delete_users(self, usernames):
+        return self._fetch_dicts(
+            "EXEC LibraryData.DeleteUsers ?", ([(u,) for u in set(usernames)],)
+        )
+
+
+class SqlServerBackend:
+    name = 'sqlserver'
+    repository_class = SqlServerRepository
+    # Run ahead of a reader request's first statement (see db.py) so
+    # Security.fn_reader_rls sees the reader's AccountID; a NULL clears it
+    session_context_sql = (
+        "SET NOCOUNT ON; "
+        "EXEC sys.sp_set_session_context @key = N'UserID', @value = ?;"
+    )
+
+    def __init__(self, conn_str):
+        self.conn_str = conn_str
+
+    def setup(self):
+        # Schema is managed by sql/complete_sql.sql on the server
+        pass
+
+    def connect(self):
+        import pyodbc
+        return pyodbc.connect(self.conn_str)
+
+    def repository(self, conn):
+        return self.repository_class(conn)
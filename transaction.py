@@ -1,32 +1,47 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, session
-from datetime import datetime, timedelta
-import pyodbc
+from flask import (
+    Blueprint, render_template, redirect, url_for, flash, request, session, current_app,
+    jsonify,
+)
+from datetime import datetime
+from db import get_repo
+from storage import (
+    LOAN_LIMIT_REACHED, LOAN_NO_ACCOUNT, LOAN_NO_BOOK, LOAN_NOT_AVAILABLE,
+    LOAN_NOT_BORROWED, LOAN_OK,
+)
+from pagination import catalog_page, page_size
+from search_index import get_catalog_index
+from catalog_cache import get_catalog_metadata
+from live_updates import FeedFull, get_catalog_feed, publish_catalog_changes
 
 transactions_bp = Blueprint('transactions', __name__)
 
 MAX_BORROW_LIMIT = 3
 
+# Flash message per LibraryData.BorrowBook / ReturnBook status code
+BORROW_MESSAGES = {
+    LOAN_OK: ("Book borrowed successfully.", "success"),
+    LOAN_NO_ACCOUNT: ("User not found.", "danger"),
+    LOAN_LIMIT_REACHED: ("Borrow limit reached.", "danger"),
+    LOAN_NOT_AVAILABLE: ("Book is not available.", "danger"),
+    LOAN_NO_BOOK: ("Book is not available.", "danger"),
+}
+
+RETURN_MESSAGES = {
+    LOAN_OK: ("Book returned successfully.", "success"),
+    LOAN_NO_ACCOUNT: ("User not found.", "danger"),
+    LOAN_NOT_BORROWED: ("This book is not on your borrowed list, so it cannot be returned.", "danger"),
+}
+
 # =========================
-# DATABASE CONNECTION
+# SESSION IDENTITY
 # =========================
-def get_db_connection():
-    conn_str = (
-        "Driver={ODBC Driver 18 for SQL Server};"
-        "Server=localhost;"
-        "Database=MMU_Library;"
-        "Trusted_Connection=yes;"
-        "TrustServerCertificate=yes;"
-    )
-    return pyodbc.connect(conn_str)
-
-def get_account_id(cursor, username):
-    cursor.execute(
-        "SELECT AccountID FROM LibraryData.Accounts WHERE Username = ?",
-        (username,)
-    )
-    row = cursor.fetchone()
-    return row[0] if row else None
-
+# Routes act on session['identity'] (AccountID + CredentialVersion from
+# login) instead of looking the username up; the database refuses it once
+# a password reset, lockout or deletion has moved the account on.
+def _session_expired():
+    session.clear()
+    flash("Your session has expired. Please log in again.", "danger")
+    return redirect(url_for('reader.home'))
 
 # =========================
 # BORROW BOOK
@@ -41,63 +56,26 @@ def borrow(username, book_id):
         flash("Unauthorized action.", "danger")
         return redirect(url_for('reader.home'))
 
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        account_id = get_account_id(cursor, username)
-        if not account_id:
-            conn.close()
-            flash("User not found.", "danger")
-            return redirect(url_for('transactions.show_books', username=username))
-
-        # Borrow limit check
-        cursor.execute("""
-            SELECT COUNT(*)
-            FROM LibraryData.BorrowHistory
-            WHERE AccountID = ?
-              AND Status = 'borrow'
-              AND ReturnDate IS NULL
-        """, (account_id,))
-        borrowed_count = cursor.fetchone()[0]
-
-        if borrowed_count >= MAX_BORROW_LIMIT:
-            conn.close()
-            flash("Borrow limit reached.", "danger")
-            return redirect(url_for('transactions.show_books', username=username))
-
-        # Check availability
-        cursor.execute(
-            "SELECT Available FROM LibraryData.Books WHERE BookID = ?",
-            (book_id,)
-        )
-        row = cursor.fetchone()
-
-        if not row or row[0] == 0:
-            conn.close()
-            flash("Book is not available.", "danger")
-            return redirect(url_for('transactions.show_books', username=username))
+    identity = session.get('identity')
+    if not identity:
+        return _session_expired()
 
-        # ✅ SET DUE DATE
-        due_date = datetime.now() + timedelta(days=14)
-
-        cursor.execute("""
-            UPDATE LibraryData.Books
-            SET Available = 0,
-                DueDate = ?
-            WHERE BookID = ?
-        """, (due_date, book_id))
+    try:
+        repo = get_repo()
 
-        cursor.execute("""
-            INSERT INTO LibraryData.BorrowHistory
-                (AccountID, BookID, BorrowDate, Status)
-            VALUES (?, ?, GETDATE(), 'borrow')
-        """, (account_id, book_id))
+        # Session, limit + availability checks and the writes run as one
+        # locked transaction in LibraryData.BorrowBook (one round trip)
+        status = repo.borrow_book(identity['account_id'], book_id, MAX_BORROW_LIMIT,
+                                  identity['credential_version'])
+        repo.commit()
 
-        conn.commit()
-        conn.close()
+        if status == LOAN_NO_ACCOUNT:
+            return _session_expired()
 
-        flash("Book borrowed successfully.", "success")
+        if status == LOAN_OK:
+            # Loans leave the cached metadata alone (see catalog_cache.py)
+            publish_catalog_changes()
+        flash(*BORROW_MESSAGES[status])
 
     except Exception as e:
         flash(f"Database error: {str(e)}", "danger")
@@ -117,33 +95,24 @@ def return_book(username, book_id):
         flash("Unauthorized action.", "danger")
         return redirect(url_for('reader.home'))
 
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        account_id = get_account_id(cursor, username)
+    identity = session.get('identity')
+    if not identity:
+        return _session_expired()
 
-        cursor.execute("""
-            UPDATE LibraryData.BorrowHistory
-            SET ReturnDate = GETDATE(),
-                Status = 'return'
-            WHERE AccountID = ?
-              AND BookID = ?
-              AND ReturnDate IS NULL
-        """, (account_id, book_id))
+    try:
+        repo = get_repo()
 
-        # ✅ CLEAR DUE DATE
-        cursor.execute("""
-            UPDATE LibraryData.Books
-            SET Available = 1,
-                DueDate = NULL
-            WHERE BookID = ?
-        """, (book_id,))
+        # ✅ CLOSE THE LOAN + CLEAR DUE DATE (LibraryData.ReturnBook)
+        status = repo.return_book(identity['account_id'], book_id,
+                                  identity['credential_version'])
+        repo.commit()
 
-        conn.commit()
-        conn.close()
+        if status == LOAN_NO_ACCOUNT:
+            return _session_expired()
 
-        flash("Book returned successfully.", "success")
+        if status == LOAN_OK:
+            publish_catalog_changes()
+        flash(*RETURN_MESSAGES[status])
 
     except Exception as e:
         flash(f"Error: {str(e)}", "danger")
@@ -163,65 +132,7 @@ def show_books(username):
         flash("Unauthorized access.", "danger")
         return redirect(url_for('reader.home'))
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # 📚 ALL BOOKS
-    cursor.execute("""
-        SELECT 
-            BookID AS id,
-            Title AS title,
-            Author AS author,
-            Category AS category,
-            Available AS available
-        FROM LibraryData.Books
-        ORDER BY Title
-    """)
-    books = [
-        dict(zip([col[0] for col in cursor.description], row))
-        for row in cursor.fetchall()
-    ]
-
-    # 🏷️ CATEGORIES (DB-DRIVEN)
-    cursor.execute("""
-        SELECT DISTINCT Category
-        FROM LibraryData.Books
-        WHERE Category IS NOT NULL
-        ORDER BY Category
-    """)
-    categories = [row[0] for row in cursor.fetchall()]
-
-    # 📖 MY BORROWED BOOKS
-    account_id = get_account_id(cursor, username)
-
-    cursor.execute("""
-        SELECT 
-            b.BookID AS id,
-            b.Title AS title,
-            DATEADD(DAY, 14, bh.BorrowDate) AS due_date
-        FROM LibraryData.BorrowHistory bh
-        JOIN LibraryData.Books b ON bh.BookID = b.BookID
-        WHERE bh.AccountID = ?
-          AND bh.Status = 'borrow'
-          AND bh.ReturnDate IS NULL
-        ORDER BY bh.BorrowDate
-    """, (account_id,))
-
-    my_borrowed = [
-        dict(zip([col[0] for col in cursor.description], row))
-        for row in cursor.fetchall()
-    ]
-
-    conn.close()
-
-    return render_template(
-        'transactions.html',
-        books=books,
-        my_borrowed=my_borrowed,
-        categories=categories,   # ✅ IMPORTANT
-        username=username,
-        now=datetime.now()
-    )
+    return _render_catalog(username)
 
 # =========================
 # SEARCH BOOKS
@@ -236,79 +147,149 @@ def search(username):
         flash("Unauthorized access.", "danger")
         return redirect(url_for('reader.home'))
 
-    query = request.args.get('query', '')
-    category_filter = request.args.get('category', 'All')
-
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # 🔍 BASE QUERY
-    sql = """
-        SELECT 
-            BookID AS id,
-            Title AS title,
-            Author AS author,
-            Category AS category,
-            Available AS available
-        FROM LibraryData.Books
-        WHERE 1=1
-    """
-    params = []
-
-    if query:
-        sql += " AND (Title LIKE ? OR Author LIKE ?)"
-        params.extend([f"%{query}%", f"%{query}%"])
-
-    if category_filter != 'All':
-        sql += " AND Category = ?"
-        params.append(category_filter)
-
-    sql += " ORDER BY Title"
-
-    cursor.execute(sql, params)
-
-    books = [
-        dict(zip([col[0] for col in cursor.description], row))
-        for row in cursor.fetchall()
-    ]
-
-    # 🏷️ CATEGORIES (DB-DRIVEN)
-    cursor.execute("""
-        SELECT DISTINCT Category
-        FROM LibraryData.Books
-        WHERE Category IS NOT NULL
-        ORDER BY Category
-    """)
-    categories = [row[0] for row in cursor.fetchall()]
-
-    # 📖 MY BORROWED BOOKS
-    account_id = get_account_id(cursor, username)
-
-    cursor.execute("""
-        SELECT 
-            b.BookID AS id,
-            b.Title AS title,
-            DATEADD(DAY, 14, bh.BorrowDate) AS due_date
-        FROM LibraryData.BorrowHistory bh
-        JOIN LibraryData.Books b ON bh.BookID = b.BookID
-        WHERE bh.AccountID = ?
-          AND bh.Status = 'borrow'
-          AND bh.ReturnDate IS NULL
-        ORDER BY bh.BorrowDate
-    """, (account_id,))
-
-    my_borrowed = [
-        dict(zip([col[0] for col in cursor.description], row))
-        for row in cursor.fetchall()
-    ]
-
-    conn.close()
+    return _render_catalog(
+        username,
+        request.args.get('query', ''),
+        request.args.get('category', 'All'),
+    )
+
+# =========================
+# CATALOG PAGE (shared by show_books / search)
+# =========================
+def _render_catalog(username, query='', category_filter='All'):
+    identity = session.get('identity')
+    if not identity:
+        return _session_expired()
+
+    repo = get_repo()
+    account_id = identity['account_id']
+    batch = {}
+
+    # 📚 BOOKS + 📖 MY BORROWED BOOKS + catalog/credential versions in one batch -
+    # a single round trip on SQL Server (see Repository.reader_page)
+    def search_books(query, category, after, before, limit):
+        batch.update(repo.reader_page(account_id, query, category, after, before, limit))
+        return batch['books']
+
+    def get_books(book_ids):
+        batch.update(repo.reader_page(account_id, book_ids=book_ids))
+        return batch['books']
+
+    # 🔍 One keyset page (ranked by the in-memory index for text searches)
+    page = catalog_page(
+        repo,
+        query,
+        category_filter,
+        token=request.args.get('page'),
+        per_page=page_size(request.args.get('per_page'), current_app.config['CATALOG_PAGE_SIZE']),
+        index=get_catalog_index(repo) if query else None,
+        search_books=search_books,
+        get_books=get_books,
+    )
+
+    # 🪪 Reset, lockout or deletion since login: the batch saw it
+    if batch['credential_version'] != identity['credential_version']:
+        return _session_expired()
+
+    # 🏷️ CATEGORIES (DB-DRIVEN, cached per catalog version)
+    categories = get_catalog_metadata(repo, batch['catalog_version'])['categories']
 
     return render_template(
         'transactions.html',
-        books=books,
-        my_borrowed=my_borrowed,
+        books=page['books'],
+        next_token=page['next_token'],
+        prev_token=page['prev_token'],
+        my_borrowed=batch['borrowed'],
         categories=categories,   # ✅ IMPORTANT
+        catalog_version=batch['catalog_version'],   # live updates start here
         username=username,
+        query=query,
+        category_filter=category_filter,
         now=datetime.now()
     )
+
+# =========================
+# CATALOG SYNC API
+# =========================
+# GET /api/catalog             -> every book, tagged with the CatalogVersion
+# GET /api/catalog?since=N     -> only books changed and BookIDs deleted
+#                                 after version N (kiosks and caches keep the
+#                                 returned "version" and ask again with it)
+# The body is fixed by (version, since), so it carries a strong ETag and an
+# unchanged catalog is answered with 304 after reading just the version.
+def _catalog_etag(version, since):
+    return f"catalog-{version}" if since is None else f"catalog-{version}-since-{since}"
+
+
+@transactions_bp.route('/api/catalog')
+def catalog_api():
+    if session.get('role') not in ('Reader', 'Librarian'):
+        return jsonify({'error': 'Access denied.'}), 403
+
+    since = request.args.get('since')
+    if since is not None:
+        if not since.isdigit():
+            return jsonify({'error': 'since must be a catalog version.'}), 400
+        since = int(since)
+
+    repo = get_repo()
+
+    # 🏷️ Nothing changed since the client's copy: one small read, no rows
+    version = repo.catalog_version()
+    if since is not None and since > version:
+        since = None   # version from another database (restore/rebuild): start over
+    if request.if_none_match.contains_weak(_catalog_etag(version, since)):
+        response = current_app.response_class(status=304)
+    else:
+        changes = repo.catalog_changes(since)
+        response = jsonify(
+            version=changes['version'],
+            since=since,
+            full=since is None,
+            books=changes['books'],
+            deleted=changes['deleted'],
+        )
+        version = changes['version']
+
+    response.set_etag(_catalog_etag(version, since))
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# =========================
+# LIVE CATALOG EVENTS (SSE)
+# =========================
+# The reader page's EventSource: "book" / "deleted" events as the catalog
+# changes, one "catalog" event for a bulk change (see live_updates.py).
+# ?since= is the CatalogVersion the page was rendered at; a reconnecting
+# browser sends Last-Event-ID instead, and both are backfilled from the
+# database before the live events.
+@transactions_bp.route('/api/catalog/events')
+def catalog_events():
+    if session.get('role') not in ('Reader', 'Librarian'):
+        return jsonify({'error': 'Access denied.'}), 403
+
+    since = request.headers.get('Last-Event-ID') or request.args.get('since')
+    if since is not None:
+        if not since.isdigit():
+            return jsonify({'error': 'since must be a catalog version.'}), 400
+        since = int(since)
+
+    feed = get_catalog_feed()
+    if not feed.max_subscribers:
+        return '', 204   # feed turned off: tells EventSource not to reconnect
+
+    try:
+        subscription = feed.subscribe(get_repo(), since)
+    except FeedFull:
+        response = jsonify({'error': 'Too many live connections, please try again shortly.'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+
+    # Not stream_with_context: the pooled connection goes back at teardown,
+    # before the stream starts, so idle subscribers hold no connection
+    return current_app.response_class(
+        subscription,
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )